@@ -0,0 +1,4471 @@
+import re
+import os
+import sys
+import glob
+import json
+import logging
+import hashlib
+import html
+import importlib.util
+import math
+import mmap
+import struct
+import time
+import types
+import bisect
+import random
+import threading
+import argparse
+import collections
+import operator
+import itertools
+import concurrent
+from html.parser import HTMLParser
+
+def lazy_import(name):
+    """Return a module that is only executed on its first attribute access, or None if it is not installed.
+
+    Keeps one-shot CLI invocations (greetings, templates, ratings, the stream engine) from paying
+    for imports that only some commands use.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        # Bound like a regular import, so "concurrent.futures.X" resolves through the parent package
+        setattr(sys.modules[parent], child, module)
+    return module
+
+# BeautifulSoup is only needed by the "bs4" parser engine
+bs4 = lazy_import("bs4")
+
+# NumPy is only needed by the columnar calculation engine and roll-ups
+np = lazy_import("numpy")
+
+# asyncio is only needed by the HTTP service, process pools by batch mode and the service
+asyncio = lazy_import("asyncio")
+lazy_import("concurrent.futures")
+
+# Needed only by the result cache and KPI history, and by the benchmark
+sqlite3 = lazy_import("sqlite3")
+tracemalloc = lazy_import("tracemalloc")
+
+logger = logging.getLogger(__name__)
+
+# Machine-readable threshold operators that KPI definitions may use
+THRESHOLD_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq
+}
+
+class RatioFormula:
+    """KPI formula: numerator / denominator (times `scale`), undefined unless the denominator is positive"""
+
+    def __init__(self, scale=1):
+        self.scale = scale
+
+    def __call__(self, numerator, denominator):
+        if denominator > 0:
+            ratio = numerator / denominator
+            return ratio * self.scale if self.scale != 1 else ratio
+        return None
+
+    def columnar(self, numerator, denominator):
+        """Vectorized form: returns (values, valid mask) with NaN where the KPI is undefined"""
+        with np.errstate(invalid="ignore"):
+            valid = ~np.isnan(numerator) & (denominator > 0)
+        ratio = np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=valid)
+        if self.scale != 1:
+            ratio = ratio * self.scale
+        return ratio, valid
+
+def _plain_value(value):
+    """`value` rebuilt from plain constants, tuples, sorted frozensets and code objects; TypeError for anything else"""
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return value
+    if isinstance(value, tuple):
+        return tuple(_plain_value(item) for item in value)
+    if isinstance(value, frozenset):
+        # Set order follows string hashing, which differs between processes
+        return ("frozenset",) + tuple(sorted(repr(_plain_value(item)) for item in value))
+    if isinstance(value, types.CodeType):
+        return ("code", value.co_code, _plain_value(value.co_consts), value.co_names,
+                value.co_argcount, value.co_kwonlyargcount, value.co_flags)
+    raise TypeError(f"No stable description of {type(value).__name__} values")
+
+def formula_identity(formula):
+    """Describe a KPI formula the same way in every process, or return None when that is not possible.
+
+    A RatioFormula is described by its scale, and a plain function (a lambda too) by its bytecode,
+    constants, referenced names, defaults and closure values. Other callables cannot be described,
+    and neither can functions whose defaults or closures hold anything but plain values.
+    """
+    if isinstance(formula, RatioFormula):
+        return ("RatioFormula", formula.scale)
+    if not isinstance(formula, types.FunctionType):
+        return None
+    try:
+        closure = tuple(cell.cell_contents for cell in formula.__closure__ or ())
+        return _plain_value((formula.__module__, formula.__qualname__, formula.__code__, formula.__defaults__,
+                             tuple(sorted((formula.__kwdefaults__ or {}).items())), closure))
+    except (TypeError, ValueError):
+        return None
+
+class KPIDefinition:
+    """Everything the analyzer needs to know about one KPI.
+
+    `fields` are the input labels read, in order, from the paragraphs after the KPI heading and
+    passed positionally to `formula`, which returns None when the KPI cannot be calculated.
+    `threshold_operator` is one of THRESHOLD_OPERATORS, applied as `value <op> threshold_value`.
+    `pass_summary` and `fail_summary` are executive summary sentences, `value_format` renders the
+    value in the KPI analysis section, and `calculation_steps` are its step lines (lines starting
+    with "$" are formulas). Optional KPIs (`required=False`) are reported when present but their
+    absence is not an error. `field_dimensions` maps fields to "time" (normalized to hours),
+    "currency" or "count", so values with a unit of another kind are rejected.
+    """
+
+    def __init__(self, name, fields, formula, threshold_operator, threshold_value, threshold_text,
+                 pass_summary, fail_summary, calculation_steps, value_format="{value}", required=True,
+                 field_dimensions=None):
+        if threshold_operator not in THRESHOLD_OPERATORS:
+            raise ValueError(f"Unsupported threshold operator for {name}: {threshold_operator!r}")
+        self.name = name
+        self.fields = tuple(fields)
+        self.formula = formula
+        self.threshold_operator = threshold_operator
+        self.threshold_value = threshold_value
+        self.threshold_text = threshold_text
+        self.pass_summary = pass_summary
+        self.fail_summary = fail_summary
+        self.calculation_steps = tuple(calculation_steps)
+        self.value_format = value_format
+        self.required = required
+        self.field_dimensions = dict(field_dimensions or {})
+
+class CompiledKPIRegistry:
+    """Lookup tables built once from a registry, keyed by KPI name"""
+
+    def __init__(self, definitions):
+        self.definitions = {definition.name: definition for definition in definitions}
+        self.names = tuple(self.definitions)
+        self.required = tuple(name for name, definition in self.definitions.items() if definition.required)
+        self.fields = {name: definition.fields for name, definition in self.definitions.items()}
+        self.formulas = {name: definition.formula for name, definition in self.definitions.items()}
+        self.field_dimensions = {}
+        for definition in self.definitions.values():
+            self.field_dimensions.update(definition.field_dimensions)
+        self.thresholds = {
+            name: (THRESHOLD_OPERATORS[definition.threshold_operator], definition.threshold_value)
+            for name, definition in self.definitions.items()
+        }
+        self.threshold_texts = {name: definition.threshold_text for name, definition in self.definitions.items()}
+        self.max_fields = max((len(fields) for fields in self.fields.values()), default=0)
+        
+        # Identifies this set of definitions in content-addressed cache keys. A formula without a
+        # stable identity is told apart by its id, which only holds in this process, so such a
+        # registry must not key the result cache
+        identities = {name: formula_identity(formula) for name, formula in self.formulas.items()}
+        self.cacheable = None not in identities.values()
+        self.fingerprint = hashlib.sha256(repr([
+            (definition.name, definition.fields,
+             identities[definition.name] or ("unidentified", id(definition.formula)),
+             definition.threshold_operator, definition.threshold_value, definition.threshold_text,
+             definition.pass_summary, definition.fail_summary, definition.calculation_steps,
+             definition.value_format, definition.required, sorted(definition.field_dimensions.items()))
+            for definition in self.definitions.values()
+        ]).encode("utf-8")).hexdigest()
+
+    def passes(self, kpi, value):
+        """Check a calculated value against the KPI's threshold"""
+        compare, threshold = self.thresholds[kpi]
+        return compare(value, threshold)
+
+class KPIRegistry:
+    """Ordered collection of KPI definitions, compiled lazily into lookup tables"""
+
+    def __init__(self, definitions=()):
+        self._definitions = {}
+        self._compiled = None
+        for definition in definitions:
+            self.register(definition)
+
+    def register(self, definition, replace=False):
+        """Add a KPI definition; KPIs are reported in registration order"""
+        if definition.name in self._definitions and not replace:
+            raise ValueError(f"KPI already registered: {definition.name}")
+        self._definitions[definition.name] = definition
+        self._compiled = None
+
+    def unregister(self, name):
+        """Remove a KPI definition"""
+        del self._definitions[name]
+        self._compiled = None
+
+    def compile(self):
+        """Return the compiled lookup tables, rebuilding them only after the registry changed"""
+        if self._compiled is None:
+            self._compiled = CompiledKPIRegistry(self._definitions.values())
+        return self._compiled
+
+KPI_REGISTRY = KPIRegistry([
+    KPIDefinition(
+        "Order Fulfillment Cycle Time",
+        fields=["Total Time for All Orders", "Number of Orders"],
+        formula=RatioFormula(),
+        threshold_operator="<",
+        threshold_value=48,
+        threshold_text="less than 48 hours",
+        pass_summary="Order Fulfillment Cycle Time of {value} hours is within the target threshold of less than 48 hours.",
+        fail_summary="Order Fulfillment Cycle Time of {value} hours exceeds the target threshold of less than 48 hours.",
+        calculation_steps=[
+            "Step 1 – Extract Values: Identify and extract \"Total Time for All Orders\" and \"Number of Orders\".",
+            "Step 2 – Calculate Cycle Time:",
+            "$\\text{Order Fulfillment Cycle Time} = \\frac{\\text{Total Time for All Orders}}{\\text{Number of Orders}}$",
+            "Step 3 – Report: Round the result to 2 decimal places."
+        ],
+        field_dimensions={"Total Time for All Orders": "time", "Number of Orders": "count"}
+    ),
+    KPIDefinition(
+        "On-Time Delivery (OTD)",
+        fields=["Orders Delivered On Time", "Total Orders Shipped"],
+        formula=RatioFormula(scale=100),
+        threshold_operator=">=",
+        threshold_value=95,
+        threshold_text="95% or higher",
+        pass_summary="On-Time Delivery rate of {value}% meets or exceeds the target threshold of 95% or higher.",
+        fail_summary="On-Time Delivery rate of {value}% is below the target threshold of 95%, indicating potential reliability issues.",
+        calculation_steps=[
+            "Step 1 – Extract Values: Identify and extract \"Orders Delivered On Time\" and \"Total Orders Shipped\".",
+            "Step 2 – Calculate Ratio:",
+            "$\\text{OTD Ratio} = \\frac{\\text{Orders Delivered On Time}}{\\text{Total Orders Shipped}}$",
+            "Step 3 – Convert to Percentage:",
+            "$\\text{OTD} = \\text{OTD Ratio} \\times 100$",
+            "Step 4 – Report: Round the percentage to 2 decimal places."
+        ],
+        value_format="{value}%",
+        field_dimensions={"Orders Delivered On Time": "count", "Total Orders Shipped": "count"}
+    ),
+    KPIDefinition(
+        "Inventory Turnover Ratio",
+        fields=["Cost of Goods Sold (COGS)", "Average Inventory Value"],
+        formula=RatioFormula(),
+        threshold_operator=">",
+        threshold_value=4,
+        threshold_text="above 4",
+        pass_summary="Inventory Turnover Ratio of {value} exceeds the target threshold of above 4, indicating efficient inventory management.",
+        fail_summary="Inventory Turnover Ratio of {value} is below the target threshold of above 4, suggesting potential inventory management issues.",
+        calculation_steps=[
+            "Step 1 – Extract Values: Identify and extract \"Cost of Goods Sold (COGS)\" and \"Average Inventory Value\".",
+            "Step 2 – Calculate Ratio:",
+            "$\\text{Inventory Turnover Ratio} = \\frac{\\text{COGS}}{\\text{Average Inventory Value}}$",
+            "Step 3 – Report: Round the result to 2 decimal places."
+        ],
+        field_dimensions={"Cost of Goods Sold (COGS)": "currency", "Average Inventory Value": "currency"}
+    ),
+    KPIDefinition(
+        "Freight Cost per Unit",
+        fields=["Total Freight Cost", "Total Units Shipped"],
+        formula=RatioFormula(),
+        threshold_operator="<",
+        threshold_value=5,
+        threshold_text="less than $5 per unit",
+        pass_summary="Freight Cost per Unit of ${value} is below the target threshold of less than $5 per unit.",
+        fail_summary="Freight Cost per Unit of ${value} exceeds the target threshold of less than $5 per unit.",
+        calculation_steps=[
+            "Step 1 – Extract Values: Identify and extract \"Total Freight Cost\" and \"Total Units Shipped\".",
+            "Step 2 – Calculate Cost:",
+            "$\\text{Freight Cost per Unit} = \\frac{\\text{Total Freight Cost}}{\\text{Total Units Shipped}}$",
+            "Step 3 – Report: Round the result to 2 decimal places."
+        ],
+        value_format="${value}",
+        field_dimensions={"Total Freight Cost": "currency", "Total Units Shipped": "count"}
+    ),
+    KPIDefinition(
+        "Perfect Order Rate",
+        fields=["Orders Delivered Without Issues", "Total Orders"],
+        formula=RatioFormula(scale=100),
+        threshold_operator=">=",
+        threshold_value=95,
+        threshold_text="≥ 95%",
+        pass_summary="Perfect Order Rate of {value}% meets or exceeds the target threshold of 95% or higher, reflecting strong operational performance.",
+        fail_summary="Perfect Order Rate of {value}% is below the target threshold of 95%, indicating potential issues in order fulfillment processes.",
+        calculation_steps=[
+            "Step 1 – Extract Values: Identify and extract \"Orders Delivered Without Issues\" and \"Total Orders\".",
+            "Step 2 – Calculate Ratio:",
+            "$\\text{Perfect Order Ratio} = \\frac{\\text{Orders Delivered Without Issues}}{\\text{Total Orders}}$",
+            "Step 3 – Convert to Percentage:",
+            "$\\text{Perfect Order Rate} = \\text{Perfect Order Ratio} \\times 100$",
+            "Step 4 – Report: Round the percentage to 2 decimal places."
+        ],
+        value_format="{value}%",
+        field_dimensions={"Orders Delivered Without Issues": "count", "Total Orders": "count"}
+    )
+])
+
+def register_kpi(definition, replace=False):
+    """Register an extra KPI (e.g. Cash-to-Cash Cycle, Fill Rate) with the default registry"""
+    KPI_REGISTRY.register(definition, replace=replace)
+
+# One comparison of a threshold expression such as "< 48" or "> 4 and <= 10"
+THRESHOLD_CLAUSE = re.compile(r"\s*(<=|>=|==|<|>)\s*([-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)\s*")
+
+# Words used for the threshold text of overridden rules that do not give their own
+THRESHOLD_WORDS = {"<": "less than", "<=": "at most", ">": "above", ">=": "at least", "==": "exactly"}
+
+class ThresholdRule:
+    """One KPI's threshold: a conjunction of comparisons parsed and compiled once.
+
+    `expression` is one or more THRESHOLD_OPERATORS clauses joined by "and", e.g. "< 48" or
+    "> 4 and <= 10"; the value passes when every clause holds. `text` is the threshold as shown in
+    reports and summaries (derived from the clauses when not given).
+    """
+
+    __slots__ = ("expression", "clauses", "text", "evaluate")
+
+    def __init__(self, expression, text=None, value_format="{value}"):
+        clauses = []
+        for part in str(expression).split(" and "):
+            match = THRESHOLD_CLAUSE.fullmatch(part)
+            if match is None:
+                raise ValueError(f"Invalid threshold expression: {expression!r}")
+            number = float(match.group(2))
+            clauses.append((match.group(1), int(number) if number.is_integer() else number))
+        self.clauses = tuple(clauses)
+        self.expression = " and ".join(f"{op} {threshold}" for op, threshold in self.clauses)
+        self.text = text or " and ".join(
+            f"{THRESHOLD_WORDS[op]} {value_format.format(value=threshold)}" for op, threshold in self.clauses)
+        checks = tuple((THRESHOLD_OPERATORS[op], threshold) for op, threshold in self.clauses)
+        self.evaluate = lambda value: all(compare(value, threshold) for compare, threshold in checks)
+
+    def source(self, name):
+        """The rule as a Python expression over the variable `name`"""
+        return " and ".join(f"{name} {op} {float(threshold)!r}" for op, threshold in self.clauses)
+
+    @classmethod
+    def from_definition(cls, definition):
+        return cls(f"{definition.threshold_operator} {definition.threshold_value}", definition.threshold_text)
+
+class ThresholdRuleSet:
+    """Every KPI's threshold for one tenant/site scope, compiled into a single evaluator.
+
+    `evaluate(values)` checks all calculated values in one call of generated code and returns a
+    tuple of True/False/None (not calculated) in KPI order. `classify(values)` turns that into the
+    structured assessments the executive summary is built from. KPIs whose rule is the registry
+    default keep the definition's summary sentences; overridden ones get a generic sentence.
+    """
+
+    def __init__(self, kpis, rules, overridden=()):
+        self.kpis = kpis
+        self.rules = {kpi: rules[kpi] for kpi in kpis.names}
+        self.overridden = frozenset(overridden)
+        self.texts = {kpi: rule.text for kpi, rule in self.rules.items()}
+        
+        # Identifies this rule set in cache keys and compiled template lookups
+        self.fingerprint = hashlib.sha256(repr((
+            "thresholds-1", kpis.fingerprint,
+            [(kpi, rule.expression, rule.text, kpi in self.overridden) for kpi, rule in self.rules.items()]
+        )).encode("utf-8")).hexdigest()
+        
+        lines = ["def evaluate(values):", "    get = values.get"]
+        for position, (kpi, rule) in enumerate(self.rules.items()):
+            lines.append(f"    value = get({kpi!r})")
+            lines.append(f"    passed{position} = None if value is None else bool({rule.source('value')})")
+        lines.append(f"    return ({''.join(f'passed{position}, ' for position in range(len(self.rules)))})")
+        namespace = {}
+        exec(compile("\n".join(lines), f"<thresholds {self.fingerprint[:12]}>", "exec"), namespace)
+        self.evaluate = namespace["evaluate"]
+
+    @classmethod
+    def defaults(cls, kpis):
+        """The registry's own thresholds, compiled once per set of KPI definitions"""
+        rule_set = _default_rule_sets.get(kpis.fingerprint)
+        if rule_set is None:
+            rules = {kpi: ThresholdRule.from_definition(definition) for kpi, definition in kpis.definitions.items()}
+            rule_set = _default_rule_sets[kpis.fingerprint] = cls(kpis, rules)
+        return rule_set
+
+    def passes(self, kpi, value):
+        """Check one value against its KPI's rule"""
+        return self.rules[kpi].evaluate(value)
+
+    def classify(self, values):
+        """One assessment per calculated KPI, in KPI order: kpi, value, threshold, passed,
+        classification ("strength" or "concern") and the summary statement"""
+        definitions = self.kpis.definitions
+        assessments = []
+        for kpi, passed in zip(self.kpis.names, self.evaluate(values)):
+            if passed is None:
+                continue
+            value = values[kpi]
+            if kpi in self.overridden:
+                shown = definitions[kpi].value_format.format(value=value)
+                verdict = "meets" if passed else "does not meet"
+                statement = f"{kpi} of {shown} {verdict} the target threshold of {self.texts[kpi]}."
+            else:
+                definition = definitions[kpi]
+                statement = (definition.pass_summary if passed else definition.fail_summary).format(value=value)
+            assessments.append({
+                "kpi": kpi,
+                "value": value,
+                "threshold": self.texts[kpi],
+                "passed": passed,
+                "classification": "strength" if passed else "concern",
+                "statement": statement
+            })
+        return assessments
+
+# Rule sets of the registry defaults, keyed by KPI definitions fingerprint
+_default_rule_sets = {}
+
+class ThresholdRules:
+    """Threshold rule engine: registry defaults plus per-tenant and per-site overrides.
+
+    Overrides layer as default < (tenant, None) < (tenant, site); a tenant of None is the default
+    tenant. `resolve(tenant, site)` is one dict lookup once a scope has been seen, and scopes whose
+    effective rules are equal share one compiled ThresholdRuleSet, so thousands of tenants with a
+    handful of distinct rule sets only compile that handful.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or KPI_REGISTRY
+        self._overrides = {}
+        self._kpis = None
+        self._resolved = {}
+        self._compiled = {}
+
+    def override(self, tenant, kpi, expression, site=None, text=None):
+        """Set `kpi`'s threshold for a tenant (or one of its sites) to `expression`"""
+        definition = self.registry.compile().definitions.get(kpi)
+        if definition is None:
+            raise ValueError(f"Unknown KPI in threshold override: {kpi}")
+        rule = ThresholdRule(expression, text, definition.value_format)
+        self._overrides.setdefault((tenant, site), {})[kpi] = rule
+        self._resolved.clear()
+
+    def clear(self, tenant, site=None):
+        """Drop the overrides of a tenant (or of one of its sites)"""
+        if self._overrides.pop((tenant, site), None) is not None:
+            self._resolved.clear()
+
+    def load(self, entries):
+        """Apply overrides from dicts with "kpi", "threshold" and optional "tenant", "site" and "text"; returns the count"""
+        count = 0
+        for entry in entries:
+            self.override(entry.get("tenant"), entry["kpi"], entry["threshold"], entry.get("site"), entry.get("text"))
+            count += 1
+        return count
+
+    @classmethod
+    def from_file(cls, path, registry=None):
+        """Rule engine with the overrides of a JSON file holding a list of override entries"""
+        rules = cls(registry)
+        with open(path, encoding="utf-8") as handle:
+            rules.load(json.load(handle))
+        return rules
+
+    def resolve(self, tenant=None, site=None):
+        """The compiled rule set that applies to a tenant and site"""
+        kpis = self.registry.compile()
+        if kpis is not self._kpis:
+            # The registry changed: defaults and everything compiled from them are stale
+            self._kpis = kpis
+            self._resolved.clear()
+            self._compiled.clear()
+        rule_set = self._resolved.get((tenant, site))
+        if rule_set is None:
+            rule_set = self._resolved[(tenant, site)] = self._build(kpis, tenant, site)
+        return rule_set
+
+    def evaluate(self, values, tenant=None, site=None):
+        """Pass/fail of every KPI in `values` under the tenant's rules, as a tuple in KPI order"""
+        return self.resolve(tenant, site).evaluate(values)
+
+    def classify(self, values, tenant=None, site=None):
+        return self.resolve(tenant, site).classify(values)
+
+    def _build(self, kpis, tenant, site):
+        effective = {}
+        scopes = [(tenant, None)] if site is None else [(tenant, None), (tenant, site)]
+        for scope in scopes:
+            effective.update(self._overrides.get(scope, {}))
+        if not effective:
+            return ThresholdRuleSet.defaults(kpis)
+        key = tuple(sorted((kpi, rule.expression, rule.text) for kpi, rule in effective.items()))
+        rule_set = self._compiled.get(key)
+        if rule_set is None:
+            rules = {kpi: effective.get(kpi) or ThresholdRule.from_definition(definition)
+                     for kpi, definition in kpis.definitions.items()}
+            rule_set = self._compiled[key] = ThresholdRuleSet(kpis, rules, effective)
+        return rule_set
+
+# Default rule engines (no overrides), keyed by registry
+_threshold_rules = {}
+
+def get_threshold_rules(registry=None):
+    """Return the shared override-free ThresholdRules of a registry"""
+    registry = registry or KPI_REGISTRY
+    rules = _threshold_rules.get(registry)
+    if rules is None:
+        rules = _threshold_rules[registry] = ThresholdRules(registry)
+    return rules
+
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+# Elements that never have children, so they are never pushed on the open-element stack
+VOID_TAGS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr',
+    'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid',
+    'param', 'source', 'spacer', 'track', 'wbr'
+])
+
+# Elements whose strings BeautifulSoup stores as Script/Stylesheet/TemplateString/Ruby strings,
+# which .text leaves out
+STRING_CONTAINER_TAGS = frozenset(['rt', 'rp', 'script', 'style', 'template'])
+
+class KPIStreamExtractor(HTMLParser):
+    """Event-driven extractor that pairs KPI headings with their sibling paragraphs in one pass.
+
+    Only the first <div id="kpi-report"> is tracked, mirroring soup.find(). Tags are opened and
+    closed with the same rules as BeautifulSoup's html.parser tree builder, so headings and
+    paragraphs end up with the same parents as in the tree, but no tree is ever built and
+    tokenizing stops as soon as the report div closes.
+
+    With `on_section`, every top-level kpi-report div is tracked instead: the callback receives
+    each div's headings as soon as it closes and the extractor then forgets them, so memory stays
+    bounded by one section no matter how many the input holds.
+    """
+
+    def __init__(self, chunk_size=65536, max_paragraphs=2, on_section=None):
+        super().__init__(convert_charrefs=True)
+        self.chunk_size = chunk_size
+        self.max_paragraphs = max_paragraphs
+        self.on_section = on_section
+        self.found_report = False
+        self.finished = False
+        # Headings inside the report in document order: [text parts, sibling paragraph texts]
+        self.headings = []
+        # Open elements: [tag, text parts or None, sibling paragraph list or None, waiting lists or None]
+        self._stack = []
+        self._report_depth = None
+        self._capturing = []
+        # Open elements from STRING_CONTAINER_TAGS; their text never counts
+        self._hidden = 0
+
+    def extract(self, html_content):
+        """Feed the document in chunks, stopping early once the KPI report has been read"""
+        for start in range(0, len(html_content), self.chunk_size):
+            self.feed(html_content[start:start + self.chunk_size])
+            if self.finished:
+                return self
+        self.close()
+        return self
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self._pop()
+
+    def sections(self, kpis):
+        """Map each KPI to the paragraph texts after the first heading that mentions it"""
+        return self.match_sections(self.headings, kpis)
+
+    @staticmethod
+    def match_sections(headings, kpis):
+        """Map each KPI to the paragraph texts after the first of `headings` that mentions it"""
+        headings = [("".join(text), paragraphs) for text, paragraphs in headings]
+        sections = {}
+        for kpi in kpis:
+            for text, paragraphs in headings:
+                if kpi in text:
+                    sections[kpi] = paragraphs
+                    break
+        return sections
+
+    def handle_starttag(self, tag, attrs):
+        if self.finished or tag in VOID_TAGS:
+            return
+        if tag in STRING_CONTAINER_TAGS:
+            self._hidden += 1
+
+        if self._report_depth is None:
+            if (tag == 'div' and (self.on_section is not None or not self.found_report)
+                    and dict(attrs).get('id') == 'kpi-report'):
+                self.found_report = True
+                self._report_depth = len(self._stack)
+            self._stack.append([tag, None, None, None])
+            return
+
+        text = None
+        paragraphs = None
+        if tag in HEADING_TAGS:
+            text = []
+            paragraphs = []
+            self.headings.append([text, paragraphs])
+            self._capturing.append(text)
+        elif tag == 'p' and self._stack[-1][3]:
+            text = []
+            self._capturing.append(text)
+        self._stack.append([tag, text, paragraphs, None])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.finished:
+            return
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                while len(self._stack) > index:
+                    self._pop()
+                return
+
+    def handle_data(self, data):
+        if self._hidden:
+            return
+        for text in self._capturing:
+            text.append(data)
+
+    def _pop(self):
+        tag, text, paragraphs, _ = self._stack.pop()
+        if tag in STRING_CONTAINER_TAGS:
+            self._hidden -= 1
+        if self._report_depth is None:
+            return
+        if len(self._stack) == self._report_depth:
+            self._report_depth = None
+            if self.on_section is not None:
+                headings, self.headings = self.headings, []
+                self.on_section(headings)
+            else:
+                # The report div itself closed; nothing after it can change the result
+                self.finished = True
+            return
+        if text is None:
+            return
+
+        # Captured elements are properly nested, so the innermost one is always last
+        self._capturing.pop()
+        parent = self._stack[-1]
+        if paragraphs is not None:
+            # Following <p> siblings of this heading are the parent's later <p> children
+            if parent[3] is None:
+                parent[3] = []
+            parent[3].append(paragraphs)
+        elif parent[3]:
+            paragraph = "".join(text)
+            for waiting in parent[3]:
+                if len(waiting) < self.max_paragraphs:
+                    waiting.append(paragraph)
+
+# Markup the kpi-report div scanner reads: comments, CDATA sections, declarations, the attributes of
+# start tags and the content of raw-text elements may hold text that looks like a tag but is not one
+MARKUP_START = re.compile(
+    r"<(?:(?P<comment>!--)|(?P<cdata>!\[CDATA\[)|(?P<declaration>[!?])"
+    r"|/(?P<end>[a-zA-Z][^\t\n\r\f />\x00]*)|(?P<start>[a-zA-Z][^\t\n\r\f />\x00]*))"
+)
+# Rest of a start tag; quoted attribute values may contain ">" (html.parser only honours quotes after "=")
+START_TAG_REST = re.compile(r"""(?:=\s*(?:"[^"]*"|'[^']*')|[^>])*?>""")
+# Tag and attribute names are case-insensitive, the id value is not
+ID_ATTRIBUTE = re.compile(r"""(?<=[\s"'/])(?i:id)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]*))""")
+RAW_TEXT_END = {name: re.compile(rf"</{name}(?=[\s/>])[^>]*>", re.IGNORECASE) for name in ("script", "style", "textarea", "title")}
+# Parser versions disagree on whether textarea and title content is markup, and on where odd comments end
+AMBIGUOUS_RAW_TEXT = re.compile(r"</?[a-zA-Z]")
+AMBIGUOUS_COMMENT = re.compile(r"--!>|--\s+>")
+# Indentation and line-ending differences never change the analysis
+LINE_BREAK_WHITESPACE = re.compile(r"[ \t]*(?:\r\n|\r|\n)[ \t]*")
+
+def extract_kpi_report_div(html_content):
+    """Slice out the first kpi-report div without parsing the document.
+
+    Tags open and close elements on a stack with the rules of KPIStreamExtractor (an end tag closes
+    the innermost open element of its name and everything opened inside it), so the slice ends
+    where the parsers close the div, also when an end tag of an element opened before the div
+    closes it. Comments, CDATA sections, declarations, attribute values and script, style, textarea
+    and title content never open or close anything. Returns None when there is no such div, or when
+    the HTML parsers might read the markup differently (an unterminated comment, tag or raw-text
+    element, tags in textarea or title, a duplicate id or one written with character references).
+    """
+    start = None
+    report_depth = None
+    stack = []
+    position = 0
+    while True:
+        token = MARKUP_START.search(html_content, position)
+        if token is None:
+            break
+        kind = token.lastgroup
+        position = token.end()
+        if kind == "comment":
+            end = html_content.find("-->", position)
+            if (end < 0 or html_content.startswith((">", "->"), position)
+                    or AMBIGUOUS_COMMENT.search(html_content, position, end)):
+                return None
+            position = end + 3
+        elif kind == "cdata":
+            end = html_content.find("]]>", position)
+            if end < 0:
+                return None
+            position = end + 3
+        elif kind == "declaration" or kind == "end":
+            end = html_content.find(">", position)
+            if end < 0:
+                return None
+            position = end + 1
+            if kind == "end":
+                name = token.group("end").lower()
+                for index in range(len(stack) - 1, -1, -1):
+                    if stack[index] == name:
+                        del stack[index:]
+                        break
+                if report_depth is not None and len(stack) <= report_depth:
+                    return html_content[start:position]
+        else:
+            rest = START_TAG_REST.match(html_content, position)
+            if rest is None:
+                return None
+            position = rest.end()
+            name = token.group("start").lower()
+            if name in VOID_TAGS or html_content[position - 2] == "/":
+                # <tag/> is opened and closed at once
+                continue
+            if name in RAW_TEXT_END:
+                end = RAW_TEXT_END[name].search(html_content, position)
+                if end is None or (name in ("textarea", "title")
+                                   and AMBIGUOUS_RAW_TEXT.search(html_content, position, end.start())):
+                    return None
+                position = end.end()
+                continue
+            if name == "div" and start is None:
+                ids = ["".join(value) for value in ID_ATTRIBUTE.findall(html_content, token.end(), position)]
+                if any("&" in value for value in ids):
+                    return None
+                if "kpi-report" in ids:
+                    if len(ids) > 1:
+                        return None
+                    start = token.start()
+                    report_depth = len(stack)
+            stack.append(name)
+    return None if start is None else html_content[start:]
+
+def report_cache_key(html_content, kpis, output_format="markdown", tokenizer=None, rules=None):
+    """Content address of a report: a hash of its normalized kpi-report div, the KPI definitions,
+    the numeric parsing rules, the threshold rule set and the output format; None when the report
+    or the KPI formulas cannot be keyed safely"""
+    if not kpis.cacheable:
+        return None
+    div = extract_kpi_report_div(html_content)
+    if div is None:
+        return None
+    normalized = LINE_BREAK_WHITESPACE.sub("\n", div.strip())
+    digest = hashlib.sha256(kpis.fingerprint.encode("utf-8"))
+    digest.update((tokenizer or NUMERIC_TOKENIZER).fingerprint.encode("utf-8"))
+    digest.update((rules or ThresholdRuleSet.defaults(kpis)).fingerprint.encode("utf-8"))
+    if output_format != "markdown":
+        digest.update(output_format.encode("utf-8"))
+    digest.update(normalized.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+class ReportCache:
+    """Content-addressed cache of analysis results with an LRU memory tier and an optional SQLite tier.
+
+    Entries hold the extracted `kpi_data`, `calculated_values`, `errors`, `parse_errors`, `assessments`
+    and the rendered `report`.
+    The memory tier keeps at most `max_entries` results; the disk tier at `path` keeps at most
+    `max_disk_entries`, evicting the least recently used rows once it grows 10% past that limit.
+    One cache may be shared by threads: a lock guards the LRU order and the SQLite connection.
+    """
+
+    def __init__(self, max_entries=1024, path=None, max_disk_entries=100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS report_cache "
+                "(key TEXT PRIMARY KEY, payload TEXT NOT NULL, used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS report_cache_used ON report_cache (used)")
+            self._db.commit()
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+
+    def get(self, key):
+        """Return a copy of the cached entry for `key`, or None on a miss"""
+        with self._lock:
+            entry = self._lookup(key)
+        return None if entry is None else self._copy(entry)
+
+    def _lookup(self, key):
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return entry
+        
+        if self._db is not None:
+            row = self._db.execute("SELECT payload FROM report_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE report_cache SET used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+                entry = json.loads(row[0])
+                self._remember(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry
+        
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        """Store an entry in both tiers"""
+        with self._lock:
+            self._store(key, entry)
+
+    def _store(self, key, entry):
+        self._remember(key, entry)
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO report_cache (key, payload, used) VALUES (?, ?, ?)",
+            (key, json.dumps(entry), time.time())
+        )
+        self._disk_entries += 1
+        if self._disk_entries > self.max_disk_entries * 1.1:
+            excess = self._db.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0] - self.max_disk_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM report_cache WHERE key IN "
+                    "(SELECT key FROM report_cache ORDER BY used LIMIT ?)", (excess,)
+                )
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+        self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters and current tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _copy(entry):
+        return {
+            "kpi_data": {kpi: dict(fields) for kpi, fields in entry["kpi_data"].items()},
+            "calculated_values": dict(entry["calculated_values"]),
+            "errors": list(entry["errors"]),
+            "parse_errors": [dict(error) for error in entry.get("parse_errors", ())],
+            "assessments": [dict(assessment) for assessment in entry.get("assessments", ())],
+            "report": entry["report"]
+        }
+
+# History dates; other spellings ("3/1/2026") would not sort in date order
+ISO_DATE = re.compile(r"\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])")
+
+class KPIHistoryStore:
+    """KPI history in SQLite, indexed on (site, date), with trend state maintained on append.
+
+    Every append writes one row per KPI to `kpi_history` and updates the site's row in `kpi_trends`:
+    last value and date, period-over-period delta, the last `window` values for the rolling mean and
+    the current threshold-breach streak. Reading trends only touches `kpi_trends`, so neither appends
+    nor summaries slow down as history grows. Dates are ISO strings (YYYY-MM-DD, so they sort by date);
+    appending a date that is already recorded (a same-day re-analysis) replaces its values, and that
+    KPI's trend is replayed from history. One store may be shared by threads; a lock guards the connection.
+    """
+
+    def __init__(self, path=":memory:", window=7):
+        self.window = window
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kpi_history "
+            "(site TEXT NOT NULL, date TEXT NOT NULL, kpi TEXT NOT NULL, value REAL NOT NULL, breached INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS kpi_history_site_date ON kpi_history (site, date)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kpi_trends "
+            "(site TEXT NOT NULL, kpi TEXT NOT NULL, date TEXT NOT NULL, value REAL NOT NULL, previous REAL, "
+            "periods INTEGER NOT NULL, recent TEXT NOT NULL, breach_streak INTEGER NOT NULL, PRIMARY KEY (site, kpi))"
+        )
+        self._db.commit()
+
+    def append(self, site, date, calculated_values, kpis, passed=None):
+        """Record one report's calculated values and return the updated trends of those KPIs.
+
+        `passed` maps KPIs to their threshold outcome under the site's rules (default: the registry thresholds).
+        """
+        entry = self.prepare(site, date, calculated_values, kpis, passed)
+        self.commit(entry)
+        return entry["trends"]
+
+    def prepare(self, site, date, calculated_values, kpis, passed=None):
+        """Work out one report's history rows and updated trends without writing them; commit() records them.
+
+        A date after the KPI's last one extends its trend state; a date already recorded, or an earlier
+        one, replays the KPI's history with this value at that date.
+        """
+        date = date or time.strftime("%Y-%m-%d")
+        if not ISO_DATE.fullmatch(date):
+            raise ValueError(f"Invalid history date, expected YYYY-MM-DD: {date!r}")
+        with self._lock:
+            return self._prepare(site, date, calculated_values, kpis, passed)
+
+    def _prepare(self, site, date, calculated_values, kpis, passed):
+        rows = []
+        trends = {}
+        for kpi, value in calculated_values.items():
+            breached = not (passed[kpi] if passed is not None else kpis.passes(kpi, value))
+            row = self._db.execute(
+                "SELECT date, value, periods, recent, breach_streak FROM kpi_trends WHERE site = ? AND kpi = ?",
+                (site, kpi)
+            ).fetchone()
+            replaces = row is not None and date <= row[0]
+            if row is None:
+                state = (date, value, None, 1, [value], int(breached))
+            elif replaces:
+                state = self._replay(site, kpi, date, value, breached)
+            else:
+                _, previous, periods, recent, streak = row
+                state = (date, value, previous, periods + 1, (json.loads(recent) + [value])[-self.window:],
+                         streak + 1 if breached else 0)
+            rows.append((kpi, value, breached, replaces, state))
+            trends[kpi] = self._trend(*state)
+        return {"site": site, "date": date, "rows": rows, "trends": trends}
+
+    def commit(self, entry):
+        """Write a prepared report's history rows, replacing those of the same date, and its KPIs' trend state"""
+        site, date = entry["site"], entry["date"]
+        with self._lock, self._db:
+            for kpi, value, breached, replaces, state in entry["rows"]:
+                if replaces:
+                    self._db.execute("DELETE FROM kpi_history WHERE site = ? AND date = ? AND kpi = ?", (site, date, kpi))
+                self._db.execute(
+                    "INSERT INTO kpi_history (site, date, kpi, value, breached) VALUES (?, ?, ?, ?, ?)",
+                    (site, date, kpi, value, int(breached))
+                )
+                last_date, last_value, previous, periods, recent, streak = state
+                self._db.execute(
+                    "INSERT OR REPLACE INTO kpi_trends (site, kpi, date, value, previous, periods, recent, breach_streak) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (site, kpi, last_date, last_value, previous, periods, json.dumps(recent), streak)
+                )
+
+    def trends(self, site):
+        """Current trend state of every KPI recorded for `site`"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT kpi, date, value, previous, periods, recent, breach_streak FROM kpi_trends WHERE site = ?", (site,)
+            ).fetchall()
+        return {kpi: self._trend(date, value, previous, periods, json.loads(recent), streak)
+                for kpi, date, value, previous, periods, recent, streak in rows}
+
+    def history(self, site, kpi=None, since=None):
+        """Recorded (date, kpi, value, breached) rows for `site` in date order, read through the (site, date) index"""
+        query = "SELECT date, kpi, value, breached FROM kpi_history WHERE site = ? AND date >= ?"
+        parameters = [site, since or ""]
+        if kpi is not None:
+            query += " AND kpi = ?"
+            parameters.append(kpi)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY date", parameters).fetchall()
+        return [(date, name, value, bool(breached)) for date, name, value, breached in rows]
+
+    def sites(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT site FROM kpi_trends ORDER BY site")]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _replay(self, site, kpi, date, value, breached):
+        """Trend state of a KPI rebuilt from its recorded history, with `value` recorded at `date`"""
+        history = self._db.execute(
+            "SELECT date, value, breached FROM kpi_history WHERE site = ? AND kpi = ? AND date != ? ORDER BY date",
+            (site, kpi, date)
+        ).fetchall()
+        bisect.insort(history, (date, value, breached))
+        state = None
+        for row_date, row_value, row_breached in history:
+            if state is None:
+                state = (row_date, row_value, None, 1, [row_value], int(row_breached))
+            else:
+                _, last_value, _, periods, recent, streak = state
+                state = (row_date, row_value, last_value, periods + 1, (recent + [row_value])[-self.window:],
+                         streak + 1 if row_breached else 0)
+        return state
+
+    @staticmethod
+    def _trend(date, value, previous, periods, recent, streak):
+        return {
+            "date": date,
+            "value": value,
+            "previous": previous,
+            "delta": None if previous is None else round(value - previous, 2),
+            "rolling_mean": round(sum(recent) / len(recent), 2),
+            "window": len(recent),
+            "periods": periods,
+            "breach_streak": streak
+        }
+
+def trend_statements(trends, kpis):
+    """One sentence per KPI with a previous period: direction of change, rolling mean and any breach streak"""
+    statements = []
+    for kpi in kpis.names:
+        trend = trends.get(kpi)
+        if trend is None or trend["previous"] is None:
+            continue
+        value_format = kpis.definitions[kpi].value_format
+        delta = trend["delta"]
+        if delta:
+            direction = "up" if delta > 0 else "down"
+            statement = f"{kpi} is {direction} {value_format.format(value=abs(delta))} from the previous period"
+        else:
+            statement = f"{kpi} is unchanged from the previous period"
+        statement += f" ({trend['window']}-period rolling mean: {value_format.format(value=trend['rolling_mean'])})."
+        if trend["breach_streak"] > 1:
+            statement += f" It has missed its target for {trend['breach_streak']} consecutive periods."
+        statements.append(statement)
+    return statements
+
+REPORT_FORMATS = ("markdown", "text", "html", "json")
+
+class ReportTemplate:
+    """Report layout compiled once per KPI registry, output format and threshold rule set.
+
+    The static text (validation checklist, thresholds, calculation steps, footer) is merged into
+    a few constant strings when the template is built; rendering only fills the dynamic slots
+    between them (KPI presence, calculated values, pass/fail flags, executive summary) and joins.
+    """
+
+    def __init__(self, kpis, output_format="markdown", rules=None):
+        if output_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {output_format}")
+        self.kpis = kpis
+        self.output_format = output_format
+        self.rules = rules or ThresholdRuleSet.defaults(kpis)
+        
+        if output_format == "json":
+            pieces = self._json_pieces()
+        elif output_format == "html":
+            pieces = self._html_pieces(self._skeleton())
+        else:
+            emit = self._markdown_line if output_format == "markdown" else self._text_line
+            pieces = self._line_pieces(self._skeleton(), emit)
+        
+        # Adjacent static pieces are merged; each slot keeps a placeholder position and its filler
+        self._parts = []
+        self._fills = []
+        static = []
+        for piece in pieces:
+            if isinstance(piece, str):
+                static.append(piece)
+                continue
+            self._parts.append("".join(static))
+            static = []
+            self._fills.append((len(self._parts), piece[1], self._filler(*piece)))
+            self._parts.append(None)
+        self._parts.append("".join(static))
+
+    def render(self, result, summary):
+        """Fill the slots from an AnalysisResult and its executive summary"""
+        return "".join(self.fill(self._parts.copy(), result, summary))
+
+    def fill(self, parts, result, summary, kpis=None):
+        """Fill the slots of a copy of the template parts in place and return it.
+
+        With `kpis`, only the slots of those KPIs and the summary are refilled, so the parts of
+        an earlier rendering can be patched after some KPIs changed.
+        """
+        values = result.calculated_values
+        present = result.kpi_data
+        for position, kpi, fill in self._fills:
+            if kpis is None or kpi is None or kpi in kpis:
+                parts[position] = fill(values, present, summary)
+        return parts
+
+    def blank(self):
+        """The template parts with every slot still unfilled, for fill()"""
+        return self._parts.copy()
+
+    def _filler(self, kind, kpi):
+        """Compile one slot into a function of (calculated_values, kpi_data, summary)"""
+        if self.output_format == "json":
+            if kind == "presence":
+                return lambda values, present, summary: "true" if kpi in present else "false"
+            if kind == "value":
+                return lambda values, present, summary: json.dumps(values.get(kpi))
+            if kind == "passed":
+                passes = self.rules.rules[kpi].evaluate
+                return lambda values, present, summary: (
+                    "null" if kpi not in values else "true" if passes(values[kpi]) else "false")
+            return lambda values, present, summary: json.dumps(summary)
+        
+        escape = html.escape if self.output_format == "html" else str
+        if kind == "presence":
+            return lambda values, present, summary: "Present" if kpi in present else "Missing"
+        if kind == "value":
+            value_format = self.kpis.definitions[kpi].value_format
+            return lambda values, present, summary: escape(value_format.format(value=values.get(kpi, "N/A")))
+        return lambda values, present, summary: escape(summary)
+
+    def _skeleton(self):
+        """The report as (kind, depth, indent, label, pieces) lines, in markdown indentation"""
+        kpis = self.kpis
+        lines = [
+            ("heading", 0, "", "Data Validation Report", []),
+            ("field", 0, "", "HTML Structure Verification",
+             ["Checked sections include \"<head>\", \"<body>\", and \"<div id='kpi-report'>\"."]),
+            ("field", 0, "", "KPI Presence Verification", [])
+        ]
+        for kpi in kpis.names:
+            lines.append(("item", 1, "  ", None, [f"{kpi}: [", ("presence", kpi), "]"]))
+        lines.append(("field", 0, "", "Threshold Check", []))
+        for kpi, threshold in self.rules.texts.items():
+            lines.append(("item", 1, "  ", None, [f"{kpi}: {threshold}."]))
+        lines.append(("field", 0, "", "Keyword Identification", []))
+        lines.append(("text", 1, "  ", None, ["Within the \"<div id='kpi-report'>\", identified keywords corresponding to each KPI and extracted the associated numeric values for further calculations."]))
+        lines.append(("blank", 0, "", None, []))
+        
+        lines.append(("heading", 0, "", "KPI Analysis", []))
+        lines.append(("text", 0, "", None, ["For each extracted KPI, the following details are provided:"]))
+        for number, kpi in enumerate(kpis.names, 1):
+            lines.append(("numbered", 0, "", f"{number}. ", [kpi]))
+            lines.append(("field", 1, "   ", "Extracted Value", [("value", kpi)]))
+            lines.append(("field", 1, "   ", "Calculation Details", []))
+            for step in kpis.definitions[kpi].calculation_steps:
+                # Formula lines are indented under the step that introduces them
+                if step.startswith("$"):
+                    lines.append(("formula", 3, "       ", None, [step]))
+                else:
+                    lines.append(("item", 2, "     ", None, [step]))
+        lines.append(("note", 0, "", "Note",
+                      ["If no historical data is provided for any KPI, simply report the extracted KPI value without further calculations."]))
+        lines.append(("blank", 0, "", None, []))
+        
+        lines.append(("heading", 0, "", "Executive Summary", []))
+        lines.append(("text", 0, "", None, [("summary", None)]))
+        lines.append(("blank", 0, "", None, []))
+        
+        lines.append(("heading", 0, "", "Feedback Request", []))
+        lines.append(("text", 0, "", None, ["\"Would you like detailed calculations for any specific KPI? Rate this analysis (1-5).\""]))
+        return lines
+
+    @staticmethod
+    def _markdown_line(kind, indent, label):
+        """Markup placed before and after a line's content"""
+        if kind == "heading":
+            return f"# Section: {label}", ""
+        if kind == "field":
+            return f"{indent}- **{label}:**", ""
+        if kind == "numbered":
+            return f"{label}**", "**"
+        if kind == "note":
+            return f"- *{label}:*", ""
+        return (f"{indent}- " if kind == "item" else indent), ""
+
+    @staticmethod
+    def _text_line(kind, indent, label):
+        """Markup placed before and after a line's content"""
+        if kind == "heading":
+            return f"SECTION: {label.upper()}", ""
+        if kind == "field":
+            return f"{indent}- {label}:", ""
+        if kind == "numbered":
+            return label, ""
+        if kind == "note":
+            return f"- {label}:", ""
+        return (f"{indent}- " if kind == "item" else indent), ""
+
+    def _line_pieces(self, lines, emit):
+        pieces = []
+        for number, (kind, depth, indent, label, content) in enumerate(lines):
+            if number:
+                pieces.append("\n")
+            if kind == "blank":
+                continue
+            if kind == "formula" and self.output_format == "text":
+                content = [piece.strip("$") if isinstance(piece, str) else piece for piece in content]
+            prefix, suffix = emit(kind, indent, label)
+            pieces.append(prefix)
+            if content and kind in ("field", "note"):
+                pieces.append(" ")
+            pieces.extend(content)
+            pieces.append(suffix)
+        return pieces
+
+    @staticmethod
+    def _html_pieces(lines):
+        pieces = ["<div class=\"kpi-analysis\">\n"]
+        in_list = False
+        for kind, depth, indent, label, content in lines:
+            listed = kind in ("field", "item", "formula", "note", "numbered")
+            if listed and not in_list:
+                pieces.append("<ul>\n")
+            elif not listed and in_list:
+                pieces.append("</ul>\n")
+            in_list = listed
+            content = [html.escape(piece, quote=False) if isinstance(piece, str) else piece for piece in content]
+            
+            if kind == "heading":
+                pieces.append(f"<h2>Section: {html.escape(label)}</h2>\n")
+            elif kind == "text":
+                pieces.append("<p>")
+                pieces.extend(content)
+                pieces.append("</p>\n")
+            elif kind in ("field", "note"):
+                pieces.append(f"<li class=\"depth-{depth}\"><strong>{html.escape(label)}:</strong>")
+                if content:
+                    pieces.append(" ")
+                pieces.extend(content)
+                pieces.append("</li>\n")
+            elif kind == "numbered":
+                pieces.append(f"<li class=\"depth-{depth}\">{html.escape(label)}<strong>")
+                pieces.extend(content)
+                pieces.append("</strong></li>\n")
+            elif kind != "blank":
+                formula = " formula" if kind == "formula" else ""
+                pieces.append(f"<li class=\"depth-{depth}{formula}\">")
+                pieces.extend(content)
+                pieces.append("</li>\n")
+        if in_list:
+            pieces.append("</ul>\n")
+        pieces.append("</div>")
+        return pieces
+
+    def _json_pieces(self):
+        kpis = self.kpis
+        dumps = json.dumps
+        pieces = ["{\"validation\": {\"html_structure\": [\"head\", \"body\", \"kpi-report\"], \"kpi_presence\": {"]
+        for number, kpi in enumerate(kpis.names):
+            pieces.extend([", " if number else "", dumps(kpi), ": ", ("presence", kpi)])
+        pieces.append(f"}}, \"thresholds\": {dumps(self.rules.texts)}}}, \"kpis\": [")
+        for number, kpi in enumerate(kpis.names):
+            definition = kpis.definitions[kpi]
+            pieces.extend([
+                ", " if number else "", f"{{\"name\": {dumps(kpi)}, \"value\": ", ("value", kpi),
+                f", \"threshold\": {dumps(self.rules.texts[kpi])}, \"passed\": ", ("passed", kpi),
+                f", \"calculation_steps\": {dumps(list(definition.calculation_steps))}}}"
+            ])
+        pieces.extend(["], \"executive_summary\": ", ("summary", None), "}"])
+        return pieces
+
+# Compiled templates, keyed by KPI definitions fingerprint, output format and threshold rule set
+_report_templates = {}
+
+def get_report_template(kpis, output_format="markdown", rules=None):
+    """Return the compiled ReportTemplate for a compiled registry and rule set, building it on first use"""
+    rules = rules or ThresholdRuleSet.defaults(kpis)
+    key = (kpis.fingerprint, output_format, rules.fingerprint)
+    template = _report_templates.get(key)
+    if template is None:
+        template = _report_templates[key] = ReportTemplate(kpis, output_format, rules)
+    return template
+
+# Literal markers validate_html looks for, in the order its error message lists them
+PRESCAN_SECTION_MARKERS = (
+    ("<head>", ("<head>",)),
+    ("<body>", ("<body>",)),
+    ("<div id='kpi-report'>", ('id="kpi-report"', "id='kpi-report'"))
+)
+
+# Heading start tags; html.parser ends a tag name at whitespace, "/" or ">"
+HEADING_START_TAG = re.compile(r"<[hH]([1-6])(?=[\s/>])")
+
+class PreScan:
+    """What a linear pre-scan established about a document, before any parsing"""
+
+    __slots__ = ("missing_sections", "literal_kpis")
+
+    def __init__(self, missing_sections, literal_kpis):
+        # Section names for the validate_html error, in message order
+        self.missing_sections = missing_sections
+        
+        # KPI names that occur verbatim somewhere in the raw document
+        self.literal_kpis = literal_kpis
+
+def prescan_report(html_content, kpis):
+    """Find the section markers and KPI names with C-level substring searches, before any parsing"""
+    missing_sections = [
+        section for section, literals in PRESCAN_SECTION_MARKERS
+        if not any(literal in html_content for literal in literals)
+    ]
+    return PreScan(missing_sections, {kpi for kpi in kpis.names if kpi in html_content})
+
+def headings_are_plain(html_content):
+    """Check that every heading's content runs straight to its own end tag with no markup or '&' in it.
+
+    Heading text is then a verbatim slice of the document, so a KPI name that never occurs in the
+    raw text cannot be matched by either parser engine and its absence is certain without a parse.
+    """
+    find = html_content.find
+    for match in HEADING_START_TAG.finditer(html_content):
+        start = match.end()
+        tag_end = find(">", start)
+        if tag_end == -1 or find("<", start, tag_end) != -1:
+            return False
+        content_end = find("<", tag_end + 1)
+        if find("&", tag_end + 1, len(html_content) if content_end == -1 else content_end) != -1:
+            return False
+        if content_end == -1:
+            continue
+        closing = html_content[content_end:content_end + 5]
+        if not (len(closing) == 5 and closing[:4].lower() == f"</h{match.group(1)}"
+                and closing[4] in " \t\n\r\f/>"):
+            return False
+    return True
+
+class NonConformingDocument(Exception):
+    """Raised by a parser backend that cannot guarantee the reference result for a document"""
+
+class StreamParserBackend:
+    """Single-pass HTMLParser extractor; handles every document"""
+
+    name = "stream"
+    complete = True
+
+    def collect(self, html_content, kpis):
+        extractor = KPIStreamExtractor(max_paragraphs=kpis.max_fields)
+        extractor.extract(html_content)
+        if not extractor.found_report:
+            return None
+        return extractor.sections(kpis.names)
+
+class SoupParserBackend:
+    """The original engine: a full BeautifulSoup tree searched once per KPI; handles every document"""
+
+    name = "bs4"
+    complete = True
+
+    def collect(self, html_content, kpis):
+        soup = bs4.BeautifulSoup(html_content, 'html.parser')
+        
+        # Find the KPI report div
+        kpi_report = soup.find('div', id='kpi-report')
+        if not kpi_report:
+            return None
+            
+        sections = {}
+        for kpi in kpis.names:
+            # Find the KPI heading
+            kpi_heading = kpi_report.find(lambda tag: tag.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6'] and kpi in tag.text)
+            if kpi_heading:
+                # Get the next paragraph tags after the heading
+                sections[kpi] = [tag.text for tag in kpi_heading.find_next_siblings('p', limit=kpis.max_fields)]
+        return sections
+
+# Markup lxml's XML parser reads differently from html.parser: character references (e.g. &#128;
+# is "€" in HTML), CDATA sections, namespaces and DTD declarations
+LXML_UNSAFE_MARKUP = ("&#", "<![", "xmlns", "<!ENTITY", "<!ATTLIST")
+
+# XML turns a carriage return not followed by a line feed into "\n"; html.parser keeps it
+LONE_CARRIAGE_RETURN = re.compile(r"\r(?!\n)")
+
+# Tag names html.parser might lowercase into an ASCII name (e.g. a Kelvin sign into "k")
+NON_ASCII_TAG_NAME = re.compile(r"</?[A-Za-z][^\s/>]*[^\x00-\x7f]")
+
+class LxmlParserBackend:
+    """libxml2 in strict XML mode, for well-formed (XHTML-style) reports.
+
+    lxml's recovering HTML parser repairs broken markup differently from html.parser, so only
+    documents that parse as XML without any repair, and whose tree html.parser would build the same
+    way, are accepted; everything else raises NonConformingDocument. One pass over the elements
+    checks the tree and finds the report div; headings, paragraphs and text are then read with
+    lxml's C-level iterators.
+    """
+
+    name = "lxml"
+    complete = False
+
+    def __init__(self):
+        # lxml parsers must not be shared between threads
+        self._local = threading.local()
+        self._etree = None
+
+    def _parser(self):
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            if self._etree is None:
+                # Imported on first use: an extension module cannot be loaded lazily
+                self._etree = importlib.import_module("lxml.etree")
+            parser = self._local.parser = self._etree.XMLParser(
+                resolve_entities=False, no_network=True, load_dtd=False, remove_comments=True, remove_pis=True
+            )
+        return parser
+
+    def collect(self, html_content, kpis):
+        if any(marker in html_content for marker in LXML_UNSAFE_MARKUP) or NON_ASCII_TAG_NAME.search(html_content):
+            raise NonConformingDocument("markup that XML and HTML parse differently")
+        if LONE_CARRIAGE_RETURN.search(html_content):
+            raise NonConformingDocument("line endings that XML and HTML read differently")
+        parser = self._parser()
+        try:
+            root = self._etree.fromstring(html_content, parser)
+        except (self._etree.XMLSyntaxError, ValueError) as exc:
+            raise NonConformingDocument(str(exc))
+        
+        # Tag spellings seen, by the lowercase name html.parser would give them
+        spellings = {}
+        kpi_report = None
+        for element in root.iter():
+            tag = element.tag
+            name = tag.lower()
+            spellings.setdefault(name, set()).add(tag)
+            # html.parser closes void elements at once and keeps script/style content as raw text
+            if name in VOID_TAGS:
+                if len(element) or element.text:
+                    raise NonConformingDocument(f"content inside <{tag}>")
+            elif name == "script" or name == "style":
+                if len(element):
+                    raise NonConformingDocument(f"elements inside <{tag}>")
+            elif name == "div" and kpi_report is None and self._attribute(element, "id") == "kpi-report":
+                kpi_report = element
+        if kpi_report is None:
+            return None
+        
+        hidden = set()
+        for name in STRING_CONTAINER_TAGS:
+            hidden.update(spellings.get(name, ()))
+        heading_tags = [tag for name in HEADING_TAGS for tag in spellings.get(name, ())]
+        paragraph_tags = list(spellings.get("p", ()))
+        
+        headings = [(heading, self._text(heading, hidden))
+                    for heading in kpi_report.iter(*heading_tags) if heading is not kpi_report] if heading_tags else []
+        sections = {}
+        for kpi in kpis.names:
+            for heading, text in headings:
+                if kpi in text:
+                    siblings = heading.itersiblings(*paragraph_tags) if paragraph_tags else ()
+                    sections[kpi] = [self._text(paragraph, hidden)
+                                     for paragraph in itertools.islice(siblings, kpis.max_fields)]
+                    break
+        return sections
+
+    @staticmethod
+    def _attribute(element, name):
+        # html.parser lowercases attribute names; XML forbids duplicates, so at most one matches
+        for key, value in element.attrib.items():
+            if key.lower() == name:
+                return value
+        return None
+
+    @staticmethod
+    def _text(element, hidden):
+        """bs4's .text: all descendant strings, except those inside rt, rp, script, style or template"""
+        if not hidden:
+            return "".join(element.itertext())
+        if element.tag in hidden or any(ancestor.tag in hidden for ancestor in element.iterancestors()):
+            return ""
+        parts = []
+        
+        def walk(node):
+            if node.text:
+                parts.append(node.text)
+            for child in node:
+                if child.tag not in hidden:
+                    walk(child)
+                if child.tail:
+                    parts.append(child.tail)
+        
+        walk(element)
+        return "".join(parts)
+
+class TemplateParserBackend:
+    """Regex fast path for documents laid out exactly like provide_template().
+
+    One compiled pattern per KPI registry matches the whole document: the template's tags in
+    order, only whitespace between them, and entity-free heading and paragraph text. Any other
+    document raises NonConformingDocument.
+    """
+
+    name = "template"
+    complete = False
+
+    def __init__(self):
+        self._patterns = {}
+
+    def _pattern(self, kpis):
+        pattern = self._patterns.get(kpis.fingerprint)
+        if pattern is None:
+            names = kpis.names
+            # A heading holding one KPI name must not also hold another, and names must be literal text
+            if any(a != b and a in b for a in names for b in names) or any(set(name) & set("<&") for name in names):
+                pattern = False
+            else:
+                parts = [r"\s*(?:<!DOCTYPE html>\s*)?<html>\s*<head>\s*<title>[^<&]*</title>\s*</head>\s*"
+                         r"<body>\s*<div id=\"kpi-report\">"]
+                for kpi in names:
+                    parts.append(r"\s*<h2>" + re.escape(kpi) + r"</h2>")
+                    parts.extend(r"\s*<p>([^<&]*)</p>" for _ in kpis.fields[kpi])
+                parts.append(r"\s*</div>\s*</body>\s*</html>\s*")
+                pattern = re.compile("".join(parts))
+            self._patterns[kpis.fingerprint] = pattern
+        return pattern
+
+    def collect(self, html_content, kpis):
+        pattern = self._pattern(kpis)
+        match = pattern.fullmatch(html_content) if pattern else None
+        if match is None:
+            raise NonConformingDocument("not in the template layout")
+        paragraphs = match.groups()
+        sections = {}
+        start = 0
+        for kpi in kpis.names:
+            # Like find_next_siblings('p'), a heading's paragraphs run on past the next heading
+            sections[kpi] = list(paragraphs[start:start + kpis.max_fields])
+            start += len(kpis.fields[kpi])
+        return sections
+
+# Installed backends by name
+PARSER_BACKENDS = {"stream": StreamParserBackend(), "template": TemplateParserBackend()}
+if bs4 is not None:
+    PARSER_BACKENDS["bs4"] = SoupParserBackend()
+if importlib.util.find_spec("lxml") is not None:
+    PARSER_BACKENDS["lxml"] = LxmlParserBackend()
+
+# Package to install for each optional backend
+PARSER_BACKEND_PACKAGES = {"bs4": "beautifulsoup4", "lxml": "lxml"}
+
+# Fastest first for "auto"; the last backend must handle every document
+PARSER_AUTO_ORDER = ("template", "lxml", "stream")
+
+def parser_backend_chain(engine):
+    """Backends tried in order for an engine name; fast paths are followed by the stream backend"""
+    if engine == "auto":
+        return tuple(PARSER_BACKENDS[name] for name in PARSER_AUTO_ORDER if name in PARSER_BACKENDS)
+    if engine in PARSER_BACKENDS:
+        backend = PARSER_BACKENDS[engine]
+        return (backend,) if backend.complete else (backend, PARSER_BACKENDS["stream"])
+    if engine in PARSER_BACKEND_PACKAGES:
+        raise ImportError(f"The {engine} parser engine requires {PARSER_BACKEND_PACKAGES[engine]} (pip install {PARSER_BACKEND_PACKAGES[engine]}).")
+    raise ValueError(f"Unknown parser engine: {engine}")
+
+def parser_engine_names():
+    """Engine names accepted by the analyzer and the CLI"""
+    return ("auto",) + tuple(PARSER_BACKENDS)
+
+# Currency marks accepted before or after a number; they only check the field's dimension
+NUMERIC_CURRENCIES = ("$", "€", "£", "¥", "₹", "USD", "EUR", "GBP", "JPY", "INR")
+
+# Magnitude suffixes as powers of ten; case matters ("m" is not a million)
+NUMERIC_MULTIPLIERS = {"k": 3, "K": 3, "M": 6, "MM": 6, "bn": 9, "B": 9}
+
+# Unit words (lowercase) -> (dimension, factor to the dimension's base unit: hours, or 1 for counts)
+NUMERIC_UNITS = {
+    "min": ("time", 1 / 60), "mins": ("time", 1 / 60), "minute": ("time", 1 / 60), "minutes": ("time", 1 / 60),
+    "h": ("time", 1), "hr": ("time", 1), "hrs": ("time", 1), "hour": ("time", 1), "hours": ("time", 1),
+    "d": ("time", 24), "day": ("time", 24), "days": ("time", 24),
+    "wk": ("time", 168), "wks": ("time", 168), "week": ("time", 168), "weeks": ("time", 168),
+    "unit": ("count", 1), "units": ("count", 1), "pcs": ("count", 1), "pieces": ("count", 1),
+    "item": ("count", 1), "items": ("count", 1), "order": ("count", 1), "orders": ("count", 1)
+}
+
+# Characters that separate digit groups but are never a decimal mark
+NUMERIC_GROUP_ONLY_SEPARATORS = "'   "
+
+# Messages of the structured parse errors, by reason
+NUMERIC_ERROR_MESSAGES = {
+    "missing_label": 'no "Label:" prefix',
+    "missing_value": "no value after the label",
+    "not_a_number": "{token!r} is not a number",
+    "misplaced_separator": "{token!r} has a misplaced thousands separator",
+    "multiple_decimal_marks": "{token!r} has more than one decimal mark",
+    "conflicting_signs": "{token!r} has more than one sign",
+    "unit_mismatch": "{token!r} is not a {dimension} unit"
+}
+
+def _alternation(literals):
+    # Longest first, so "MM" is tried before "M"
+    return "|".join(re.escape(literal) for literal in sorted(literals, key=len, reverse=True))
+
+class NumericTokenizer:
+    """Table-driven parser for the value after a paragraph's "Label:" prefix.
+
+    One precompiled pattern, assembled from NUMERIC_CURRENCIES, NUMERIC_MULTIPLIERS and the
+    separator tables, reads a value such as "$12,500.00", "1.2k", "-3.5e2", "(40)", "1.234,5" or
+    "2 days" in a single match; a suffix must be on the value's own line. Thousands separators are
+    checked, magnitudes and NUMERIC_UNITS are normalized (time to hours) and the float is built with
+    one correctly rounded float() call.
+
+    A magnitude counts only when it is glued to the number and ends a word ("25B", not "25 B" or
+    "25Bananas"). Like the original pattern, other text after the number is ignored: "962.45On" is
+    962.45 and "25%" is 25; only a unit of another dimension than the field's, set apart from the
+    number, is rejected.
+
+    `decimal_mark` is "." or "," to fix the locale; by default it is inferred per value: the last
+    of "." and "," when both occur, a lone "," before exactly three digits is a thousands separator,
+    any other single "," or "." is the decimal mark.
+    """
+
+    VALUE_PATTERN = re.compile(
+        r"\s*(?P<open>\()?\s*(?P<sign>[-+−])?\s*"
+        r"(?P<currency>" + _alternation(NUMERIC_CURRENCIES) + r")?\s*(?P<sign2>[-+−])?"
+        r"(?P<number>\d+(?:[.,'   ]\d+)*|[.,]\d+)(?P<exponent>[eE][-+]?\d+)?"
+        r"(?:(?P<multiplier>" + _alternation(NUMERIC_MULTIPLIERS) + r")(?![^\W\d_]))?"
+        r"(?P<gap>[^\S\n]*)(?P<suffix>" + _alternation(NUMERIC_CURRENCIES) + r"|%|[^\W\d_]+)?"
+        r"[^\S\n]*(?P<close>\))?"
+    )
+    
+    # Fast path for the common "Label: 123" / "Label: 12.5" paragraph
+    PLAIN_VALUE = re.compile(r"[^:]*:\s*(\d+(?:\.\d+)?)\s*")
+
+    def __init__(self, decimal_mark=None):
+        if decimal_mark not in (None, ".", ","):
+            raise ValueError(f"Unsupported decimal mark: {decimal_mark!r}")
+        self.decimal_mark = decimal_mark
+        
+        # Identifies the parsing rules in content-addressed cache keys
+        self.fingerprint = f"numeric-2:{decimal_mark or 'auto'}"
+
+    def parse(self, text, dimension=None):
+        """Return (value, None), or (None, error) with the error's `reason`, `message` and the offending `token`.
+
+        The value is read after the first ":" that is followed by one, as with the original pattern.
+        `dimension` ("time", "currency" or "count") rejects units of another kind.
+        """
+        plain = self.PLAIN_VALUE.fullmatch(text)
+        if plain is not None:
+            return float(plain.group(1)), None
+        first = text.find(":")
+        if first == -1:
+            return None, self._error("missing_label", "")
+        colon = first
+        while colon != -1:
+            match = self.VALUE_PATTERN.match(text, colon + 1)
+            if match is not None:
+                return self._value(match, dimension)
+            colon = text.find(":", colon + 1)
+        
+        rest = text[first + 1:].split()
+        return None, self._error("not_a_number", rest[0]) if rest else self._error("missing_value", "")
+
+    def _value(self, match, dimension):
+        token = match.group().strip()
+        number = match["number"]
+        if match["sign"] and match["sign2"]:
+            return None, self._error("conflicting_signs", token)
+        negative = (match["sign"] or match["sign2"] or "+") in "-\u2212"
+        if match["open"] and match["close"]:
+            # Accounting notation: (40) is -40
+            if negative:
+                return None, self._error("conflicting_signs", token)
+            negative = True
+        
+        digits, error = self._digits(number)
+        if error:
+            return None, self._error(error, number)
+        exponent = int(match["exponent"][1:]) if match["exponent"] else 0
+        if match["multiplier"]:
+            exponent += NUMERIC_MULTIPLIERS[match["multiplier"]]
+        
+        factor = 1
+        currency = match["currency"]
+        suffix = match["suffix"]
+        if suffix:
+            # Text glued to the number that is no unit of the field ("600Orders" in a time field) is
+            # run-on prose, as are words we do not know
+            glued = not match["gap"]
+            if suffix in NUMERIC_CURRENCIES:
+                if not glued or dimension in (None, "currency"):
+                    currency = currency or suffix
+            elif suffix.lower() in NUMERIC_UNITS:
+                unit_dimension, unit_factor = NUMERIC_UNITS[suffix.lower()]
+                if dimension is None or unit_dimension == dimension:
+                    factor = unit_factor
+                elif not glued:
+                    return None, self._error("unit_mismatch", suffix, dimension)
+        if currency and dimension is not None and dimension != "currency":
+            return None, self._error("unit_mismatch", currency, dimension)
+        
+        value = float(f"{'-' if negative else ''}{digits}e{exponent}")
+        if math.isinf(value):
+            return None, self._error("not_a_number", token)
+        return (value * factor if factor != 1 else value), None
+
+    def _digits(self, number):
+        """Plain "1234.5" digits for a number written with any separators, or an error reason"""
+        if number.isdigit():
+            return number, None
+        decimal = self.decimal_mark
+        if decimal is None:
+            commas, points = number.count(","), number.count(".")
+            if commas and points:
+                decimal = "." if number.rfind(".") > number.rfind(",") else ","
+            elif commas == 1:
+                # "12,500" groups thousands, "12,5" has a decimal comma
+                comma = number.find(",")
+                decimal = "." if comma > 0 and len(number) - comma == 4 and number[comma + 1:].isdigit() else ","
+            else:
+                decimal = "," if points > 1 else "."
+        group = "," if decimal == "." else "."
+        for separator in NUMERIC_GROUP_ONLY_SEPARATORS:
+            if separator in number:
+                number = number.replace(separator, group)
+        
+        integer, _, fraction = number.partition(decimal)
+        if decimal in fraction:
+            return None, "multiple_decimal_marks"
+        if group in fraction:
+            return None, "misplaced_separator"
+        if group in integer:
+            groups = integer.split(group)
+            # Western 1,234,567 or Indian 12,34,567 grouping
+            western = 0 < len(groups[0]) <= 3 and all(len(part) == 3 for part in groups[1:])
+            indian = (0 < len(groups[0]) <= 2 and len(groups[-1]) == 3
+                      and all(len(part) == 2 for part in groups[1:-1]))
+            if not (western or indian):
+                return None, "misplaced_separator"
+            integer = "".join(groups)
+        return f"{integer or '0'}.{fraction}" if fraction else integer, None
+
+    @staticmethod
+    def _error(reason, token, dimension=None):
+        return {"reason": reason, "message": NUMERIC_ERROR_MESSAGES[reason].format(token=token, dimension=dimension),
+                "token": token}
+
+# Tokenizer used unless an analyzer is given its own
+NUMERIC_TOKENIZER = NumericTokenizer()
+
+class AnalysisResult:
+    """Everything one analysis produces; the analyzer itself keeps no per-report state"""
+
+    __slots__ = ("kpi_data", "calculated_values", "errors", "report", "trends", "parse_errors", "changes", "assessments")
+
+    def __init__(self, kpi_data=None, calculated_values=None, errors=None, report=None, trends=None,
+                 parse_errors=None):
+        self.kpi_data = {} if kpi_data is None else kpi_data
+        self.calculated_values = {} if calculated_values is None else calculated_values
+        self.errors = [] if errors is None else errors
+        self.report = report
+        # One dict per rejected field value: kpi, field, reason, message and the offending token
+        self.parse_errors = [] if parse_errors is None else parse_errors
+        # Per-KPI trend state after this report was added to a KPIHistoryStore, if one was used
+        self.trends = trends
+        # KPIs whose calculated value moved since the previous version, from a DifferentialAnalyzer
+        self.changes = None
+        # Threshold outcome of every calculated KPI (see ThresholdRuleSet.classify), set by calculate_kpis
+        self.assessments = None
+
+    @property
+    def ok(self):
+        return not self.errors
+
+def call_stage(stage, function, *args):
+    """Stage hook of uninstrumented analyses: runs the stage function and nothing else"""
+    return function(*args)
+
+class SupplyChainReportAnalyzer:
+    """Reentrant analyzer: one instance can serve any number of reports, from any thread.
+
+    KPI metadata is shared through the compiled registry and every call gets its own
+    AnalysisResult, so nothing is rebuilt per call and nothing leaks between reports.
+    """
+
+    __slots__ = ("registry", "parser_engine", "backends", "cache", "output_format", "instrumentation", "history",
+                 "tokenizer", "rules")
+
+    def __init__(self, parser_engine="auto", registry=None, cache=None, output_format="markdown",
+                 instrumentation=None, history=None, tokenizer=None, rules=None):
+        # KPI definitions (inputs, formulas, thresholds and report text) come from the registry
+        self.registry = registry or KPI_REGISTRY
+        
+        # "stream" reads the document once; "bs4" builds a full BeautifulSoup tree; "lxml" and
+        # "template" are fast paths for well-formed and template-shaped reports; "auto" tries the
+        # installed backends fastest first and falls back when a document does not conform
+        self.parser_engine = parser_engine
+        self.backends = parser_backend_chain(parser_engine)
+        
+        # Optional ReportCache; re-submitted reports then skip parsing entirely
+        self.cache = cache
+        
+        # Rendering of full reports: markdown, text, html or json (error-only results stay plain lines)
+        if output_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {output_format}")
+        self.output_format = output_format
+        
+        # Optional AnalysisInstrumentation; it times each stage of run_pipeline through the stage hook
+        self.instrumentation = instrumentation
+        
+        # Optional KPIHistoryStore; reports analyzed with a site are appended and get trend statements
+        self.history = history
+        
+        # NumericTokenizer reading field values; pass NumericTokenizer(",") for decimal-comma reports
+        self.tokenizer = tokenizer or NUMERIC_TOKENIZER
+        
+        # ThresholdRules with the per-tenant and per-site threshold overrides (none by default)
+        self.rules = rules or get_threshold_rules(self.registry)
+
+    @property
+    def kpis(self):
+        """Compiled KPI lookup tables, shared by every analyzer using the same registry"""
+        return self.registry.compile()
+
+    @property
+    def required_kpis(self):
+        return self.kpis.required
+
+    @property
+    def thresholds(self):
+        return self.rules.resolve().texts
+
+    def validate_html(self, html_content, result, scan=None):
+        """Validate HTML structure and required sections"""
+        # Check for basic HTML structure: <head>, <body> and the kpi-report div, found in one pass
+        if scan is None:
+            scan = prescan_report(html_content, self.kpis)
+            
+        if scan.missing_sections:
+            result.errors.append(f"ERROR: Missing required HTML section(s): {', '.join(scan.missing_sections)}.")
+            return False
+            
+        return True
+
+    def reject_early(self, html_content, result, scan):
+        """Settle documents that provably lack a required KPI heading without the configured parser.
+
+        Such a report is always rejected. Its exact errors (invalid values of the KPIs that are
+        present, then the missing-KPI list, or a missing kpi-report div) come from one streaming
+        pass, so the bs4 engine never builds a tree for it. Returns False when the full parse is needed.
+        """
+        kpis = self.kpis
+        if all(kpi in scan.literal_kpis for kpi in kpis.required):
+            return False
+        if not headings_are_plain(html_content):
+            return False
+        
+        sections = PARSER_BACKENDS["stream"].collect(html_content, kpis)
+        if sections is None:
+            result.errors.append("ERROR: Missing required HTML section(s): kpi-report.")
+        else:
+            self.extract_sections(sections, result)
+        return True
+
+    def parse_html(self, html_content, result):
+        """Parse HTML and extract KPI data"""
+        sections = self.collect_sections(html_content, result)
+        if sections is None:
+            return False
+        
+        return self.extract_sections(sections, result)
+
+    def collect_sections(self, html_content, result):
+        """Run the parser engine; returns None (with the error recorded) when there is no kpi-report div"""
+        kpis = self.kpis
+        for backend in self.backends:
+            try:
+                sections = backend.collect(html_content, kpis)
+                break
+            except NonConformingDocument:
+                # The last backend of every chain handles all documents
+                continue
+        
+        if sections is None:
+            result.errors.append("ERROR: Missing required HTML section(s): kpi-report.")
+        return sections
+
+    def extract_sections(self, sections, result):
+        """Extract KPI data from the paragraph texts collected under each KPI heading"""
+        kpis = self.kpis
+        
+        # Extract KPI data
+        missing_kpis = []
+        for kpi in kpis.names:
+            next_tags = sections.get(kpi)
+            
+            if next_tags is None:
+                if kpis.definitions[kpi].required:
+                    missing_kpis.append(kpi)
+                continue
+            self.extract_section(kpi, next_tags, result)
+        
+        if missing_kpis:
+            result.errors.append(f"ERROR: Missing required KPI(s): {', '.join(missing_kpis)}.")
+            return False
+            
+        return True
+
+    def extract_section(self, kpi, next_tags, result):
+        """Extract one KPI's input fields from the paragraphs after its heading"""
+        # Initialize data for this KPI
+        result.kpi_data[kpi] = {}
+        
+        fields = self.kpis.fields[kpi]
+        if len(next_tags) >= len(fields):
+            for text, field_name in zip(next_tags, fields):
+                self.extract_numeric_value(text, field_name, kpi, result)
+
+    def extract_numeric_value(self, text, field_name, kpi, result):
+        """Extract numeric value from text and validate"""
+        value, error = self.tokenizer.parse(text, self.kpis.field_dimensions.get(field_name))
+        if error is None:
+            result.kpi_data[kpi][field_name] = value
+        else:
+            result.parse_errors.append({"kpi": kpi, "field": field_name, **error})
+            result.errors.append(f"ERROR: Invalid data type for KPI(s): {field_name}. Please ensure numeric values.")
+
+    def calculate_kpis(self, result, rules=None):
+        """Calculate all KPIs based on extracted data and assess them against the thresholds in `rules`"""
+        for kpi in self.kpis.names:
+            data = result.kpi_data.get(kpi)
+            if data is None:
+                continue
+            value = self.calculate_kpi(kpi, data)
+            if value is not None:
+                result.calculated_values[kpi] = value
+        result.assessments = (rules or self.rules.resolve()).classify(result.calculated_values)
+
+    def calculate_kpi(self, kpi, data):
+        """One KPI's rounded value from its extracted fields, or None when a field is missing or the formula is undefined"""
+        kpis = self.kpis
+        fields = kpis.fields[kpi]
+        if all(field in data for field in fields):
+            value = kpis.formulas[kpi](*[data[field] for field in fields])
+            if value is not None:
+                return round(value, 2)
+        return None
+
+    def generate_executive_summary(self, result):
+        """Generate an executive summary based on calculated KPIs"""
+        if not result.calculated_values:
+            return "Insufficient data to generate an executive summary."
+        
+        # Strengths and concerns come from the structured threshold assessments, in KPI order
+        assessments = result.assessments
+        if assessments is None:
+            assessments = self.rules.resolve().classify(result.calculated_values)
+        strengths = [assessment["statement"] for assessment in assessments if assessment["passed"]]
+        concerns = [assessment["statement"] for assessment in assessments if not assessment["passed"]]
+        
+        overall = []
+        if strengths:
+            overall.append("Strengths: " + " ".join(strengths))
+        if concerns:
+            overall.append("Areas for improvement: " + " ".join(concerns))
+        
+        # Trends against earlier reports from the same site
+        trends = trend_statements(result.trends, self.kpis) if result.trends else []
+        if trends:
+            overall.append("Trends: " + " ".join(trends))
+        
+        if len(strengths) > len(concerns):
+            overall.insert(0, "Overall, the supply chain is performing well with some areas that could be improved.")
+        elif len(strengths) < len(concerns):
+            overall.insert(0, "Overall, the supply chain has several performance issues that require attention.")
+        else:
+            overall.insert(0, "The supply chain shows mixed performance with equal strengths and areas for improvement.")
+        
+        return "\n".join(overall)
+
+    def generate_report(self, result, rules=None):
+        """Generate the final structured report"""
+        return self.render_report(result, self.generate_executive_summary(result), rules)
+
+    def render_report(self, result, summary, rules=None):
+        """Fill the compiled report template for this analyzer's output format and threshold rule set"""
+        return get_report_template(self.kpis, self.output_format, rules or self.rules.resolve()).render(result, summary)
+
+    def cache_lookup(self, html_content, rules=None):
+        """Return (cache key, cached AnalysisResult or None); the key is None when the report is not cacheable"""
+        cache_key = report_cache_key(html_content, self.kpis, self.output_format, self.tokenizer,
+                                     rules or self.rules.resolve())
+        entry = self.cache.get(cache_key) if cache_key else None
+        if entry is None:
+            return cache_key, None
+        cached = AnalysisResult(entry["kpi_data"], entry["calculated_values"], entry["errors"], entry["report"],
+                                parse_errors=entry["parse_errors"])
+        cached.assessments = entry["assessments"]
+        return cache_key, cached
+
+    def cache_store(self, cache_key, result):
+        self.cache.put(cache_key, {
+            "kpi_data": result.kpi_data,
+            "calculated_values": result.calculated_values,
+            "errors": result.errors,
+            "parse_errors": result.parse_errors,
+            "assessments": result.assessments or [],
+            "report": result.report
+        })
+
+    def prepare_history(self, result, site, date=None):
+        """Keep the site's trends updated with the calculated values on the result, for the summary.
+
+        Returns the entry for record_history(), or None when there is nothing to record or the store
+        could not be read; such failures are logged and the report is rendered without trends.
+        """
+        if not result.calculated_values:
+            return None
+        passed = {assessment["kpi"]: assessment["passed"] for assessment in result.assessments}
+        try:
+            entry = self.history.prepare(site, date, result.calculated_values, self.kpis, passed)
+        except Exception as exc:
+            logger.warning("Could not read KPI history of site %s: %s: %s", site, exc.__class__.__name__, exc)
+            return None
+        result.trends = entry["trends"]
+        return entry
+
+    def record_history(self, entry):
+        """Write a prepared history entry once the report is rendered; failures are logged, never raised"""
+        try:
+            self.history.commit(entry)
+        except Exception as exc:
+            logger.warning("Could not record KPI history of site %s: %s: %s", entry["site"], exc.__class__.__name__, exc)
+
+    def analyze(self, html_content, site=None, date=None, tenant=None):
+        """Analyze an HTML report and return its AnalysisResult.
+
+        Thresholds are those of `tenant` and `site` in the rule engine. With a history store and a
+        `site`, the values are appended to the site's history as of `date` (default: today) and the
+        summary gains trend statements; such reports bypass the result cache.
+        """
+        if self.instrumentation is not None:
+            return self.instrumentation.analyze(self, html_content, site=site, date=date, tenant=tenant)
+        return self.run_pipeline(call_stage, AnalysisResult(), html_content, site=site, date=date, tenant=tenant)
+
+    def analyze_report(self, html_content):
+        """Main function to analyze the HTML report and generate the final report"""
+        return self.analyze(html_content).report
+
+    def analyze_sections(self, sections):
+        """Analyze one kpi-report div whose sections were already collected by a stream extractor"""
+        if self.instrumentation is not None:
+            return self.instrumentation.analyze(self, sections=sections)
+        return self.run_pipeline(call_stage, AnalysisResult(), sections=sections)
+
+    def run_pipeline(self, stage, result, html_content=None, sections=None, site=None, date=None, tenant=None):
+        """The stages of analyze() (or, given `sections`, of analyze_sections()), each run as stage(name, function, *args).
+
+        `stage` is the hook instrumentation uses to time the stages; call_stage just runs them. Fills
+        and returns `result`, or returns the cached AnalysisResult on a cache hit.
+        """
+        rules = self.rules.resolve(tenant, site)
+        tracked = self.history is not None and site is not None
+        cache_key = None
+        if sections is None:
+            scan = stage("prescan", prescan_report, html_content, self.kpis)
+            if (not stage("validate_html", self.validate_html, html_content, result, scan)
+                    or stage("reject_early", self.reject_early, html_content, result, scan)):
+                result.report = "\n".join(result.errors)
+                return result
+            if self.cache is not None and not tracked:
+                cache_key, cached = stage("cache_lookup", self.cache_lookup, html_content, rules)
+                if cached is not None:
+                    return cached
+            sections = stage("parse_html", self.collect_sections, html_content, result)
+        
+        if sections is not None and stage("extract_values", self.extract_sections, sections, result):
+            stage("calculate_kpis", self.calculate_kpis, result, rules)
+            entry = stage("prepare_history", self.prepare_history, result, site, date) if tracked else None
+            summary = stage("generate_executive_summary", self.generate_executive_summary, result)
+            result.report = stage("render_report", self.render_report, result, summary, rules)
+            # History is written only for a rendered report, and a failed write does not fail the analysis
+            if entry is not None:
+                stage("record_history", self.record_history, entry)
+        else:
+            result.report = "\n".join(result.errors)
+        
+        if cache_key:
+            stage("cache_store", self.cache_store, cache_key, result)
+        return result
+
+def section_fingerprint(paragraphs):
+    """Digest of the paragraph texts collected under one KPI heading (None when the heading is absent)"""
+    if paragraphs is None:
+        return None
+    return hashlib.blake2b("\x00".join(paragraphs).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+class DifferentialAnalyzer:
+    """Re-analysis of successive versions of the same reports, keyed by report ID.
+
+    For each ID the previous version's per-KPI state (section fingerprint, extracted fields, errors
+    and calculated value), its executive summary and its rendered report parts are kept, for at most
+    `max_reports` IDs in LRU order. A version whose kpi-report div is byte-identical is not parsed;
+    otherwise only the KPIs whose section fingerprint changed are re-extracted and recalculated and
+    only their slots of the report are refilled; the summary is rebuilt only when a value moved.
+    Results equal those of `analyzer.analyze()` and also carry `changes`, the KPIs whose value moved
+    with their previous value. The analyzer's cache, history and instrumentation are not used.
+    """
+
+    def __init__(self, analyzer=None, max_reports=10000):
+        self.analyzer = analyzer or get_analyzer()
+        self.max_reports = max_reports
+        self.reports = 0
+        self.kpis_recomputed = 0
+        self.kpis_reused = 0
+        self._states = collections.OrderedDict()
+
+    def analyze(self, report_id, html_content, tenant=None, site=None):
+        """Analyze a new version of report `report_id` and return its AnalysisResult with `changes`"""
+        analyzer = self.analyzer
+        kpis = analyzer.kpis
+        rules = analyzer.rules.resolve(tenant, site)
+        result = AnalysisResult()
+        result.changes = []
+        self.reports += 1
+        if not analyzer.validate_html(html_content, result):
+            result.report = "\n".join(result.errors)
+            return result
+        
+        # The result cache's div scan: commented-out divs and '</div>' in raw text do not move the slice,
+        # and markup it cannot slice safely gets no digest, so that version is parsed
+        div = extract_kpi_report_div(html_content)
+        digest = None if div is None else hashlib.blake2b(div.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        previous = self._states.get(report_id)
+        if previous is not None and digest is not None and previous["digest"] == digest:
+            # An unchanged kpi-report div has unchanged sections, so the document is not parsed at all
+            sections = None
+        else:
+            sections = analyzer.collect_sections(html_content, result)
+            if sections is None:
+                result.report = "\n".join(result.errors)
+                return result
+        
+        self._states.pop(report_id, None)
+        sections_state = {}
+        changed = set()
+        missing_kpis = []
+        for kpi in kpis.names:
+            state = previous["sections"][kpi] if previous is not None else None
+            if sections is not None:
+                paragraphs = sections.get(kpi)
+                fingerprint = section_fingerprint(paragraphs)
+                if state is None or state["fingerprint"] != fingerprint:
+                    state = self._section_state(kpi, paragraphs, fingerprint)
+                    changed.add(kpi)
+            if kpi in changed:
+                self.kpis_recomputed += 1
+            else:
+                self.kpis_reused += 1
+            sections_state[kpi] = state
+            
+            if state["data"] is None:
+                if kpis.definitions[kpi].required:
+                    missing_kpis.append(kpi)
+                continue
+            result.kpi_data[kpi] = dict(state["data"])
+            result.errors.extend(state["errors"])
+            result.parse_errors.extend(dict(error) for error in state["parse_errors"])
+        
+        summary = parts = None
+        if missing_kpis:
+            result.errors.append(f"ERROR: Missing required KPI(s): {', '.join(missing_kpis)}.")
+            result.report = "\n".join(result.errors)
+        else:
+            for kpi in kpis.names:
+                value = sections_state[kpi]["value"]
+                if value is not None:
+                    result.calculated_values[kpi] = value
+            result.assessments = rules.classify(result.calculated_values)
+            
+            template = get_report_template(kpis, analyzer.output_format, rules)
+            if previous is not None and previous["parts"] is not None and previous["rules"] == rules.fingerprint:
+                # repr, not ==, so a value flipping between 0.0 and -0.0 still rebuilds the summary text
+                if all(repr(sections_state[kpi]["value"]) == repr(previous["sections"][kpi]["value"]) for kpi in changed):
+                    summary = previous["summary"]
+                else:
+                    summary = analyzer.generate_executive_summary(result)
+                parts = template.fill(previous["parts"], result, summary, changed)
+            else:
+                summary = analyzer.generate_executive_summary(result)
+                parts = template.fill(template.blank(), result, summary)
+            result.report = "".join(parts)
+        
+        old_values = previous["values"] if previous is not None else {}
+        for kpi in kpis.names:
+            old, new = old_values.get(kpi), result.calculated_values.get(kpi)
+            if old != new:
+                delta = None if old is None or new is None else round(new - old, 2)
+                result.changes.append({"kpi": kpi, "previous": old, "value": new, "delta": delta})
+        
+        self._states[report_id] = {
+            "digest": digest,
+            "rules": rules.fingerprint,
+            "sections": sections_state,
+            "values": dict(result.calculated_values),
+            "summary": summary,
+            "parts": parts
+        }
+        while len(self._states) > self.max_reports:
+            self._states.popitem(last=False)
+        return result
+
+    def forget(self, report_id):
+        """Drop the state kept for `report_id`; its next version is analyzed in full"""
+        self._states.pop(report_id, None)
+
+    def stats(self):
+        """Report and per-KPI recompute/reuse counters"""
+        sections = self.kpis_recomputed + self.kpis_reused
+        return {
+            "reports": self.reports,
+            "tracked_reports": len(self._states),
+            "kpis_recomputed": self.kpis_recomputed,
+            "kpis_reused": self.kpis_reused,
+            "reuse_rate": self.kpis_reused / sections if sections else 0.0
+        }
+
+    def _section_state(self, kpi, paragraphs, fingerprint):
+        analyzer = self.analyzer
+        scratch = AnalysisResult()
+        if paragraphs is not None:
+            analyzer.extract_section(kpi, paragraphs, scratch)
+        data = scratch.kpi_data.get(kpi)
+        return {
+            "fingerprint": fingerprint,
+            "data": data,
+            "errors": scratch.errors,
+            "parse_errors": scratch.parse_errors,
+            "value": None if data is None else analyzer.calculate_kpi(kpi, data)
+        }
+
+# Error message prefixes grouped into the kinds reported by instrumentation sinks
+ERROR_KINDS = (
+    ("ERROR: Missing required HTML section(s)", "missing_section"),
+    ("ERROR: Missing required KPI(s)", "missing_kpi"),
+    ("ERROR: Invalid data type", "invalid_value"),
+    ("ERROR: Could not analyze report", "exception")
+)
+
+def error_kind(message):
+    """Short kind name for an analyzer error message"""
+    for prefix, kind in ERROR_KINDS:
+        if message.startswith(prefix):
+            return kind
+    return "other"
+
+class AnalysisInstrumentation:
+    """Runs the analyzer stages under a timer and hands one event per report to each sink.
+
+    Every stage records its wall time and the net change in allocated memory blocks
+    (`sys.getallocatedblocks`, which walks the allocator arenas and costs a few microseconds
+    on a large heap; `track_allocations=False` skips it). Events are plain dicts, so sinks can
+    aggregate, export or log them; a sink is any object with `record(event)` and optionally `close()`.
+    """
+
+    def __init__(self, sinks=(), track_allocations=True):
+        self.sinks = list(sinks)
+        self.track_allocations = track_allocations
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, event):
+        """Pass an event to every sink (also used to forward events recorded in worker processes)"""
+        for sink in self.sinks:
+            sink.record(event)
+
+    def close(self):
+        for sink in self.sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+
+    def analyze(self, analyzer, html_content=None, sections=None, site=None, date=None, tenant=None):
+        """Run analyzer.run_pipeline with every stage timed through its stage hook, then emit the report's event"""
+        stages = {}
+        clock = time.perf_counter
+        # int() returns 0, so untracked stages report a zero block delta
+        allocated_blocks = sys.getallocatedblocks if self.track_allocations else int
+        
+        def measure(stage, call, *args):
+            blocks = allocated_blocks()
+            start = clock()
+            outcome = call(*args)
+            stages[stage] = {"seconds": clock() - start, "allocated_blocks": allocated_blocks() - blocks}
+            return outcome
+        
+        result = analyzed = AnalysisResult()
+        started = clock()
+        try:
+            analyzed = analyzer.run_pipeline(measure, result, html_content, sections, site, date, tenant)
+            return analyzed
+        except Exception as exc:
+            result.errors.append(f"ERROR: Could not analyze report: {exc.__class__.__name__}: {exc}")
+            raise
+        finally:
+            # On a cache hit the pipeline returns the stored result instead of the one it was given
+            cache_hit = analyzed is not result
+            errors = collections.Counter(error_kind(message) for message in analyzed.errors)
+            self.emit({
+                "event": "report_analyzed",
+                "engine": analyzer.parser_engine,
+                "ok": not analyzed.errors,
+                "cache_hit": cache_hit,
+                "seconds": clock() - started,
+                "stages": stages,
+                "errors": dict(errors)
+            })
+
+# Upper bounds (seconds) of the stage latency histogram buckets; the last bucket is +Inf
+STAGE_SECONDS_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class MetricsAggregator:
+    """In-process sink: per-stage latency histograms, allocation totals and error counts by kind"""
+
+    def __init__(self, buckets=STAGE_SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.reports = collections.Counter()
+        self.cache_hits = 0
+        self.errors = collections.Counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        with self._lock:
+            self.reports["ok" if event["ok"] else "error"] += 1
+            if event["cache_hit"]:
+                self.cache_hits += 1
+            self.errors.update(event["errors"])
+            for stage, timing in event["stages"].items():
+                metrics = self.stages.get(stage)
+                if metrics is None:
+                    metrics = self.stages[stage] = {
+                        "buckets": [0] * (len(self.buckets) + 1), "count": 0, "seconds": 0.0,
+                        "allocated_blocks": 0, "max_allocated_blocks": 0
+                    }
+                metrics["buckets"][bisect.bisect_left(self.buckets, timing["seconds"])] += 1
+                metrics["count"] += 1
+                metrics["seconds"] += timing["seconds"]
+                metrics["allocated_blocks"] += timing["allocated_blocks"]
+                metrics["max_allocated_blocks"] = max(metrics["max_allocated_blocks"], timing["allocated_blocks"])
+
+    def snapshot(self):
+        """Copy of the current totals: reports, errors by kind and per-stage histograms"""
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "reports": dict(self.reports),
+                "cache_hits": self.cache_hits,
+                "errors": dict(self.errors),
+                "stages": {
+                    stage: dict(metrics, buckets=list(metrics["buckets"]))
+                    for stage, metrics in self.stages.items()
+                }
+            }
+
+def prometheus_text(aggregator, prefix="supply_chain"):
+    """Render a MetricsAggregator in the Prometheus text exposition format"""
+    snapshot = aggregator.snapshot()
+    lines = [
+        f"# HELP {prefix}_reports_total Reports analyzed, by outcome.",
+        f"# TYPE {prefix}_reports_total counter"
+    ]
+    for outcome, count in sorted(snapshot["reports"].items()):
+        lines.append(f'{prefix}_reports_total{{outcome="{outcome}"}} {count}')
+    
+    lines.append(f"# HELP {prefix}_cache_hits_total Reports answered from the result cache.")
+    lines.append(f"# TYPE {prefix}_cache_hits_total counter")
+    lines.append(f"{prefix}_cache_hits_total {snapshot['cache_hits']}")
+    
+    lines.append(f"# HELP {prefix}_errors_total Validation and extraction errors, by kind.")
+    lines.append(f"# TYPE {prefix}_errors_total counter")
+    for kind, count in sorted(snapshot["errors"].items()):
+        lines.append(f'{prefix}_errors_total{{kind="{kind}"}} {count}')
+    
+    lines.append(f"# HELP {prefix}_stage_seconds Wall time per analysis stage.")
+    lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+    for stage, metrics in snapshot["stages"].items():
+        cumulative = 0
+        for bound, count in zip(snapshot["buckets"] + ["+Inf"], metrics["buckets"]):
+            cumulative += count
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {metrics["seconds"]!r}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {metrics["count"]}')
+    
+    # Net block deltas can be negative when a stage frees more than it allocates, hence a gauge
+    lines.append(f"# HELP {prefix}_stage_allocated_blocks Net memory blocks allocated per analysis stage, summed.")
+    lines.append(f"# TYPE {prefix}_stage_allocated_blocks gauge")
+    for stage, metrics in snapshot["stages"].items():
+        lines.append(f'{prefix}_stage_allocated_blocks{{stage="{stage}"}} {metrics["allocated_blocks"]}')
+    return "\n".join(lines) + "\n"
+
+class PrometheusFileSink:
+    """Aggregates events and rewrites a Prometheus text file every `every` reports and on close.
+
+    The file is replaced atomically, so a node_exporter textfile collector never reads a partial dump.
+    """
+
+    def __init__(self, path, every=1000, aggregator=None):
+        self.path = path
+        self.every = every
+        self.aggregator = aggregator or MetricsAggregator()
+        self._pending = 0
+
+    def record(self, event):
+        self.aggregator.record(event)
+        self._pending += 1
+        if self._pending >= self.every:
+            self.flush()
+
+    def flush(self):
+        self._pending = 0
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(prometheus_text(self.aggregator))
+        os.replace(temporary, self.path)
+
+    def close(self):
+        self.flush()
+
+class StructuredLogSink:
+    """Writes each event as one JSON line (default: stderr)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        line = json.dumps(dict(event, ts=round(time.time(), 6)))
+        with self._lock:
+            (self.stream or sys.stderr).write(line + "\n")
+
+class EventBufferSink:
+    """Keeps events in memory until they are taken, e.g. to ship them back from a worker process"""
+
+    def __init__(self):
+        self.events = []
+
+    def record(self, event):
+        self.events.append(event)
+
+    def take(self):
+        events, self.events = self.events, []
+        return events
+
+def build_instrumentation(metrics_file=None, metrics_log=False):
+    """Instrumentation for the CLI options, or None when no metrics were requested"""
+    sinks = []
+    if metrics_file:
+        sinks.append(PrometheusFileSink(metrics_file))
+    if metrics_log:
+        sinks.append(StructuredLogSink())
+    return AnalysisInstrumentation(sinks) if sinks else None
+
+def round_columnar(values):
+    """Round an array to 2 decimal places with exactly the result of Python's round(x, 2)"""
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    
+    # x * 100 carries a rounding error, so values sitting on a .xx5 tie (and magnitudes too large
+    # for that error to stay negligible) are rounded one by one with round() itself
+    with np.errstate(invalid="ignore"):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        suspect = np.isfinite(values) & (near_tie | (np.abs(values) >= 1e7))
+    for index in np.flatnonzero(suspect):
+        rounded[index] = round(float(values[index]), 2)
+    return rounded
+
+def kpi_columns_from_reports(kpi_data_list, registry=None):
+    """Turn a list of per-report kpi_data dicts into float64 columns, NaN where a field is missing"""
+    kpis = (registry or KPI_REGISTRY).compile()
+    columns = {}
+    for kpi in kpis.names:
+        for field in kpis.fields[kpi]:
+            columns[field] = np.array(
+                [kpi_data.get(kpi, {}).get(field, np.nan) for kpi_data in kpi_data_list],
+                dtype=np.float64
+            )
+    return columns
+
+def calculate_kpis_columnar(columns, registry=None):
+    """Calculate all KPIs for a batch of reports held as columns of raw input fields.
+
+    `columns` maps input field labels (e.g. "Number of Orders") to equal-length arrays; NaN marks
+    a missing field. For each KPI the result holds the rounded `value` (NaN where it cannot be
+    calculated), a `valid` mask, and a `passed` mask for its threshold. Values are identical to
+    what calculate_kpis produces for the same report one at a time.
+    """
+    if np is None:
+        raise ImportError("The columnar calculation engine requires NumPy (pip install numpy).")
+    
+    kpis = (registry or KPI_REGISTRY).compile()
+    results = {}
+    for kpi in kpis.names:
+        inputs = [np.asarray(columns[field], dtype=np.float64) for field in kpis.fields[kpi]]
+        formula = kpis.formulas[kpi]
+        if hasattr(formula, "columnar"):
+            ratio, valid = formula.columnar(*inputs)
+        else:
+            # Plain callables are applied element by element
+            raw = [formula(*row) if not any(math.isnan(v) for v in row) else None for row in zip(*inputs)]
+            valid = np.array([v is not None for v in raw], dtype=bool)
+            ratio = np.array([np.nan if v is None else v for v in raw], dtype=np.float64)
+        value = round_columnar(ratio)
+        
+        compare, threshold = kpis.thresholds[kpi]
+        with np.errstate(invalid="ignore"):
+            passed = valid & compare(value, threshold)
+        results[kpi] = {"value": value, "valid": valid, "passed": passed}
+    return results
+
+# Period dimensions a roll-up can derive from a record's ISO "date" (prefix length of YYYY-MM-DD)
+PERIOD_DIMENSIONS = {"year": 4, "month": 7, "day": 10}
+
+def rollup_columns(records, dimensions, registry=None):
+    """Turn analysed records (dicts with "kpi_data" and dimension attributes) into roll-up input.
+
+    Returns (columns, dimension columns). A dimension missing from a record becomes "", except the
+    PERIOD_DIMENSIONS, which fall back to a prefix of the record's ISO "date".
+    """
+    records = list(records)
+    columns = kpi_columns_from_reports([record.get("kpi_data") or {} for record in records], registry)
+    values = {}
+    for name in dimensions:
+        prefix = PERIOD_DIMENSIONS.get(name)
+        values[name] = np.array([
+            str(record[name]) if name in record else (str(record.get("date") or "")[:prefix] if prefix else "")
+            for record in records
+        ])
+    return columns, values
+
+def _group_codes(codes):
+    """Dense group ids for the rows' combination of factorized dimensions, plus each group's codes"""
+    group = codes[0]
+    groups = int(group.max()) + 1 if len(group) else 0
+    for column in codes[1:]:
+        size = int(column.max()) + 1 if len(column) else 0
+        if groups * size >= 2 ** 62:
+            # Re-number the combinations seen so far before the mixed-radix id could overflow
+            _, group = np.unique(group, return_inverse=True)
+            group = group.reshape(-1)
+            groups = int(group.max()) + 1
+        group = group * size + column
+        groups *= size
+    _, first, inverse = np.unique(group, return_index=True, return_inverse=True)
+    return inverse.reshape(-1), [column[first] for column in codes]
+
+def _grouped_totals(totals, codes):
+    """Sum every column of `totals` within the groups formed by `codes` (all rows when there are none)"""
+    rows = len(totals["reports"])
+    if codes:
+        inverse, group_codes = _group_codes(codes)
+        groups = len(group_codes[0])
+    else:
+        inverse, group_codes, groups = np.zeros(rows, dtype=np.intp), [], 1
+    summed = {name: np.bincount(inverse, weights=column, minlength=groups) for name, column in totals.items()}
+    return group_codes, summed
+
+def _row_totals(columns, kpis):
+    """Per-row roll-up inputs: each KPI's fields zeroed where the KPI lacks a field, and its row counts"""
+    totals = {}
+    rows = 0
+    for kpi in kpis.names:
+        inputs = [np.asarray(columns[field], dtype=np.float64) for field in kpis.fields[kpi]]
+        complete = np.ones(len(inputs[0]), dtype=bool)
+        for column in inputs:
+            complete &= ~np.isnan(column)
+        for field, column in zip(kpis.fields[kpi], inputs):
+            totals[field] = np.where(complete, column, 0.0)
+        totals[("reports", kpi)] = complete.astype(np.float64)
+        rows = len(complete)
+    totals["reports"] = np.ones(rows, dtype=np.float64)
+    return totals
+
+def _rollup_table(group_by, labels, group_codes, totals, registry):
+    """Apply the KPI formulas to grouped field totals"""
+    kpis = (registry or KPI_REGISTRY).compile()
+    summed = {}
+    for kpi in kpis.names:
+        complete = totals[("reports", kpi)] > 0
+        for field in kpis.fields[kpi]:
+            summed[field] = np.where(complete, totals[field], np.nan)
+    results = calculate_kpis_columnar(summed, registry)
+    for kpi in kpis.names:
+        results[kpi]["reports"] = totals[("reports", kpi)].astype(np.int64)
+    return {
+        "group_by": tuple(group_by),
+        "keys": {name: labels[name][codes] for name, codes in zip(group_by, group_codes)},
+        "reports": totals["reports"].astype(np.int64),
+        "totals": summed,
+        "kpis": results
+    }
+
+def rollup_kpis(columns, dimensions, group_by=(), registry=None):
+    """Weighted KPI roll-up of many reports, grouped by any set of dimensions.
+
+    `columns` holds the raw input fields as in calculate_kpis_columnar and `dimensions` maps
+    dimension names (site, region, month, ...) to equal-length label arrays. Each KPI's fields are
+    summed per group over the reports that have all of them, and the formula is applied to those
+    totals, so On-Time Delivery for a region is total on-time orders over total orders shipped
+    rather than the mean of its sites' percentages. This is exact for the ratio KPIs, whose inputs
+    are additive.
+
+    The result holds the group `keys` (dimension -> labels), the `reports` per group, the summed
+    `totals` per field, and per KPI the `value`, `valid` and `passed` arrays of
+    calculate_kpis_columnar plus the `reports` that contributed to it.
+    """
+    if np is None:
+        raise ImportError("KPI roll-ups require NumPy (pip install numpy).")
+    
+    kpis = (registry or KPI_REGISTRY).compile()
+    labels, codes = {}, []
+    for name in group_by:
+        labels[name], inverse = np.unique(np.asarray(dimensions[name]), return_inverse=True)
+        codes.append(inverse.reshape(-1))
+    group_codes, totals = _grouped_totals(_row_totals(columns, kpis), codes)
+    return _rollup_table(group_by, labels, group_codes, totals, registry)
+
+def rollup_cube(columns, dimensions, group_by, registry=None):
+    """Roll-ups for every subset of `group_by`, from the full grouping down to the grand total.
+
+    The rows are grouped once at the finest level; coarser groupings re-aggregate those group
+    totals, so each extra grouping costs time in the number of groups rather than of reports.
+    Returns a list of rollup_kpis results, finest first.
+    """
+    if np is None:
+        raise ImportError("KPI roll-ups require NumPy (pip install numpy).")
+    
+    group_by = tuple(group_by)
+    finest = rollup_kpis(columns, dimensions, group_by, registry)
+    kpis = (registry or KPI_REGISTRY).compile()
+    
+    # Totals of the finest groups, with fields of KPIs a group could not calculate put back to 0
+    totals = {("reports", kpi): finest["kpis"][kpi]["reports"].astype(np.float64) for kpi in kpis.names}
+    totals.update((field, np.nan_to_num(column)) for field, column in finest["totals"].items())
+    totals["reports"] = finest["reports"].astype(np.float64)
+    labels, codes = {}, {}
+    for name in group_by:
+        labels[name], inverse = np.unique(finest["keys"][name], return_inverse=True)
+        codes[name] = inverse.reshape(-1)
+    
+    cube = [finest]
+    for size in range(len(group_by) - 1, -1, -1):
+        for subset in itertools.combinations(group_by, size):
+            group_codes, summed = _grouped_totals(totals, [codes[name] for name in subset])
+            cube.append(_rollup_table(subset, labels, group_codes, summed, registry))
+    return cube
+
+def rollup_records(table, dimensions=(), registry=None):
+    """One JSON-ready dict per group of a rollup_kpis result; `dimensions` it was rolled up over are None"""
+    kpis = (registry or KPI_REGISTRY).compile()
+    records = []
+    for index, reports in enumerate(table["reports"]):
+        record = dict.fromkeys(dimensions)
+        record.update((name, str(labels[index])) for name, labels in table["keys"].items())
+        record["reports"] = int(reports)
+        record["kpis"] = {
+            kpi: float(table["kpis"][kpi]["value"][index]) if table["kpis"][kpi]["valid"][index] else None
+            for kpi in kpis.names
+        }
+        records.append(record)
+    return records
+
+def run_rollup(source="-", group_by=(), cube=False, output=None):
+    """Roll up an NDJSON file of analysed records (kpi_data plus dimension attributes) into NDJSON groups.
+
+    The output of `stream -f ndjson` is such a file: its results keep the input records' attributes.
+    """
+    instream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        records = [json.loads(line) for line in instream if line.strip()]
+    finally:
+        if source != "-":
+            instream.close()
+    
+    columns, dimensions = rollup_columns(records, group_by)
+    tables = rollup_cube(columns, dimensions, group_by) if cube else [rollup_kpis(columns, dimensions, group_by)]
+    outstream = open(output, "w", encoding="utf-8") if output else sys.stdout
+    try:
+        for table in tables:
+            for record in rollup_records(table, group_by):
+                outstream.write(json.dumps(record) + "\n")
+    finally:
+        if output:
+            outstream.close()
+    return len(records)
+
+# Binary KPI record files start with this magic and format version
+BINARY_MAGIC = b"SCKPIREC"
+BINARY_VERSION = 1
+
+# File header: magic, version, header size, record size, published record count, layout JSON length.
+# The layout JSON (KPI names, field slots, section names) follows, padded to 8 bytes, then the records
+BINARY_HEADER = struct.Struct("<8sHHIQI")
+BINARY_COUNT_OFFSET = 16
+
+# Section names in record error codes: the prescan markers, then the div the parsers look for
+BINARY_SECTION_NAMES = tuple(name for name, _ in PRESCAN_SECTION_MARKERS) + ("kpi-report",)
+
+# Error code kinds (code = kind << 12 | subject index); exception and other texts are not kept
+BINARY_ERROR_KINDS = {"missing_section": 1, "missing_kpi": 2, "invalid_value": 3, "exception": 4, "other": 15}
+BINARY_ERROR_INDEXES = 1 << 12
+BINARY_ERROR_PREFIXES = {
+    "missing_section": "ERROR: Missing required HTML section(s): ",
+    "missing_kpi": "ERROR: Missing required KPI(s): ",
+    "invalid_value": "ERROR: Invalid data type for KPI(s): "
+}
+BINARY_INVALID_SUFFIX = ". Please ensure numeric values."
+
+def _aligned(offset, alignment):
+    return -(-offset // alignment) * alignment
+
+class BinaryRecordLayout:
+    """Fixed layout of one analysed report in a binary KPI record file.
+
+    Every record is `record_size` bytes, little-endian and naturally aligned:
+
+        key            uint64     source position of the report (NDJSON line or HTML section)
+        flags          uint16     bit 0: report analysed without errors, bit 1: error codes truncated
+        error_count    uint16     number of error messages (at most 65535)
+        present        uint8[]    KPI presence bitmap, bit i of byte i // 8 for KPI i
+        errors         uint16[]   error code table, 0-terminated; codes past its end are dropped and flagged
+        fields         float64[]  raw input fields, one slot per (KPI, field), NaN when missing
+        values         float64[]  calculated KPI values, NaN when not calculated
+    """
+
+    def __init__(self, kpi_names, slots, sections=BINARY_SECTION_NAMES):
+        self.kpi_names = tuple(kpi_names)
+        self.slots = tuple((kpi, field) for kpi, field in slots)
+        self.sections = tuple(sections)
+        self.kpi_index = {kpi: index for index, kpi in enumerate(self.kpi_names)}
+        self.slot_index = {slot: index for index, slot in enumerate(self.slots)}
+        # Invalid-value messages only name the field; the first slot with that name stands for it
+        self.field_index = {}
+        for index, (_, field) in enumerate(self.slots):
+            self.field_index.setdefault(field, index)
+        
+        kpi_count, slot_count = len(self.kpi_names), len(self.slots)
+        if max(kpi_count, slot_count, len(self.sections)) > BINARY_ERROR_INDEXES:
+            raise ValueError(f"Binary KPI records hold at most {BINARY_ERROR_INDEXES} KPIs, fields and sections")
+        self.bitmap_bytes = (kpi_count + 7) // 8
+        self.error_slots = slot_count + kpi_count + len(self.sections) + 1
+        errors_offset = _aligned(12 + self.bitmap_bytes, 2)
+        fields_offset = _aligned(errors_offset + 2 * self.error_slots, 8)
+        values_offset = fields_offset + 8 * slot_count
+        self.record_size = values_offset + 8 * kpi_count
+        
+        self.description = json.dumps({"kpis": list(self.kpi_names), "fields": [list(slot) for slot in self.slots],
+                                       "sections": list(self.sections)}).encode("utf-8")
+        self.header_size = _aligned(BINARY_HEADER.size + len(self.description), 8)
+        
+        # Writer side: one precompiled struct; reader side: the matching numpy dtype
+        self.record = struct.Struct(
+            f"<QHH{self.bitmap_bytes}s{errors_offset - 12 - self.bitmap_bytes}x{self.error_slots}H"
+            f"{fields_offset - errors_offset - 2 * self.error_slots}x{slot_count}d{kpi_count}d"
+        )
+        self._dtype = None
+        self._offsets = (0, 8, 10, 12, errors_offset, fields_offset, values_offset)
+
+    @classmethod
+    def from_registry(cls, kpis):
+        return cls(kpis.names, [(kpi, field) for kpi in kpis.names for field in kpis.fields[kpi]])
+
+    @classmethod
+    def from_description(cls, description):
+        layout = json.loads(description)
+        return cls(layout["kpis"], layout["fields"], layout["sections"])
+
+    @property
+    def dtype(self):
+        """numpy structured dtype of one record"""
+        if self._dtype is None:
+            if np is None:
+                raise ImportError("Reading binary KPI records requires NumPy (pip install numpy).")
+            self._dtype = np.dtype({
+                "names": ["key", "flags", "error_count", "present", "errors", "fields", "values"],
+                "formats": ["<u8", "<u2", "<u2", ("u1", (self.bitmap_bytes,)), ("<u2", (self.error_slots,)),
+                            ("<f8", (len(self.slots),)), ("<f8", (len(self.kpi_names),))],
+                "offsets": list(self._offsets),
+                "itemsize": self.record_size
+            })
+        return self._dtype
+
+    def header(self, count):
+        return (BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self.header_size, self.record_size, count,
+                                   len(self.description))
+                + self.description).ljust(self.header_size, b"\0")
+
+    def pack_into(self, buffer, offset, analysis, key=0):
+        """Write one record for an AnalysisResult or a result dict (kpi_data, calculated_values, errors)"""
+        if isinstance(analysis, dict):
+            kpi_data, values, errors = analysis["kpi_data"], analysis["calculated_values"], analysis["errors"]
+        else:
+            kpi_data, values, errors = analysis.kpi_data, analysis.calculated_values, analysis.errors
+        
+        present = 0
+        for kpi in kpi_data:
+            index = self.kpi_index.get(kpi)
+            if index is not None:
+                present |= 1 << index
+        flags = 0 if errors else 1
+        codes = self.error_codes(errors)
+        if len(codes) >= self.error_slots:
+            # The table keeps its terminating 0
+            codes, flags = codes[:self.error_slots - 1], flags | 2
+        codes.extend([0] * (self.error_slots - len(codes)))
+        fields = [kpi_data.get(kpi, {}).get(field, math.nan) for kpi, field in self.slots]
+        self.record.pack_into(
+            buffer, offset, key, flags, min(len(errors), 0xFFFF), present.to_bytes(self.bitmap_bytes, "little"),
+            *codes, *fields, *[values.get(kpi, math.nan) for kpi in self.kpi_names]
+        )
+
+    def error_codes(self, errors):
+        """Error messages as codes, in message order; a message naming several sections or KPIs gives one code each"""
+        codes = []
+        for message in errors:
+            kind = error_kind(message)
+            prefix = BINARY_ERROR_PREFIXES.get(kind)
+            if kind == "missing_section":
+                indexes = [self.sections.index(name) if name in self.sections else None
+                           for name in message[len(prefix):-1].split(", ")]
+            elif kind == "missing_kpi":
+                indexes = [self.kpi_index.get(name) for name in message[len(prefix):-1].split(", ")]
+            elif kind == "invalid_value":
+                indexes = [self.field_index.get(message[len(prefix):-len(BINARY_INVALID_SUFFIX)])]
+            else:
+                indexes = [0]
+            if None in indexes:
+                kind, indexes = "other", [0]
+            codes.extend(BINARY_ERROR_KINDS[kind] << 12 | index for index in indexes)
+        return codes
+
+    def error_messages(self, codes):
+        """The analyzer's messages for a record's error codes (exception and other texts are generic)"""
+        messages = []
+        previous_kind = None
+        for code in codes:
+            if not code:
+                break
+            kind, index = code >> 12, code & 0xFFF
+            if kind == previous_kind and kind in (1, 2):
+                # Consecutive section or KPI codes came from one message listing them all
+                messages[-1] = messages[-1][:-1] + ", " + (self.sections if kind == 1 else self.kpi_names)[index] + "."
+            elif kind == 1:
+                messages.append(f"{BINARY_ERROR_PREFIXES['missing_section']}{self.sections[index]}.")
+            elif kind == 2:
+                messages.append(f"{BINARY_ERROR_PREFIXES['missing_kpi']}{self.kpi_names[index]}.")
+            elif kind == 3:
+                messages.append(f"{BINARY_ERROR_PREFIXES['invalid_value']}{self.slots[index][1]}{BINARY_INVALID_SUFFIX}")
+            elif kind == 4:
+                messages.append("ERROR: Could not analyze report.")
+            else:
+                messages.append("ERROR: Unrecognized error.")
+            previous_kind = kind
+        return messages
+
+class BinaryRecordWriter:
+    """Appends fixed-layout KPI records to a memory-mapped file.
+
+    The file grows `grow` records at a time and records are packed straight into the mapping.
+    flush() publishes the record count in the header (readers only see published records) and
+    close() trims the file to its records. An existing file is appended to if its layout matches
+    the registry's. One writer per file.
+    """
+
+    def __init__(self, path, registry=None, grow=65536):
+        self.layout = BinaryRecordLayout.from_registry((registry or KPI_REGISTRY).compile())
+        self.path = path
+        self.grow = grow
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            os.write(self._fd, self.layout.header(0))
+            self.count = 0
+        else:
+            header = os.pread(self._fd, self.layout.header_size, 0)
+            expected = self.layout.header(0)
+            # Everything but the record count must match
+            if (header[:BINARY_COUNT_OFFSET] != expected[:BINARY_COUNT_OFFSET]
+                    or header[BINARY_COUNT_OFFSET + 8:] != expected[BINARY_COUNT_OFFSET + 8:]):
+                os.close(self._fd)
+                raise ValueError(f"{path} is not a binary KPI record file with this registry's layout")
+            self.count = BINARY_HEADER.unpack_from(header)[4]
+        self._capacity = 0
+        self._map = None
+        self._remap(self.count + grow)
+
+    def append(self, analysis, key=0):
+        """Append one AnalysisResult or result dict and return its record index"""
+        if self.count == self._capacity:
+            self._remap(self._capacity + self.grow)
+        layout = self.layout
+        layout.pack_into(self._map, layout.header_size + self.count * layout.record_size, analysis, key)
+        self.count += 1
+        return self.count - 1
+
+    def flush(self):
+        """Publish the appended records to readers"""
+        struct.pack_into("<Q", self._map, BINARY_COUNT_OFFSET, self.count)
+        self._map.flush()
+
+    def close(self):
+        if self._map is None:
+            return
+        self.flush()
+        self._map.close()
+        self._map = None
+        os.ftruncate(self._fd, self.layout.header_size + self.count * self.layout.record_size)
+        os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _remap(self, capacity):
+        if self._map is not None:
+            self.flush()
+            self._map.close()
+        size = self.layout.header_size + capacity * self.layout.record_size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._capacity = capacity
+
+class BinaryRecordReader:
+    """Zero-copy view of a binary KPI record file (path) or buffer (bytes, memoryview, mmap).
+
+    `records` is a numpy structured array laid over the memory map with np.frombuffer, so opening
+    a file of tens of millions of reports decodes nothing; the column accessors return strided
+    views into it. A map that views still refer to is released with the last of them after close().
+    """
+
+    def __init__(self, source):
+        self._map = None
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as handle:
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            source = self._map
+        self._buffer = memoryview(source)
+        magic, version, header_size, record_size, count, description_size = BINARY_HEADER.unpack_from(self._buffer)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("Not a binary KPI record file")
+        self.layout = BinaryRecordLayout.from_description(
+            self._buffer[BINARY_HEADER.size:BINARY_HEADER.size + description_size].tobytes())
+        if self.layout.record_size != record_size or self.layout.header_size != header_size:
+            raise ValueError("Binary KPI record file header does not match its layout")
+        count = min(count, (len(self._buffer) - header_size) // record_size)
+        self.records = np.frombuffer(self._buffer, dtype=self.layout.dtype, count=count, offset=header_size)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def ok(self):
+        return (self.records["flags"] & 1).astype(bool)
+
+    def values(self, kpi):
+        """Calculated values of one KPI, NaN where it was not calculated"""
+        return self.records["values"][:, self.layout.kpi_index[kpi]]
+
+    def field(self, kpi, field):
+        """Raw input field of one KPI, NaN where it was missing or invalid"""
+        return self.records["fields"][:, self.layout.slot_index[(kpi, field)]]
+
+    def present(self, kpi):
+        index = self.layout.kpi_index[kpi]
+        return (self.records["present"][:, index // 8] >> (index % 8) & 1).astype(bool)
+
+    def kpi_columns(self):
+        """Input columns keyed by field name, as kpi_columns_from_reports builds them for the columnar engine"""
+        return {field: self.records["fields"][:, index] for index, (_, field) in enumerate(self.layout.slots)}
+
+    def record(self, index):
+        """Decode one record back into key, ok, kpi_data, calculated_values and errors.
+
+        `errors_truncated` tells whether the record dropped error codes its table had no room for.
+        """
+        layout = self.layout
+        row = self.records[index]
+        fields, values, present = row["fields"].tolist(), row["values"].tolist(), row["present"].tolist()
+        kpi_data = {}
+        for kpi_index, kpi in enumerate(layout.kpi_names):
+            if present[kpi_index // 8] >> (kpi_index % 8) & 1:
+                kpi_data[kpi] = {}
+        for (kpi, field), value in zip(layout.slots, fields):
+            if kpi in kpi_data and value == value:
+                kpi_data[kpi][field] = value
+        return {
+            "key": int(row["key"]),
+            "ok": bool(row["flags"] & 1),
+            "kpi_data": kpi_data,
+            "calculated_values": {kpi: value for kpi, value in zip(layout.kpi_names, values) if value == value},
+            "errors": layout.error_messages(row["errors"].tolist()),
+            "errors_truncated": bool(row["flags"] & 2)
+        }
+
+    def __iter__(self):
+        for index in range(len(self.records)):
+            yield self.record(index)
+
+    def close(self):
+        self.records = None
+        try:
+            self._buffer.release()
+            if self._map is not None:
+                self._map.close()
+        except BufferError:
+            # Column views handed out are still alive and keep the map open
+            pass
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def scan_binary_records(path):
+    """Per-KPI summary of a binary KPI record file computed on the zero-copy columns"""
+    reader = BinaryRecordReader(path)
+    try:
+        summary = {"reports": len(reader), "ok": int(reader.ok.sum()), "kpis": {}}
+        kpis = KPI_REGISTRY.compile()
+        for kpi in reader.layout.kpi_names:
+            values = reader.values(kpi)
+            calculated = ~np.isnan(values)
+            entry = {"present": int(reader.present(kpi).sum()), "calculated": int(calculated.sum())}
+            if entry["calculated"]:
+                entry["mean"] = round(float(values[calculated].mean()), 2)
+                entry["min"] = float(values[calculated].min())
+                entry["max"] = float(values[calculated].max())
+                if kpi in kpis.thresholds:
+                    compare, threshold = kpis.thresholds[kpi]
+                    entry["pass_rate"] = round(float(compare(values[calculated], threshold).mean()), 4)
+            summary["kpis"][kpi] = entry
+        return summary
+    finally:
+        reader.close()
+
+# Shared analyzers: stateless between calls, so one per registry serves every report
+_analyzers = {}
+
+def get_analyzer(registry=None, cache=None, output_format="markdown", instrumentation=None, history=None, rules=None):
+    """Return the process-wide analyzer for a registry and format, or a dedicated one for a cache,
+    instrumentation, history or threshold rules"""
+    if cache is not None or instrumentation is not None or history is not None or rules is not None:
+        # Not memoized, so short-lived caches, sinks, stores and rule engines are not kept alive by the module
+        return SupplyChainReportAnalyzer(registry=registry, cache=cache, output_format=output_format,
+                                         instrumentation=instrumentation, history=history, rules=rules)
+    registry = registry or KPI_REGISTRY
+    analyzer = _analyzers.get((registry, output_format))
+    if analyzer is None:
+        analyzer = SupplyChainReportAnalyzer(registry=registry, output_format=output_format)
+        _analyzers[(registry, output_format)] = analyzer
+    return analyzer
+
+def process_html_report(html_content, cache=None, output_format="markdown"):
+    """Process the HTML report and return the analysis"""
+    return get_analyzer(cache=cache, output_format=output_format).analyze_report(html_content)
+
+REPORT_FILE_EXTENSIONS = (".html", ".htm")
+
+def collect_report_paths(source):
+    """Resolve a directory, glob pattern or manifest file into an ordered list of report paths"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(REPORT_FILE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    if os.path.isfile(source):
+        if source.lower().endswith(REPORT_FILE_EXTENSIONS):
+            return [source]
+        # Anything else is a manifest: one path per line, relative to the manifest itself
+        base_dir = os.path.dirname(source)
+        paths = []
+        with open(source, encoding="utf-8") as manifest:
+            for line in manifest:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(os.path.join(base_dir, line))
+        return paths
+
+    return sorted(glob.glob(source, recursive=True))
+
+# Per-process caches for batch workers, keyed by the SQLite path they share
+_worker_caches = {}
+
+def _get_worker_cache(cache_path):
+    if cache_path not in _worker_caches:
+        _worker_caches[cache_path] = ReportCache(path=cache_path)
+    return _worker_caches[cache_path]
+
+def _analysis_result(analysis, **identity):
+    """Result record shared by the batch and streaming entry points"""
+    result = dict(identity)
+    result["ok"] = analysis.ok
+    result["errors"] = analysis.errors
+    result["kpi_data"] = analysis.kpi_data
+    result["calculated_values"] = analysis.calculated_values
+    result["report"] = analysis.report
+    if analysis.parse_errors:
+        result["parse_errors"] = analysis.parse_errors
+    if analysis.trends is not None:
+        result["trends"] = analysis.trends
+    if analysis.changes is not None:
+        result["changes"] = analysis.changes
+    if analysis.assessments is not None:
+        result["assessments"] = analysis.assessments
+    return result
+
+def _failed_result(exc, **identity):
+    """Result record for a report that could not be analyzed at all"""
+    result = dict(identity)
+    result["ok"] = False
+    result["errors"] = [f"ERROR: Could not analyze report: {exc.__class__.__name__}: {exc}"]
+    result["kpi_data"] = {}
+    result["calculated_values"] = {}
+    result["report"] = None
+    return result
+
+# Per-process event buffer for batch workers; events travel back to the parent with each result
+_worker_events = EventBufferSink()
+_worker_instrumentation = AnalysisInstrumentation([_worker_events])
+
+def analyze_report_file(path, cache_path=None, output_format="markdown", collect_metrics=False):
+    """Analyze one report file; any failure is recorded in its own result instead of raised.
+
+    With `collect_metrics`, the result carries its instrumentation events under "metrics".
+    """
+    try:
+        with open(path, encoding="utf-8") as report_file:
+            html_content = report_file.read()
+        cache = _get_worker_cache(cache_path) if cache_path else None
+        instrumentation = _worker_instrumentation if collect_metrics else None
+        analyzer = get_analyzer(cache=cache, output_format=output_format, instrumentation=instrumentation)
+        result = _analysis_result(analyzer.analyze(html_content), path=path)
+    except Exception as exc:
+        result = _failed_result(exc, path=path)
+    if collect_metrics:
+        result["metrics"] = _worker_events.take()
+    return result
+
+def _analyze_report_chunk(paths, cache_path=None, output_format="markdown", collect_metrics=False):
+    """Worker task: analyze a chunk of report files in one round trip to the pool"""
+    return [analyze_report_file(path, cache_path, output_format, collect_metrics) for path in paths]
+
+def analyze_reports_batch(paths, workers=None, chunksize=64, ordered=True, cache_path=None, output_format="markdown",
+                          collect_metrics=False):
+    """Analyze many report files across a process pool, yielding one result per file.
+
+    Paths are submitted in chunks of `chunksize`, with at most two chunks in flight per
+    worker. With `ordered=True` results come back in input order, otherwise each chunk's
+    results are yielded as soon as it completes. `workers=1` runs everything in-process.
+    With `cache_path`, workers share a SQLite ReportCache so repeated reports skip parsing.
+    A report that fails gets an error result and the rest of the batch goes on, but a worker
+    process that dies (a crash or being killed) breaks the pool, and BrokenProcessPool then
+    aborts the whole batch.
+    """
+    chunks = (paths[start:start + chunksize] for start in range(0, len(paths), chunksize))
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _analyze_report_chunk(chunk, cache_path, output_format, collect_metrics)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        max_in_flight = 2 * workers
+        pending = collections.deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(_analyze_report_chunk, chunk, cache_path, output_format, collect_metrics))
+            if len(pending) < max_in_flight:
+                continue
+            if ordered:
+                yield from pending.popleft().result()
+            else:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield from future.result()
+
+        if ordered:
+            while pending:
+                yield from pending.popleft().result()
+        else:
+            for future in concurrent.futures.as_completed(pending):
+                yield from future.result()
+
+def run_batch(source, output=None, workers=None, chunksize=64, ordered=True, cache_path=None, output_format="markdown",
+              instrumentation=None):
+    """Analyze every report under `source`, write NDJSON results and return throughput stats.
+
+    Worker-side instrumentation events are forwarded to `instrumentation`'s sinks in the parent.
+    """
+    paths = collect_report_paths(source)
+    stream = open(output, "w", encoding="utf-8") if output else sys.stdout
+
+    stats = {"reports": 0, "failed": 0, "seconds": 0.0, "reports_per_second": 0.0}
+    start = time.perf_counter()
+    try:
+        results = analyze_reports_batch(paths, workers=workers, chunksize=chunksize, ordered=ordered,
+                                        cache_path=cache_path, output_format=output_format,
+                                        collect_metrics=instrumentation is not None)
+        for result in results:
+            for event in result.pop("metrics", ()):
+                instrumentation.emit(event)
+            stream.write(json.dumps(result) + "\n")
+            stats["reports"] += 1
+            if not result["ok"]:
+                stats["failed"] += 1
+    finally:
+        if output:
+            stream.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    if stats["seconds"] > 0:
+        stats["reports_per_second"] = stats["reports"] / stats["seconds"]
+    return stats
+
+def iter_report_sections(stream, chunk_size=65536, registry=None):
+    """Yield the KPI sections of every kpi-report div in a chunked HTML stream as each div closes"""
+    kpis = (registry or KPI_REGISTRY).compile()
+    ready = collections.deque()
+    extractor = KPIStreamExtractor(
+        max_paragraphs=kpis.max_fields,
+        on_section=lambda headings: ready.append(KPIStreamExtractor.match_sections(headings, kpis.names))
+    )
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        extractor.feed(chunk)
+        while ready:
+            yield ready.popleft()
+    extractor.close()
+    while ready:
+        yield ready.popleft()
+
+def iter_html_stream_results(stream, chunk_size=65536, registry=None, output_format="markdown", instrumentation=None):
+    """Analyze a multi-report HTML stream, yielding one result per kpi-report div.
+
+    Each div is analyzed as a complete report; document-level <head>/<body> checks do not apply.
+    """
+    analyzer = get_analyzer(registry, output_format=output_format, instrumentation=instrumentation)
+    for index, sections in enumerate(iter_report_sections(stream, chunk_size, registry)):
+        try:
+            yield _analysis_result(analyzer.analyze_sections(sections), section=index)
+        except Exception as exc:
+            yield _failed_result(exc, section=index)
+
+def iter_ndjson_results(stream, html_key="html", registry=None, cache=None, output_format="markdown",
+                        instrumentation=None, history=None, diff=False, rules=None):
+    """Analyze NDJSON input where each line holds an HTML report under `html_key`, one result per line.
+
+    A record's "tenant" and "site" select its thresholds in the `rules` engine. With a history store,
+    records carrying a "site" (and optionally an ISO "date") are appended to it. With `diff`, records
+    carrying a "report_id" are re-analyzed against that report's previous version and their results
+    get a "changes" log. Each result carries the record's other scalar attributes (id, site, date,
+    tenant, region, ...), so that `stream -f ndjson | rollup --by site` groups by them.
+    """
+    analyzer = get_analyzer(registry, cache, output_format, instrumentation, history, rules)
+    differential = DifferentialAnalyzer(analyzer) if diff else None
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        identity = {"line": line_number}
+        try:
+            record = json.loads(line)
+            identity.update((name, value) for name, value in record.items()
+                            if name != html_key and name != "line" and not isinstance(value, (dict, list)))
+            if differential is not None and "report_id" in record:
+                analysis = differential.analyze(record["report_id"], record[html_key],
+                                                tenant=record.get("tenant"), site=record.get("site"))
+            else:
+                analysis = analyzer.analyze(record[html_key], site=record.get("site"), date=record.get("date"),
+                                            tenant=record.get("tenant"))
+            yield _analysis_result(analysis, **identity)
+        except Exception as exc:
+            yield _failed_result(exc, **identity)
+
+def run_stream(source="-", input_format="html", output=None, html_key="html", chunk_size=65536,
+               output_format="markdown", instrumentation=None, history_path=None, diff=False, rules_path=None,
+               binary_path=None):
+    """Stream results for a multi-report HTML or NDJSON file (or stdin) as NDJSON and return throughput stats.
+
+    With `binary_path`, every result is also appended to that binary KPI record file.
+    """
+    instream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    outstream = open(output, "w", encoding="utf-8") if output else sys.stdout
+    history = KPIHistoryStore(history_path) if history_path else None
+    rules = ThresholdRules.from_file(rules_path) if rules_path else None
+    binary = BinaryRecordWriter(binary_path) if binary_path else None
+    if input_format == "ndjson":
+        results = iter_ndjson_results(instream, html_key=html_key, output_format=output_format,
+                                      instrumentation=instrumentation, history=history, diff=diff, rules=rules)
+    else:
+        results = iter_html_stream_results(instream, chunk_size=chunk_size, output_format=output_format,
+                                           instrumentation=instrumentation)
+
+    stats = {"reports": 0, "failed": 0, "seconds": 0.0, "reports_per_second": 0.0}
+    start = time.perf_counter()
+    try:
+        for result in results:
+            outstream.write(json.dumps(result) + "\n")
+            if binary is not None:
+                binary.append(result, key=result.get("line", result.get("section", 0)))
+            stats["reports"] += 1
+            if not result["ok"]:
+                stats["failed"] += 1
+    finally:
+        if source != "-":
+            instream.close()
+        if output:
+            outstream.close()
+        if history is not None:
+            history.close()
+        if binary is not None:
+            binary.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    if stats["seconds"] > 0:
+        stats["reports_per_second"] = stats["reports"] / stats["seconds"]
+    return stats
+
+def run_worker(instream=None, outstream=None, output_format="markdown"):
+    """Answer NDJSON requests from stdin until EOF in one long-lived process.
+
+    Each line is {"message": ...} (routed like main()) or {"html": ...} (analysed like POST /analyze),
+    optionally with an "id" that is echoed back; each answer is one flushed line of
+    {"id", "response"} or {"id", "error"}. A job runner keeps one worker open instead of starting
+    the interpreter, importing this module and the parser for every request.
+    An {"html": ...} request with a "report_id" is diffed against that report's previous version
+    and its answer also holds the "changes" log.
+    """
+    instream = instream or sys.stdin
+    outstream = outstream or sys.stdout
+    analyzer = get_analyzer(output_format=output_format)
+    differential = DifferentialAnalyzer(analyzer)
+    
+    # Pay for the lazy imports and compiled templates before the first request arrives
+    analyzer.analyze_report(SAMPLE_HTML_REPORT)
+    
+    handled = 0
+    for line in instream:
+        if not line.strip():
+            continue
+        answer = {}
+        try:
+            request = json.loads(line)
+            if "id" in request:
+                answer["id"] = request["id"]
+            if isinstance(request.get("message"), str):
+                answer["response"] = route_message(request["message"])
+            elif isinstance(request.get("html"), str) and "report_id" in request:
+                analysis = differential.analyze(request["report_id"], request["html"])
+                answer["response"] = analysis.report
+                answer["changes"] = analysis.changes
+            elif isinstance(request.get("html"), str):
+                answer["response"] = analyzer.analyze_report(request["html"])
+            else:
+                answer["error"] = 'Expected a JSON object like {"message": "..."} or {"html": "..."}.'
+        except Exception as exc:
+            answer["error"] = f"{exc.__class__.__name__}: {exc}"
+        outstream.write(json.dumps(answer) + "\n")
+        outstream.flush()
+        handled += 1
+    return handled
+
+class MessageRouter:
+    """Chat message router with every pattern compiled once and the message lowercased once.
+
+    Intents are checked in the priority order of the original if/elif chain (language, template,
+    HTML report, rating, then the greeting variants) and each check stops at its first hit, so a
+    large pasted report costs one lowercase copy plus a few C-level scans.
+    """
+
+    URGENCY_PATTERN = re.compile(r"urgent|asap|emergency")
+    NAME_PATTERN = re.compile(r"(my name is|i am)\s+(\w+)")
+    TIME_OF_DAY_PATTERN = re.compile(r"morning|afternoon|evening|night")
+    RATING_PATTERN = re.compile(r"rate\s+(\d+)")
+    # The fenced block is found as opening fence, then the first closing fence preceded by
+    # whitespace; HTML_BLOCK_PATTERN is the original single regex, used only when that shortcut
+    # finds nothing
+    HTML_OPEN_PATTERN = re.compile(r"```HTML\s+")
+    HTML_BLOCK_PATTERN = re.compile(r"```HTML\s+(.*?)\s+```", re.DOTALL)
+
+    # Time-of-day greetings in priority order
+    TIME_OF_DAY_GREETINGS = (
+        ("morning", "Good morning! SupplyChainReport-AI is ready to assist you."),
+        ("afternoon", "Good afternoon! Let's review your supply chain report together."),
+        ("evening", "Good evening! I'm here to help analyze your report."),
+        ("night", "Hello! SupplyChainReport-AI is working late to assist you.")
+    )
+
+    def classify(self, message):
+        """Return the (intent, argument) pair for a message without running any handler"""
+        # Same as checking every non-space character is below 128, without a Python-level loop
+        if not message.isascii():
+            return "unsupported_language", None
+        
+        lowered = message.lower()
+        if "template" in lowered:
+            return "template", None
+        
+        html_content = self.extract_html(message)
+        if html_content is not None:
+            return "html_report", html_content
+        
+        rating_match = self.RATING_PATTERN.search(lowered)
+        if rating_match:
+            return "feedback", rating_match.group(1)
+        
+        return "greeting", self.greeting(message, lowered)
+
+    def route(self, message):
+        """Route a message to its handler and return the response"""
+        intent, argument = self.classify(message)
+        if intent == "unsupported_language":
+            return "ERROR: Unsupported language detected. Please use ENGLISH."
+        if intent == "template":
+            return provide_template()
+        if intent == "html_report":
+            return process_html_report(argument)
+        if intent == "feedback":
+            return handle_feedback(argument)
+        return argument
+
+    def extract_html(self, message):
+        """Return the contents of the first ```HTML code block, or None"""
+        start = message.find("```HTML")
+        if start < 0:
+            return None
+        opening = self.HTML_OPEN_PATTERN.search(message, start)
+        if opening:
+            content_start = opening.end()
+            fence = message.find("```", content_start)
+            while fence >= 0:
+                if fence > content_start and message[fence - 1].isspace():
+                    return message[content_start:fence].rstrip()
+                fence = message.find("```", fence + 1)
+        html_match = self.HTML_BLOCK_PATTERN.search(message, start)
+        return html_match.group(1) if html_match else None
+
+    def greeting(self, message, lowered=None):
+        """Pick the greeting for a message that carries no other intent"""
+        if lowered is None:
+            lowered = message.lower()
+        
+        # Check for urgency words
+        if self.URGENCY_PATTERN.search(lowered):
+            return "SupplyChainReport-AI here! Let's quickly review your supply chain report."
+        
+        # Check for name
+        match = self.NAME_PATTERN.search(lowered)
+        if match:
+            name = match.group(2).capitalize()
+            return f"Hello, {name}! I am SupplyChainReport-AI, here to help analyze your supply chain report."
+        if "my name is" in lowered or "i am" in lowered:
+            # A name phrase without a name after it gets no greeting at all
+            return ""
+        
+        # Check for time of day, keeping the priority order whatever order the words appear in
+        found = set()
+        for match in self.TIME_OF_DAY_PATTERN.finditer(lowered):
+            found.add(match.group(0))
+            if match.group(0) == "morning":
+                break
+        for word, response in self.TIME_OF_DAY_GREETINGS:
+            if word in found:
+                return response
+        
+        return "Greetings! I am SupplyChainReport-AI, your supply chain analysis assistant. Please share your HTML report in a markdown code block labeled as HTML to begin."
+
+MESSAGE_ROUTER = MessageRouter()
+
+def handle_greeting(message):
+    """Handle greeting based on message content"""
+    return MESSAGE_ROUTER.greeting(message)
+
+def handle_feedback(rating):
+    """Handle feedback based on rating"""
+    rating = int(rating)
+    
+    if rating == 1:
+        return "We appreciate your honest feedback. Please let us know what specific improvements you would like."
+    elif rating == 2:
+        return "Thank you for your input. Could you share how we might make the analysis clearer or more comprehensive?"
+    elif rating == 3:
+        return "Thank you for your rating. Please advise on what additional details or explanations would be helpful."
+    elif rating == 4:
+        return "Thank you for your positive feedback! We're glad the analysis was helpful."
+    elif rating == 5:
+        return "Thank you for your excellent feedback! We're delighted that our analysis exceeded your expectations."
+    else:
+        return "Thank you for your feedback. Please rate the analysis on a scale of 1-5."
+
+def provide_template():
+    """Provide a template for the HTML report"""
+    template = """Here is the sample template for HTML input:
+
+HTML Report Template Example:
+
+```HTML
+<!DOCTYPE html>
+<html>
+  <head>
+    <title>Supply Chain KPI Report</title>
+  </head>
+  <body>
+    <div id="kpi-report">
+      <h2>Order Fulfillment Cycle Time</h2>
+      <p>Total Time for All Orders: [value]</p>
+      <p>Number of Orders: [value]</p>
+
+      <h2>On-Time Delivery (OTD)</h2>
+      <p>Orders Delivered On Time: [value]</p>
+      <p>Total Orders Shipped: [value]</p>
+
+      <h2>Inventory Turnover Ratio</h2>
+      <p>Cost of Goods Sold (COGS): [value]</p>
+      <p>Average Inventory Value: [value]</p>
+
+      <h2>Freight Cost per Unit</h2>
+      <p>Total Freight Cost: [value]</p>
+      <p>Total Units Shipped: [value]</p>
+
+      <h2>Perfect Order Rate</h2>
+      <p>Orders Delivered Without Issues: [value]</p>
+      <p>Total Orders: [value]</p>
+    </div>
+  </body>
+</html>
+```
+Please provide your data in HTML format only."""
+    return template
+
+# Sample report analysed when the entry script is run without arguments
+SAMPLE_HTML_REPORT = """<!DOCTYPE html>
+    <html>
+    <head>
+        <title>Supply Chain KPI Report</title>
+    </head>
+    <body>
+        <div id="kpi-report">
+        <h2>Order Fulfillment Cycle Time</h2>
+        <p>Total Time for All Orders: 600</p>
+        <p>Number of Orders: 25</p>
+        
+        <h2>On-Time Delivery (OTD)</h2>
+        <p>Orders Delivered On Time: 22</p>
+        <p>Total Orders Shipped: 25</p>
+        
+        <h2>Inventory Turnover Ratio</h2>
+        <p>Cost of Goods Sold (COGS): 15000</p>
+        <p>Average Inventory Value: 3000</p>
+        
+        <h2>Freight Cost per Unit</h2>
+        <p>Total Freight Cost: 90</p>
+        <p>Total Units Shipped: 40</p>
+        
+        <h2>Perfect Order Rate</h2>
+        <p>Orders Delivered Without Issues: 20</p>
+        <p>Total Orders: 25</p>
+        </div>
+    </body>
+    </html>
+
+"""
+
+def route_message(message):
+    """Route one chat message to the template, analysis, feedback or greeting handler"""
+    return MESSAGE_ROUTER.route(message)
+
+def _legacy_classify(message):
+    """The original if/elif routing chain, kept as the baseline for benchmark_router"""
+    if not all(ord(c) < 128 for c in message.replace(" ", "")):
+        return "unsupported_language", None
+    if "template" in message.lower():
+        return "template", None
+    html_match = re.search(r"```HTML\s+(.*?)\s+```", message, re.DOTALL)
+    if html_match:
+        return "html_report", html_match.group(1)
+    rating_match = re.search(r"rate\s+(\d+)", message.lower())
+    if rating_match:
+        return "feedback", rating_match.group(1)
+    
+    response = ""
+    if any(word in message.lower() for word in ["urgent", "asap", "emergency"]):
+        response = "SupplyChainReport-AI here! Let's quickly review your supply chain report."
+    elif "my name is" in message.lower() or "i am" in message.lower():
+        match = re.search(r"(my name is|i am)\s+(\w+)", message.lower())
+        if match:
+            name = match.group(2).capitalize()
+            response = f"Hello, {name}! I am SupplyChainReport-AI, here to help analyze your supply chain report."
+    elif "morning" in message.lower():
+        response = "Good morning! SupplyChainReport-AI is ready to assist you."
+    elif "afternoon" in message.lower():
+        response = "Good afternoon! Let's review your supply chain report together."
+    elif "evening" in message.lower():
+        response = "Good evening! I'm here to help analyze your report."
+    elif "night" in message.lower():
+        response = "Hello! SupplyChainReport-AI is working late to assist you."
+    else:
+        response = "Greetings! I am SupplyChainReport-AI, your supply chain analysis assistant. Please share your HTML report in a markdown code block labeled as HTML to begin."
+    return "greeting", response
+
+def benchmark_router(repeat=5):
+    """Time MessageRouter.classify against the original routing chain on small and large messages"""
+    pasted_report = "Please analyze this one:\n```HTML\n" + SAMPLE_HTML_REPORT * 2000 + "\n```"
+    pasted_log = "Good evening, I am Dana. Here is the export log:\n" + "order 1042 shipped, carrier ok; " * 50000
+    messages = [
+        ("greeting", "Good morning, it's 9AM and I have data ready"),
+        ("name", "Hi there, my name is Alex"),
+        ("rating", "I would rate 4 for this analysis"),
+        ("urgent", "Emergency! Please help me analyze my supply chain report ASAP"),
+        (f"pasted report ({len(pasted_report) // 1024} KiB)", pasted_report),
+        (f"pasted log ({len(pasted_log) // 1024} KiB)", pasted_log)
+    ]
+    
+    rows = []
+    for name, message in messages:
+        if MESSAGE_ROUTER.classify(message) != _legacy_classify(message):
+            raise AssertionError(f"Router disagrees with the original chain on the {name} message")
+        timings = []
+        for classify in (_legacy_classify, MESSAGE_ROUTER.classify):
+            iterations = max(1, min(2000, 200000 // max(1, len(message) // 100)))
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    classify(message)
+                best = min(best, (time.perf_counter() - start) / iterations)
+            timings.append(best)
+        rows.append((name, timings[0], timings[1]))
+    
+    print(f"{'message':<28}{'original (us)':>16}{'router (us)':>14}{'speedup':>10}")
+    for name, original, routed in rows:
+        print(f"{name:<28}{original * 1e6:>16.1f}{routed * 1e6:>14.1f}{original / routed:>9.1f}x")
+    return rows
+
+# Markup mixed around (and between the KPI blocks of) synthetic reports
+SYNTHETIC_NOISE_BLOCKS = (
+    "<nav><ul><li><a href=\"/\">Home</a></li><li><a href=\"/reports\">Reports</a></li><li><a href=\"/help\">Help</a></li></ul></nav>",
+    "<table class=\"shipments\"><tr><th>Lane</th><th>Carrier</th><th>Units</th></tr><tr><td>DAL-ORD</td><td>Acme Freight</td><td>1,240</td></tr></table>",
+    "<script>window.dataLayer = window.dataLayer || []; dataLayer.push({page: 'kpi'});</script>",
+    "<style>.kpi { font-weight: bold; } .muted { color: #777; }</style>",
+    "<!-- exported by the warehouse reporting job -->",
+    "<div class=\"banner\"><span>Quarterly review</span> <em>draft</em> <br> <img src=\"logo.png\" alt=\"logo\"></div>",
+    "<ul class=\"notes\"><li>Figures are preliminary.</li><li>Returns are excluded.</li></ul>"
+)
+
+# Field values that fail numeric extraction
+SYNTHETIC_MALFORMED_VALUES = ("N/A", "", "unknown", "TBD", "--", "see attached")
+
+# Plausible numerator/denominator ratios per KPI; unknown KPIs fall back to the default
+SYNTHETIC_RATIO_RANGES = {
+    "Order Fulfillment Cycle Time": (12.0, 72.0),
+    "On-Time Delivery (OTD)": (0.8, 1.0),
+    "Inventory Turnover Ratio": (2.0, 8.0),
+    "Freight Cost per Unit": (2.0, 8.0),
+    "Perfect Order Rate": (0.8, 1.0)
+}
+SYNTHETIC_DEFAULT_RATIO = (0.5, 10.0)
+
+# Approximate characters of noise markup per document size
+SYNTHETIC_SIZES = {"small": 0, "medium": 16 * 1024, "large": 128 * 1024}
+
+def generate_synthetic_report(rng, size="small", noise=0.5, missing_rate=0.0, malformed_rate=0.0):
+    """Build one report from the provide_template() layout with random values and markup.
+
+    `size` pads the document with noise markup, `noise` is the chance of a noise block before,
+    after and between KPI blocks, `missing_rate` drops KPI blocks and `malformed_rate` replaces
+    field values with text that fails numeric extraction.
+    """
+    layout = provide_template().split("```HTML\n", 1)[1].split("```", 1)[0]
+    head, rest = layout.split("<div id=\"kpi-report\">", 1)
+    body, tail = rest.split("</div>", 1)
+    
+    blocks = []
+    for block in body.strip("\n").split("\n\n"):
+        if rng.random() < missing_rate:
+            continue
+        # Values come in numerator/denominator pairs with a plausible ratio between them
+        heading = re.search(r"<h2>(.*?)</h2>", block).group(1)
+        low, high = SYNTHETIC_RATIO_RANGES.get(heading, SYNTHETIC_DEFAULT_RATIO)
+        denominator = rng.randint(1, 5000)
+        numerator = denominator * rng.uniform(low, high)
+        values = (int(numerator) if high <= 1 or rng.random() < 0.5 else round(numerator, 2), denominator)
+        for value in values:
+            text = rng.choice(SYNTHETIC_MALFORMED_VALUES) if rng.random() < malformed_rate else str(value)
+            block = block.replace("[value]", text, 1)
+        blocks.append(block)
+        if rng.random() < noise:
+            blocks.append("      " + rng.choice(SYNTHETIC_NOISE_BLOCKS))
+    
+    padding = []
+    padding_length = 0
+    while padding_length < SYNTHETIC_SIZES[size]:
+        padding.append(rng.choice(SYNTHETIC_NOISE_BLOCKS))
+        padding_length += len(padding[-1])
+    before = "".join(padding[:len(padding) // 2])
+    after = "".join(padding[len(padding) // 2:])
+    if rng.random() < noise:
+        before += rng.choice(SYNTHETIC_NOISE_BLOCKS)
+    
+    return (head + before + "\n    <div id=\"kpi-report\">\n" + "\n\n".join(blocks) + "\n    </div>" + after + tail)
+
+def synthetic_report_corpus(count=200, seed=0):
+    """Seeded mix of report shapes: (profile, html) pairs across sizes, noise, missing KPIs and bad values"""
+    profiles = (
+        ("clean", {"size": "small", "noise": 0.0}),
+        ("noisy", {"size": "small", "noise": 0.8}),
+        ("medium", {"size": "medium", "noise": 0.5}),
+        ("large", {"size": "large", "noise": 0.5}),
+        ("missing-kpis", {"size": "small", "noise": 0.3, "missing_rate": 0.3}),
+        ("malformed", {"size": "small", "noise": 0.3, "malformed_rate": 0.2})
+    )
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        profile, options = profiles[index % len(profiles)]
+        corpus.append((profile, generate_synthetic_report(rng, **options)))
+    return corpus
+
+# Documents on which parsers tend to disagree: markup inside headings, hidden strings, void and
+# raw-text elements, character references, case, nesting and a second report div
+PARSER_EDGE_CASES = (
+    "<html><body><div id=\"kpi-report\"><h2>Order <b>Fulfillment</b> Cycle Time</h2><p>Total Time for All Orders: 600</p>"
+    "<p>Number of Orders: 25</p></div></body></html>",
+    "<html><body><DIV ID=\"kpi-report\"><H3>On-Time Delivery (OTD)</H3><P>Orders Delivered On Time: 22</P>"
+    "<P>Total Orders Shipped: 25</P></DIV></body></html>",
+    "<html><body><div id=\"kpi-report\"><h2><template>Perfect Order Rate</template></h2><p>a: 1</p><p>b: 2</p>"
+    "<h2>Perfect Order Rate<script>var s = 1;</script></h2><p>Orders Delivered Without Issues: 9</p>"
+    "<p>Total Orders: <rt>: 4</rt>10</p></div></body></html>",
+    "<html><body><div id=\"kpi-report\"><h2>Freight Cost per Unit</h2><img src=\"x.png\"><p>Total Freight Cost: 100</p>"
+    "<br>Total Units Shipped: 50</br><p>Total Units Shipped: 40</p></div></body></html>",
+    "<html><body><div id=\"kpi-report\"><h2>Inventory&#32;Turnover Ratio</h2><p>Cost of Goods Sold (COGS): &#49;5000</p>"
+    "<p>Average Inventory Value: 3000</p><h2>Inventory Turnover Ratio</h2><p>x: 1</p><p>y: 2</p></div></body></html>",
+    "<html><body><template><div id=\"kpi-report\"><h2>Perfect Order Rate</h2><p>a: 1</p><p>b: 2</p></div></template>"
+    "<div id=\"kpi-report\"><h2>Perfect Order Rate</h2><script><p>a: 3</p></script><p>b: 4</p></div></body></html>",
+    "<html><body><div id=\"kpi-report\"><h2>On-Time Delivery (OTD)</h2><div><p>Orders Delivered On Time: 5</p></div>"
+    "<p/><p>Total Orders Shipped:\r\n 7.5</p><p>Extra: 1</p></div></body></html>",
+    "<!DOCTYPE html><html><body><div id=\"kpi-report\"><h2>Order Fulfillment Cycle Time</h2>"
+    "<p>Total Time for All Orders: 600</p></div></body></html>"
+)
+
+def parser_conformance_corpus(count=200, seed=0):
+    """Synthetic reports of every profile (their clean ones fit the template) plus PARSER_EDGE_CASES"""
+    return [html_content for _, html_content in synthetic_report_corpus(count, seed)] + list(PARSER_EDGE_CASES)
+
+def check_parser_conformance(documents=None, engines=None, registry=None):
+    """Check that every parser backend extracts the same kpi_data and errors as the reference.
+
+    The reference is the original bs4 engine when installed, else the stream engine. A backend
+    that declines a document (NonConformingDocument) is counted, not compared. Returns, per
+    engine, the number of documents compared and declined and the indexes of mismatches.
+    """
+    documents = parser_conformance_corpus() if documents is None else documents
+    analyzer = SupplyChainReportAnalyzer(registry=registry)
+    reference = PARSER_BACKENDS["bs4" if "bs4" in PARSER_BACKENDS else "stream"]
+    engines = engines or tuple(PARSER_BACKENDS)
+    
+    def outcome(backend, html_content):
+        result = AnalysisResult()
+        sections = backend.collect(html_content, analyzer.kpis)
+        if sections is None:
+            return None
+        analyzer.extract_sections(sections, result)
+        return result.kpi_data, result.errors
+    
+    report = {engine: {"compared": 0, "declined": 0, "mismatches": []} for engine in engines}
+    for index, html_content in enumerate(documents):
+        expected = outcome(reference, html_content)
+        for engine in engines:
+            try:
+                actual = outcome(PARSER_BACKENDS[engine], html_content)
+            except NonConformingDocument:
+                report[engine]["declined"] += 1
+                continue
+            report[engine]["compared"] += 1
+            if actual != expected:
+                report[engine]["mismatches"].append(index)
+    return report
+
+def run_parser_conformance(count=200, seed=0):
+    """Print the conformance table; returns True when no backend disagrees with the reference"""
+    report = check_parser_conformance(parser_conformance_corpus(count, seed))
+    print(f"{'engine':<12}{'compared':>10}{'declined':>10}{'mismatches':>12}")
+    for engine, outcome in report.items():
+        print(f"{engine:<12}{outcome['compared']:>10}{outcome['declined']:>10}{len(outcome['mismatches']):>12}")
+        if outcome["mismatches"]:
+            print(f"  first mismatching documents: {outcome['mismatches'][:10]}")
+    return not any(outcome["mismatches"] for outcome in report.values())
+
+BENCHMARK_STAGES = ("validate_html", "parse_html", "calculate_kpis", "generate_executive_summary", "generate_report")
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _run_stages(analyzer, html_content, record):
+    """Run the analysis stages in order, passing each stage's elapsed seconds and result to `record`"""
+    result = AnalysisResult()
+    calls = (
+        ("validate_html", lambda: analyzer.validate_html(html_content, result)),
+        ("parse_html", lambda: analyzer.parse_html(html_content, result)),
+        ("calculate_kpis", lambda: analyzer.calculate_kpis(result)),
+        ("generate_executive_summary", lambda: analyzer.generate_executive_summary(result)),
+        ("generate_report", lambda: analyzer.generate_report(result))
+    )
+    for stage, call in calls:
+        start = time.perf_counter()
+        outcome = call()
+        record(stage, time.perf_counter() - start)
+        # Later stages only run when the pipeline would reach them
+        if stage in ("validate_html", "parse_html") and not outcome:
+            break
+
+def benchmark_stages(corpus=None, repeat=3, parser_engine="stream", seed=0):
+    """Time each analysis stage over a synthetic corpus: p50/p95/p99 latency and peak traced memory"""
+    if corpus is None:
+        corpus = synthetic_report_corpus(seed=seed)
+    analyzer = SupplyChainReportAnalyzer(parser_engine=parser_engine)
+    
+    samples = {stage: [] for stage in BENCHMARK_STAGES}
+    record = lambda stage, seconds: samples[stage].append(seconds)
+    for _ in range(repeat):
+        for _, html_content in corpus:
+            _run_stages(analyzer, html_content, record)
+    
+    # Memory is measured in a separate pass so tracing overhead stays out of the latencies
+    peaks = dict.fromkeys(BENCHMARK_STAGES, 0)
+    allocated_before = [0]
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    
+    def record_peak(stage, seconds):
+        # Peak above what was allocated when the stage started, then re-arm for the next stage
+        peaks[stage] = max(peaks[stage], tracemalloc.get_traced_memory()[1] - allocated_before[0])
+        tracemalloc.reset_peak()
+        allocated_before[0] = tracemalloc.get_traced_memory()[0]
+    
+    try:
+        for _, html_content in corpus:
+            tracemalloc.reset_peak()
+            allocated_before[0] = tracemalloc.get_traced_memory()[0]
+            _run_stages(analyzer, html_content, record_peak)
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    
+    stages = {}
+    for stage in BENCHMARK_STAGES:
+        latencies = sorted(samples[stage])
+        stages[stage] = {
+            "calls": len(latencies),
+            "p50_us": _percentile(latencies, 50) * 1e6,
+            "p95_us": _percentile(latencies, 95) * 1e6,
+            "p99_us": _percentile(latencies, 99) * 1e6,
+            "peak_kib": peaks[stage] / 1024
+        }
+    return {
+        "python": sys.version.split()[0],
+        "parser_engine": parser_engine,
+        "reports": len(corpus),
+        "repeat": repeat,
+        "seed": seed,
+        "stages": stages
+    }
+
+# Metrics gated against a baseline; p99 is reported but too noisy at microsecond scale to gate on
+BENCHMARK_GATED_METRICS = ("p50_us", "p95_us", "peak_kib")
+
+def compare_benchmark(results, baseline, tolerance=0.25, min_delta=10.0):
+    """List the stage metrics that regressed by more than `tolerance` (a fraction) against a saved baseline.
+
+    Differences below `min_delta` (microseconds or KiB) are ignored as timer and allocator noise.
+    """
+    for setting in ("parser_engine", "reports", "seed"):
+        if baseline.get(setting) != results.get(setting):
+            raise ValueError(f"Baseline was recorded with {setting}={baseline.get(setting)!r}, "
+                             f"not {results.get(setting)!r}")
+    
+    regressions = []
+    for stage, metrics in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        for metric in BENCHMARK_GATED_METRICS:
+            before, after = previous[metric], metrics[metric]
+            if after > before * (1 + tolerance) and after - before >= min_delta:
+                regressions.append((stage, metric, before, after))
+    return regressions
+
+def run_benchmark(reports=200, seed=0, repeat=3, parser_engine="stream", save=None, compare=None, tolerance=0.25):
+    """Print a per-stage benchmark table, optionally saving it or checking it against a JSON baseline"""
+    results = benchmark_stages(synthetic_report_corpus(reports, seed), repeat=repeat,
+                               parser_engine=parser_engine, seed=seed)
+    
+    print(f"{'stage':<30}{'calls':>8}{'p50 (us)':>11}{'p95 (us)':>11}{'p99 (us)':>11}{'peak (KiB)':>12}")
+    for stage, metrics in results["stages"].items():
+        print(f"{stage:<30}{metrics['calls']:>8}{metrics['p50_us']:>11.1f}{metrics['p95_us']:>11.1f}"
+              f"{metrics['p99_us']:>11.1f}{metrics['peak_kib']:>12.1f}")
+    
+    if save:
+        with open(save, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    
+    regressions = []
+    if compare:
+        with open(compare, encoding="utf-8") as baseline_file:
+            regressions = compare_benchmark(results, json.load(baseline_file), tolerance)
+        for stage, metric, before, after in regressions:
+            change = f"+{(after / before - 1) * 100:.0f}%" if before else "new"
+            print(f"REGRESSION: {stage} {metric} {before:.1f} -> {after:.1f} ({change})")
+        if not regressions:
+            print(f"No regressions beyond {tolerance * 100:.0f}% against {compare}.")
+    return regressions
+
+def _import_times(stderr):
+    """Cumulative microseconds of each top-level import, and of the imports it makes directly, in `-X importtime` output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative = cumulative.strip()
+        if cumulative.isdigit() and not name.startswith("    "):
+            modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative)
+    return modules
+
+# Thin command-line script next to this module; only it runs as __main__, so the module's bytecode is cached
+ENTRY_SCRIPT = "SupplyChainReport-AI-HTML-LLM.py"
+
+def benchmark_startup(runs=5, requests=200):
+    """Compare cold-start costs of one-shot CLI runs with requests answered by a persistent worker.
+
+    Returns the median wall times (ms) of a bare interpreter, of importing this module, and of a
+    one-shot run of the entry script analysing the sample report, the median per-request round
+    trip (ms) through `worker`, and the slowest imports (ms) seen by `-X importtime` while
+    importing it.
+    """
+    import subprocess
+    
+    directory, filename = os.path.split(os.path.abspath(__file__))
+    script = os.path.join(directory, ENTRY_SCRIPT)
+    commands = {
+        "interpreter": [sys.executable, "-c", "pass"],
+        "import module": [sys.executable, "-X", "importtime", "-c", f"import {os.path.splitext(filename)[0]}"],
+        "one-shot analysis": [sys.executable, script]
+    }
+    
+    timings = {}
+    imports = {}
+    for name, command in commands.items():
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            completed = subprocess.run(command, capture_output=True, text=True, check=True, cwd=directory)
+            samples.append((time.perf_counter() - start) * 1000)
+            if name == "import module":
+                for module, microseconds in _import_times(completed.stderr).items():
+                    imports[module] = imports.get(module, 0) + microseconds / runs / 1000
+        timings[name] = _percentile(sorted(samples), 50)
+    
+    worker = subprocess.Popen([sys.executable, script, "worker"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    try:
+        samples = []
+        for index in range(requests):
+            start = time.perf_counter()
+            worker.stdin.write(json.dumps({"id": index, "message": "Good morning, my name is Alex"}) + "\n")
+            worker.stdout.readline()
+            samples.append((time.perf_counter() - start) * 1000)
+        # The first answer also waits for the worker to start
+        timings["worker request"] = _percentile(sorted(samples[1:]), 50)
+    finally:
+        worker.stdin.close()
+        worker.wait()
+    
+    slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:8]
+    return {"timings_ms": timings, "imports_ms": dict(slowest)}
+
+def run_startup_benchmark(runs=5, requests=200):
+    """Print the startup benchmark"""
+    results = benchmark_startup(runs, requests)
+    print(f"{'path':<24}{'median (ms)':>14}")
+    for name, milliseconds in results["timings_ms"].items():
+        print(f"{name:<24}{milliseconds:>14.2f}")
+    print()
+    print(f"{'top-level import':<24}{'cumulative (ms)':>18}")
+    for module, milliseconds in results["imports_ms"].items():
+        print(f"{module:<24}{milliseconds:>18.2f}")
+    return results
+
+def main():
+    """Main function to process user input and generate response"""
+    message = input("Enter your message: ")
+    return route_message(message)
+
+HTTP_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+    411: "Length Required", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+class HTTPError(Exception):
+    """An HTTP error response raised while reading or dispatching a request"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class ReportService:
+    """Local HTTP/JSON front-end for the chat-style router, built on asyncio streams.
+
+    Endpoints: POST /message with {"message": ...} (routed like main()), POST /analyze with a raw
+    HTML body, and GET /health. Messages carrying an HTML report are analysed on a bounded
+    executor so the event loop never parses; at most `max_pending` of them may be queued or running,
+    beyond that clients get 503 with Retry-After. Bodies larger than `max_body_bytes` get 413.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, workers=None, max_pending=64,
+                 max_body_bytes=1024 * 1024, max_header_bytes=16 * 1024, request_timeout=30.0,
+                 use_threads=False):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_body_bytes = max_body_bytes
+        self.max_header_bytes = max_header_bytes
+        self.request_timeout = request_timeout
+        self.use_threads = use_threads
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None
+        self._server = None
+
+    async def start(self):
+        """Start listening; with port 0 the chosen port is stored back in `self.port`"""
+        if self.use_threads:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            # Start the workers before any client socket exists, so no forked worker holds a
+            # connection open after the server has closed it
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self._executor, os.getpid) for _ in range(self.workers)])
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=self.max_header_bytes
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.request_timeout)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload, extra_headers = await self._dispatch(method, path, body)
+                except HTTPError as exc:
+                    # The rest of the request may still be unread, so never reuse the connection
+                    keep_alive = False
+                    status, payload, extra_headers = exc.status, {"error": exc.message}, {}
+                except asyncio.TimeoutError:
+                    keep_alive = False
+                    status, payload, extra_headers = 408, {"error": "Request timed out."}, {}
+                await self._write_response(writer, status, payload, keep_alive, extra_headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        """Read one request; returns None when the client closed an idle connection"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                raise HTTPError(400, "Malformed request line.")
+            method, path, _ = parts
+            
+            headers = {}
+            header_bytes = len(request_line)
+            while True:
+                line = await reader.readline()
+                header_bytes += len(line)
+                if header_bytes > self.max_header_bytes:
+                    raise HTTPError(431, "Request headers are too large.")
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except (asyncio.LimitOverrunError, ValueError):
+            raise HTTPError(431, "Request headers are too large.")
+        
+        body = b""
+        if method == "POST":
+            if "content-length" not in headers:
+                raise HTTPError(411, "Content-Length is required.")
+            # Only plain decimal digits: int() would also take a sign, underscores and non-ASCII digits
+            length = headers["content-length"]
+            if not (length.isascii() and length.isdigit()):
+                raise HTTPError(400, "Invalid Content-Length.")
+            length = int(length)
+            if length > self.max_body_bytes:
+                raise HTTPError(413, f"Request body exceeds {self.max_body_bytes} bytes.")
+            body = await reader.readexactly(length)
+        return method, path, headers, body
+
+    async def _dispatch(self, method, path, body):
+        """Map a request to (status, JSON payload, extra headers)"""
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "Use GET for /health.")
+            return 200, {"status": "ok", "in_flight": self.in_flight, "rejected": self.rejected}, {}
+        
+        if path == "/message":
+            if method != "POST":
+                raise HTTPError(405, "Use POST for /message.")
+            try:
+                message = json.loads(body.decode("utf-8"))["message"]
+            except (UnicodeDecodeError, ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'Expected a JSON body like {"message": "..."}.')
+            if not isinstance(message, str):
+                raise HTTPError(400, "The message must be a string.")
+            # Only messages carrying an HTML report are expensive enough to leave the event loop
+            if "```HTML" not in message:
+                return 200, {"response": route_message(message)}, {}
+            return await self._run_in_executor(route_message, message)
+        
+        if path == "/analyze":
+            if method != "POST":
+                raise HTTPError(405, "Use POST for /analyze.")
+            try:
+                html_content = body.decode("utf-8")
+            except UnicodeDecodeError:
+                raise HTTPError(400, "The HTML report must be UTF-8 encoded.")
+            return await self._run_in_executor(process_html_report, html_content)
+        
+        raise HTTPError(404, f"Unknown path: {path}")
+
+    async def _run_in_executor(self, function, argument):
+        """Run CPU-bound work on the executor, shedding load once `max_pending` jobs are queued"""
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            return 503, {"error": "Server is busy, please retry."}, {"Retry-After": "1"}
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self._executor, function, argument)
+        finally:
+            self.in_flight -= 1
+        return 200, {"response": response}, {}
+
+    async def _write_response(self, writer, status, payload, keep_alive, extra_headers):
+        body = json.dumps(payload).encode("utf-8")
+        lines = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'Unknown')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        # Waiting for the socket buffer to drain applies backpressure to fast clients
+        await writer.drain()
+
+async def http_request(host, port, method, path, body=b"", headers=None):
+    """Minimal asyncio HTTP/1.1 client: returns (status, decoded JSON body)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close",
+                 f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(payload.decode("utf-8"))
+
+async def service_self_test(concurrency=200, use_threads=False):
+    """Exercise a ReportService on an ephemeral localhost port with the stdlib client above"""
+    service = await ReportService(port=0, max_pending=concurrency, max_body_bytes=64 * 1024,
+                                  use_threads=use_threads).start()
+    checks = []
+    try:
+        def message_body(message):
+            return json.dumps({"message": message}).encode("utf-8")
+
+        status, payload = await http_request(service.host, service.port, "GET", "/health")
+        checks.append(("health", status == 200 and payload["status"] == "ok"))
+        
+        status, payload = await http_request(service.host, service.port, "POST", "/message",
+                                             message_body("Good morning, I need a template"))
+        checks.append(("template", status == 200 and payload["response"] == provide_template()))
+        
+        status, payload = await http_request(service.host, service.port, "POST", "/message", message_body("rate 5"))
+        checks.append(("feedback", status == 200 and payload["response"] == handle_feedback("5")))
+        
+        status, payload = await http_request(service.host, service.port, "POST", "/analyze",
+                                             SAMPLE_HTML_REPORT.encode("utf-8"))
+        checks.append(("analyze", status == 200 and payload["response"] == process_html_report(SAMPLE_HTML_REPORT)))
+        
+        status, _ = await http_request(service.host, service.port, "POST", "/analyze", b"x" * (64 * 1024 + 1))
+        checks.append(("body limit", status == 413))
+        
+        status, _ = await http_request(service.host, service.port, "GET", "/missing")
+        checks.append(("not found", status == 404))
+        
+        status, _ = await http_request(service.host, service.port, "POST", "/message", b"not json")
+        checks.append(("bad request", status == 400))
+        
+        # Many concurrent users submitting reports through the chat route
+        chat_message = message_body("Please analyze:\n```HTML\n" + SAMPLE_HTML_REPORT + "\n```")
+        expected = process_html_report(SAMPLE_HTML_REPORT.strip())
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            http_request(service.host, service.port, "POST", "/message", chat_message)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        checks.append(("concurrent", all(status == 200 and payload["response"] == expected
+                                         for status, payload in responses)))
+    finally:
+        await service.close()
+    
+    for name, passed in checks:
+        print(f"{'PASS' if passed else 'FAIL'}: {name}")
+    print(f"{concurrency} concurrent report submissions in {elapsed:.2f}s")
+    return all(passed for _, passed in checks)
+
+
+def build_arg_parser():
+    """Command-line interface: no arguments analyses the built-in sample report"""
+    parser = argparse.ArgumentParser(description="Analyze supply chain KPI reports provided in HTML format.")
+    parser.add_argument("--report-format", choices=REPORT_FORMATS, default="markdown",
+                        help="rendering of the sample report when no command is given")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    batch = subparsers.add_parser("batch", help="analyze many report files across a process pool")
+    batch.add_argument("source", help="directory, glob pattern or manifest file (one path per line)")
+    batch.add_argument("-o", "--output", help="write NDJSON results here instead of stdout")
+    batch.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("--chunksize", type=int, default=64, help="reports per task submitted to the pool")
+    batch.add_argument("--unordered", action="store_true", help="write results as they complete instead of in input order")
+    batch.add_argument("--cache", metavar="PATH", help="SQLite result cache shared by workers and later runs")
+    batch.add_argument("--report-format", choices=REPORT_FORMATS, default="markdown", help="rendering of each report")
+    batch.add_argument("--metrics-file", metavar="PATH", help="write per-stage metrics in Prometheus text format")
+    batch.add_argument("--metrics-log", action="store_true", help="log one JSON metrics event per report to stderr")
+    
+    stream = subparsers.add_parser("stream", help="analyze every report in one large HTML or NDJSON input with bounded memory")
+    stream.add_argument("source", nargs="?", default="-", help="input file (default: stdin)")
+    stream.add_argument("-f", "--format", choices=["html", "ndjson"], default="html",
+                        help="html: many <div id=\"kpi-report\"> sections; ndjson: one HTML payload per line")
+    stream.add_argument("-o", "--output", help="write NDJSON results here instead of stdout")
+    stream.add_argument("--html-key", default="html", help="NDJSON field holding the HTML payload")
+    stream.add_argument("--chunk-size", type=int, default=65536, help="characters read per chunk")
+    stream.add_argument("--report-format", choices=REPORT_FORMATS, default="markdown", help="rendering of each report")
+    stream.add_argument("--metrics-file", metavar="PATH", help="write per-stage metrics in Prometheus text format")
+    stream.add_argument("--metrics-log", action="store_true", help="log one JSON metrics event per report to stderr")
+    stream.add_argument("--history", metavar="PATH",
+                        help="SQLite KPI history; NDJSON records with a \"site\" (and \"date\") are appended and get trends")
+    stream.add_argument("--diff", action="store_true",
+                        help="re-analyze NDJSON records with a \"report_id\" against its previous version and log KPI changes")
+    stream.add_argument("--rules", metavar="PATH",
+                        help="JSON list of threshold overrides ({\"tenant\", \"site\", \"kpi\", \"threshold\", \"text\"}) "
+                             "applied by each NDJSON record's \"tenant\" and \"site\"")
+    stream.add_argument("--binary", metavar="PATH", help="also append every result to this binary KPI record file")
+    
+    history = subparsers.add_parser("history", help="show the KPI trends recorded in a history store")
+    history.add_argument("path", help="SQLite KPI history written by stream --history")
+    history.add_argument("--site", help="site to show (default: every site)")
+    history.add_argument("--kpi", help="print this KPI's recorded values instead of the trends")
+    history.add_argument("--since", metavar="DATE", help="with --kpi, only values from this ISO date on")
+    
+    rollup = subparsers.add_parser("rollup", help="weighted KPI roll-ups of analysed reports by region, month, ...")
+    rollup.add_argument("source", nargs="?", default="-",
+                        help="NDJSON of analysed reports with kpi_data and dimension fields, e.g. the output of "
+                             "stream -f ndjson (default: stdin)")
+    rollup.add_argument("--by", default="", help="comma-separated dimensions; year/month/day default to a prefix of \"date\"")
+    rollup.add_argument("--cube", action="store_true", help="also emit every coarser grouping down to the grand total")
+    rollup.add_argument("-o", "--output", help="write NDJSON groups here instead of stdout")
+    
+    scan = subparsers.add_parser("scan", help="per-KPI summary of a binary KPI record file written by stream --binary")
+    scan.add_argument("path", help="binary KPI record file")
+    scan.add_argument("--records", action="store_true", help="print every record as NDJSON instead")
+    
+    worker = subparsers.add_parser("worker", help="answer NDJSON message/html requests from stdin in one long-lived process")
+    worker.add_argument("--report-format", choices=REPORT_FORMATS, default="markdown", help="rendering of analysed reports")
+    
+    bench_startup = subparsers.add_parser("bench-startup", help="cold-start cost of one-shot runs versus the worker")
+    bench_startup.add_argument("--runs", type=int, default=5, help="cold starts timed per path")
+    bench_startup.add_argument("--requests", type=int, default=200, help="requests sent to the worker")
+    
+    subparsers.add_parser("bench-router", help="micro-benchmark the message router against the original chain")
+    
+    bench = subparsers.add_parser("bench", help="per-stage latency and memory benchmark on synthetic reports")
+    bench.add_argument("-n", "--reports", type=int, default=200, help="synthetic reports in the corpus")
+    bench.add_argument("--seed", type=int, default=0, help="seed for the synthetic report generator")
+    bench.add_argument("--repeat", type=int, default=3, help="timed passes over the corpus")
+    bench.add_argument("--engine", choices=parser_engine_names(), default="stream", help="HTML parser engine")
+    bench.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    bench.add_argument("--compare", metavar="PATH", help="fail if slower than this JSON baseline")
+    bench.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (fraction)")
+    
+    conformance = subparsers.add_parser("conformance", help="check that every parser backend extracts identical KPI data")
+    conformance.add_argument("-n", "--reports", type=int, default=200, help="synthetic reports checked besides the edge cases")
+    conformance.add_argument("--seed", type=int, default=0, help="seed for the synthetic report generator")
+    
+    serve = subparsers.add_parser("serve", help="run the chat router as a local HTTP/JSON service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("-w", "--workers", type=int, default=None, help="analysis workers (default: CPU count)")
+    serve.add_argument("--max-pending", type=int, default=64, help="queued or running analyses before answering 503")
+    serve.add_argument("--max-body-bytes", type=int, default=1024 * 1024, help="largest accepted request body")
+    serve.add_argument("--threads", action="store_true", help="analyze on a thread pool instead of processes")
+    serve.add_argument("--self-test", action="store_true", help="start on a free port, run client checks and exit")
+    
+    return parser
+
+
+# Entry point of SupplyChainReport-AI-HTML-LLM.py
+def run_cli(argv=None):
+    """Parse the command line and run the selected command"""
+    args = build_arg_parser().parse_args(argv)
+    
+    if args.command == "batch":
+        instrumentation = build_instrumentation(args.metrics_file, args.metrics_log)
+        try:
+            stats = run_batch(args.source, output=args.output, workers=args.workers,
+                              chunksize=args.chunksize, ordered=not args.unordered, cache_path=args.cache,
+                              output_format=args.report_format, instrumentation=instrumentation)
+        finally:
+            if instrumentation:
+                instrumentation.close()
+        print(f"Analysed {stats['reports']} report(s) in {stats['seconds']:.2f}s "
+              f"({stats['reports_per_second']:.1f} reports/s), {stats['failed']} with errors.", file=sys.stderr)
+    elif args.command == "stream":
+        instrumentation = build_instrumentation(args.metrics_file, args.metrics_log)
+        try:
+            stats = run_stream(args.source, input_format=args.format, output=args.output, html_key=args.html_key,
+                               chunk_size=args.chunk_size, output_format=args.report_format,
+                               instrumentation=instrumentation, history_path=args.history, diff=args.diff,
+                               rules_path=args.rules, binary_path=args.binary)
+        finally:
+            if instrumentation:
+                instrumentation.close()
+        print(f"Analysed {stats['reports']} report(s) in {stats['seconds']:.2f}s "
+              f"({stats['reports_per_second']:.1f} reports/s), {stats['failed']} with errors.", file=sys.stderr)
+    elif args.command == "history":
+        store = KPIHistoryStore(args.path)
+        try:
+            for site in [args.site] if args.site else store.sites():
+                if args.kpi:
+                    for date, kpi, value, breached in store.history(site, args.kpi, args.since):
+                        print(json.dumps({"site": site, "date": date, "kpi": kpi, "value": value, "breached": breached}))
+                else:
+                    print(json.dumps({"site": site, "trends": store.trends(site)}))
+        finally:
+            store.close()
+    elif args.command == "rollup":
+        group_by = tuple(name.strip() for name in args.by.split(",") if name.strip())
+        reports = run_rollup(args.source, group_by=group_by, cube=args.cube, output=args.output)
+        print(f"Rolled up {reports} report(s).", file=sys.stderr)
+    elif args.command == "scan":
+        if args.records:
+            with BinaryRecordReader(args.path) as reader:
+                for record in reader:
+                    print(json.dumps(record))
+        else:
+            print(json.dumps(scan_binary_records(args.path)))
+    elif args.command == "worker":
+        handled = run_worker(output_format=args.report_format)
+        print(f"Answered {handled} request(s).", file=sys.stderr)
+    elif args.command == "bench-startup":
+        run_startup_benchmark(args.runs, args.requests)
+    elif args.command == "conformance":
+        sys.exit(0 if run_parser_conformance(args.reports, args.seed) else 1)
+    elif args.command == "bench-router":
+        benchmark_router()
+    elif args.command == "bench":
+        try:
+            regressions = run_benchmark(args.reports, seed=args.seed, repeat=args.repeat, parser_engine=args.engine,
+                                        save=args.save, compare=args.compare, tolerance=args.tolerance)
+        except ValueError as exc:
+            sys.exit(f"error: {exc}")
+        sys.exit(1 if regressions else 0)
+    elif args.command == "serve":
+        if args.self_test:
+            sys.exit(0 if asyncio.run(service_self_test(use_threads=args.threads)) else 1)
+        service = ReportService(args.host, args.port, workers=args.workers, max_pending=args.max_pending,
+                                max_body_bytes=args.max_body_bytes, use_threads=args.threads)
+        
+        async def serve():
+            await service.start()
+            print(f"Serving on http://{service.host}:{service.port}", file=sys.stderr)
+            try:
+                await service.serve_forever()
+            finally:
+                await service.close()
+        
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+    else:
+        # Process the built-in sample report and print the report
+        report = process_html_report(SAMPLE_HTML_REPORT, output_format=args.report_format)
+        print(report)
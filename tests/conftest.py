@@ -0,0 +1,16 @@
+import os
+import sys
+
+# The implementation is the supply_chain_report module at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import supply_chain_report as scr
+
+CYCLE_TIME = "Order Fulfillment Cycle Time"
+REPORT_START = '<div id="kpi-report">'
+
+def report(orders=25, before="", inside=""):
+    """The sample report with a different Number of Orders (cycle time = 600 / orders) and markup
+    before or at the top of the kpi-report div"""
+    html = scr.SAMPLE_HTML_REPORT.replace("Number of Orders: 25", f"Number of Orders: {orders}")
+    return html.replace(REPORT_START, before + REPORT_START + inside)
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+import supply_chain_report as scr
+from conftest import CYCLE_TIME, report
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failing_file_gets_an_error_record_and_the_batch_completes(tmp_path, workers):
+    (tmp_path / "a.html").write_text(report(25), encoding="utf-8")
+    (tmp_path / "b.html").write_bytes(b"\xff\xfe not UTF-8")
+    (tmp_path / "d.html").write_text(report(50), encoding="utf-8")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("a.html\nb.html\nc.html\nd.html\n", encoding="utf-8")
+    output = tmp_path / "results.ndjson"
+    
+    stats = scr.run_batch(str(manifest), output=str(output), workers=workers, chunksize=1)
+    
+    results = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert (stats["reports"], stats["failed"]) == (4, 2)
+    assert [result["path"] for result in results] == [str(tmp_path / name) for name in ("a.html", "b.html", "c.html", "d.html")]
+    assert [result["ok"] for result in results] == [True, False, False, True]
+    assert "UnicodeDecodeError" in results[1]["errors"][0]
+    assert "FileNotFoundError" in results[2]["errors"][0]
+    assert [results[0]["calculated_values"][CYCLE_TIME], results[3]["calculated_values"][CYCLE_TIME]] == [24.0, 12.0]
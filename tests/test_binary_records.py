@@ -0,0 +1,45 @@
+import pytest
+
+import supply_chain_report as scr
+
+pytest.importorskip("numpy")
+
+def write_and_read(tmp_path, results):
+    path = str(tmp_path / "records.bin")
+    with scr.BinaryRecordWriter(path) as writer:
+        for key, result in enumerate(results):
+            writer.append(result, key=key)
+    with scr.BinaryRecordReader(path) as reader:
+        return list(reader)
+
+def test_results_round_trip(tmp_path):
+    analyzer = scr.SupplyChainReportAnalyzer()
+    ok = analyzer.analyze(scr.SAMPLE_HTML_REPORT)
+    failed = analyzer.analyze(scr.SAMPLE_HTML_REPORT.replace("Number of Orders: 25", "Number of Orders: many")
+                              .replace("<h2>Perfect Order Rate</h2>", ""))
+    
+    records = write_and_read(tmp_path, [ok, failed])
+    
+    assert [(record["key"], record["ok"], record["errors_truncated"]) for record in records] == [
+        (0, True, False), (1, False, False)]
+    for record, analysis in zip(records, [ok, failed]):
+        assert record["kpi_data"] == analysis.kpi_data
+        assert record["calculated_values"] == analysis.calculated_values
+        assert record["errors"] == analysis.errors
+
+def test_error_codes_past_the_table_are_flagged(tmp_path):
+    layout = scr.BinaryRecordLayout.from_registry(scr.KPI_REGISTRY.compile())
+    errors = [f"ERROR: Note {index}." for index in range(layout.error_slots + 5)]
+    result = {"kpi_data": {}, "calculated_values": {}, "errors": errors}
+    
+    record, = write_and_read(tmp_path, [result])
+    
+    assert not record["ok"] and record["errors_truncated"]
+    assert record["errors"] == ["ERROR: Unrecognized error."] * (layout.error_slots - 1)
+
+def test_layout_indexes_fit_the_error_codes():
+    kpis = [f"KPI {index}" for index in range(4097)]
+    
+    with pytest.raises(ValueError):
+        scr.BinaryRecordLayout(kpis, [(kpi, "Value") for kpi in kpis])
+    assert scr.BinaryRecordLayout(kpis[:4096], [(kpi, "Value") for kpi in kpis[:4096]]).error_slots > 4096
@@ -0,0 +1,117 @@
+import concurrent.futures
+
+import pytest
+
+import supply_chain_report as scr
+from conftest import CYCLE_TIME, REPORT_START, report
+
+def test_resubmitted_report_is_answered_from_the_cache():
+    cache = scr.ReportCache()
+    analyzer = scr.SupplyChainReportAnalyzer(cache=cache)
+    
+    first = analyzer.analyze(report())
+    second = analyzer.analyze(report().replace("<title>", "<title>Resent: "))
+    
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second.report == first.report
+
+@pytest.mark.parametrize("before", [
+    '<!-- <div id="kpi-report">old</div> -->',
+    '<![CDATA[<div id="kpi-report">old</div>]]>',
+    "<script>document.write('<div id=\"kpi-report\">old</div>');</script>",
+    '<style>/* <div id="kpi-report"> */</style>'
+])
+def test_commented_out_report_div_is_not_the_cache_key(before):
+    analyzer = scr.SupplyChainReportAnalyzer(cache=scr.ReportCache())
+    
+    analyzer.analyze(report(25, before=before))
+    result = analyzer.analyze(report(50, before=before))
+    
+    assert result.calculated_values[CYCLE_TIME] == 12.0
+
+@pytest.mark.parametrize("inside", [
+    "<script>var closing = '</div>';</script>",
+    "<style>/* </div> */</style>",
+    "<!-- </div> -->",
+    "<![CDATA[</div>]]>",
+    '<span title="</div>">note</span>',
+    "<p class='x' data-end='</div>'>note</p>"
+])
+def test_div_end_tag_in_skipped_markup_does_not_end_the_key(inside):
+    kpis = scr.KPI_REGISTRY.compile()
+    total_orders = report(inside=inside).replace("Total Orders: 25", "Total Orders: 40")
+    
+    assert scr.report_cache_key(report(inside=inside), kpis) != scr.report_cache_key(total_orders, kpis)
+    analyzer = scr.SupplyChainReportAnalyzer(cache=scr.ReportCache())
+    analyzer.analyze(report(inside=inside))
+    assert analyzer.analyze(total_orders).calculated_values["Perfect Order Rate"] == 50.0
+
+@pytest.mark.parametrize("html", [
+    report(before="<!-- unterminated"),
+    report(before='<textarea><div id="kpi-report">old</div></textarea>'),
+    report(inside="<script>var s = '</div>';"),
+    scr.SAMPLE_HTML_REPORT.replace(REPORT_START, '<div id="kpi&#45;report">'),
+    scr.SAMPLE_HTML_REPORT.replace(REPORT_START, '<div id="kpi-report" id="other">')
+])
+def test_ambiguous_markup_is_not_cached(html):
+    assert scr.report_cache_key(html, scr.KPI_REGISTRY.compile()) is None
+
+def test_report_div_slice_ignores_quoted_angle_brackets():
+    html = report(before='<div title="a > b"><div class="x">', inside="")
+    html = html.replace(REPORT_START, '<div data-note="<div>" id="kpi-report">')
+    div = scr.extract_kpi_report_div(html)
+    
+    assert div.startswith('<div data-note="<div>" id="kpi-report">')
+    assert div.endswith("<p>Total Orders: 25</p>\n        </div>")
+
+def test_report_div_slice_ends_where_an_outer_element_closes():
+    html = report(before="<section>", inside="</section>")
+    
+    assert scr.extract_kpi_report_div(html) == REPORT_START + "</section>"
+
+def units_per_order(formula):
+    """An extra KPI computed by `formula` from a "Units per Order" section"""
+    return scr.KPIDefinition(
+        "Units per Order", fields=["Units", "Orders"], formula=formula, threshold_operator=">", threshold_value=1,
+        threshold_text="above 1", pass_summary="Units per Order of {value} is above 1.",
+        fail_summary="Units per Order of {value} is not above 1.", calculation_steps=["Step 1 – Divide units by orders."]
+    )
+
+def test_cache_keys_tell_anonymous_formulas_apart():
+    registry = scr.KPIRegistry(scr.KPI_REGISTRY.compile().definitions.values())
+    analyzer = scr.SupplyChainReportAnalyzer(registry=registry, cache=scr.ReportCache())
+    html = report(inside="<h2>Units per Order</h2><p>Units: 40</p><p>Orders: 25</p>")
+    
+    registry.register(units_per_order(lambda units, orders: units / orders))
+    first = analyzer.analyze(html)
+    registry.unregister("Units per Order")
+    registry.register(units_per_order(lambda units, orders: units / orders * 100))
+    second = analyzer.analyze(html)
+    registry.unregister("Units per Order")
+    third = analyzer.analyze(html)
+    
+    assert first.calculated_values["Units per Order"] == 1.6
+    assert second.calculated_values["Units per Order"] == 160.0
+    assert "Units per Order" not in third.calculated_values
+    assert third.calculated_values == scr.SupplyChainReportAnalyzer().analyze(html).calculated_values
+
+def test_formulas_without_a_stable_identity_are_not_cached():
+    scale = {"factor": 100}
+    registry = scr.KPIRegistry(scr.KPI_REGISTRY.compile().definitions.values())
+    registry.register(units_per_order(lambda units, orders: units / orders * scale["factor"]))
+    
+    assert scr.formula_identity(registry.compile().formulas["Units per Order"]) is None
+    assert scr.report_cache_key(report(), registry.compile()) is None
+
+def test_cache_is_shared_by_worker_threads(tmp_path):
+    cache = scr.ReportCache(max_entries=4, path=str(tmp_path / "cache.sqlite"))
+    analyzer = scr.SupplyChainReportAnalyzer(cache=cache)
+    orders = [10, 20, 30, 40, 50, 60] * 20
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda count: analyzer.analyze(report(count)), orders))
+    
+    assert [result.calculated_values[CYCLE_TIME] for result in results] == [600 / count for count in orders]
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == len(orders)
+    assert stats["memory_entries"] == 4 and stats["hits"] >= len(orders) - 6 * 8
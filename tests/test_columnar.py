@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+import supply_chain_report as scr
+
+np = pytest.importorskip("numpy")
+
+OTD = "On-Time Delivery (OTD)"
+CYCLE_TIME = "Order Fulfillment Cycle Time"
+
+def assert_matches_scalar(kpi_data_list):
+    """calculate_kpis_columnar gives every report exactly the value calculate_kpi gives it alone"""
+    analyzer = scr.SupplyChainReportAnalyzer()
+    results = scr.calculate_kpis_columnar(scr.kpi_columns_from_reports(kpi_data_list))
+    for kpi, result in results.items():
+        for index, kpi_data in enumerate(kpi_data_list):
+            expected = analyzer.calculate_kpi(kpi, kpi_data.get(kpi, {}))
+            assert bool(result["valid"][index]) == (expected is not None), (kpi, kpi_data.get(kpi))
+            if expected is None:
+                assert math.isnan(result["value"][index])
+            else:
+                assert result["value"][index] == expected, (kpi, kpi_data.get(kpi))
+                assert bool(result["passed"][index]) == analyzer.kpis.passes(kpi, expected)
+
+def test_synthetic_corpus_matches_the_scalar_engine():
+    analyzer = scr.SupplyChainReportAnalyzer()
+    kpi_data_list = [analyzer.analyze(html_content).kpi_data for _, html_content in scr.synthetic_report_corpus(300, seed=11)]
+    
+    assert_matches_scalar(kpi_data_list)
+
+@pytest.mark.parametrize("numerator, denominator", [
+    (1, 8), (3, 8), (201, 200), (107, 40), (-1, 8), (5, 4000), (10 ** 9 + 5, 1000), (12345, 1000)
+])
+def test_ties_round_like_round(numerator, denominator):
+    kpi_data = {
+        CYCLE_TIME: {"Total Time for All Orders": numerator, "Number of Orders": denominator},
+        # Scaled by 100, so 1/800 is the 0.125 tie
+        OTD: {"Orders Delivered On Time": numerator, "Total Orders Shipped": denominator * 100}
+    }
+    
+    assert_matches_scalar([kpi_data])
+
+def test_invalid_and_zero_denominators_are_not_calculated():
+    denominators = [0, -5, float("nan"), float("inf"), 1e-300, None]
+    kpi_data_list = [
+        {CYCLE_TIME: {"Total Time for All Orders": 600, **({} if denominator is None else {"Number of Orders": denominator})}}
+        for denominator in denominators
+    ] + [{CYCLE_TIME: {"Number of Orders": 25}}, {}]
+    
+    assert_matches_scalar(kpi_data_list)
+    values = scr.calculate_kpis_columnar(scr.kpi_columns_from_reports(kpi_data_list))[CYCLE_TIME]
+    assert values["valid"].tolist() == [False, False, False, True, True, False, False, False]
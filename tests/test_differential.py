@@ -0,0 +1,32 @@
+import pytest
+
+import supply_chain_report as scr
+from conftest import CYCLE_TIME, report
+
+@pytest.mark.parametrize("before, inside", [
+    ('<!-- <div id="kpi-report">old</div> -->', ""),
+    ("", "<script>var closing = '</div>';</script>"),
+    ("", "<!-- </div> -->"),
+    ("", '<span title="</div>">note</span>')
+])
+def test_changed_version_is_reparsed(before, inside):
+    differential = scr.DifferentialAnalyzer(scr.SupplyChainReportAnalyzer())
+    
+    differential.analyze("report-1", report(25, before, inside))
+    result = differential.analyze("report-1", report(50, before, inside))
+    
+    assert result.calculated_values[CYCLE_TIME] == 12.0
+    assert result.changes == [{"kpi": CYCLE_TIME, "previous": 24.0, "value": 12.0, "delta": -12.0}]
+
+def test_versions_match_full_analysis():
+    analyzer = scr.SupplyChainReportAnalyzer()
+    differential = scr.DifferentialAnalyzer(analyzer)
+    versions = [report(25), report(25), report(50), report(50, before="<!-- note -->"),
+                report(40, inside="<script>var s = '</div>';</script>")]
+    
+    for html in versions:
+        result = differential.analyze("report-1", html)
+        expected = analyzer.analyze(html)
+        assert (result.report, result.errors, result.calculated_values) == (
+            expected.report, expected.errors, expected.calculated_values)
+    assert differential.stats()["reports"] == len(versions)
@@ -0,0 +1,88 @@
+import concurrent.futures
+
+import pytest
+
+import supply_chain_report as scr
+from conftest import CYCLE_TIME, report
+
+def test_same_day_reanalysis_replaces_the_day():
+    store = scr.KPIHistoryStore()
+    analyzer = scr.SupplyChainReportAnalyzer(history=store)
+    
+    first = analyzer.analyze(report(25), site="plant-1", date="2026-03-01")
+    second = analyzer.analyze(report(50), site="plant-1", date="2026-03-01")
+    
+    assert first.ok and second.ok
+    assert second.calculated_values[CYCLE_TIME] == 12.0
+    assert store.history("plant-1", CYCLE_TIME) == [("2026-03-01", CYCLE_TIME, 12.0, False)]
+    trend = store.trends("plant-1")[CYCLE_TIME]
+    assert (trend["value"], trend["previous"], trend["periods"]) == (12.0, None, 1)
+
+def test_same_day_reanalysis_replays_the_trend():
+    store = scr.KPIHistoryStore(window=2)
+    analyzer = scr.SupplyChainReportAnalyzer(history=store)
+    analyzer.analyze(report(25), site="plant-1", date="2026-03-01")
+    analyzer.analyze(report(10), site="plant-1", date="2026-03-02")
+    
+    result = analyzer.analyze(report(20), site="plant-1", date="2026-03-02")
+    
+    assert result.trends[CYCLE_TIME] == {
+        "date": "2026-03-02", "value": 30.0, "previous": 24.0, "delta": 6.0, "rolling_mean": 27.0,
+        "window": 2, "periods": 2, "breach_streak": 0
+    }
+    assert store.trends("plant-1")[CYCLE_TIME] == result.trends[CYCLE_TIME]
+    assert [row[2] for row in store.history("plant-1", CYCLE_TIME)] == [24.0, 30.0]
+    assert "Order Fulfillment Cycle Time is up 6.0 from the previous period" in result.report
+
+def test_history_failure_does_not_fail_the_analysis(caplog):
+    store = scr.KPIHistoryStore()
+    analyzer = scr.SupplyChainReportAnalyzer(history=store)
+    store.close()
+    
+    result = analyzer.analyze(report(25), site="plant-1", date="2026-03-01")
+    
+    assert result.ok
+    assert result.calculated_values[CYCLE_TIME] == 24.0
+    assert "Could not read KPI history of site plant-1" in caplog.text
+
+def test_non_iso_dates_are_not_recorded(caplog):
+    store = scr.KPIHistoryStore()
+    analyzer = scr.SupplyChainReportAnalyzer(history=store)
+    
+    result = analyzer.analyze(report(25), site="plant-1", date="3/1/2026")
+    
+    assert result.ok and not result.trends
+    assert store.history("plant-1") == []
+    assert "expected YYYY-MM-DD: '3/1/2026'" in caplog.text
+    with pytest.raises(ValueError):
+        store.append("plant-1", "2026-3-1", result.calculated_values, scr.KPI_REGISTRY.compile())
+
+def test_store_is_shared_by_worker_threads():
+    store = scr.KPIHistoryStore()
+    analyzer = scr.SupplyChainReportAnalyzer(history=store)
+    sites = [f"plant-{number}" for number in range(8)]
+    
+    def analyze_site(site):
+        return [analyzer.analyze(report(orders), site=site, date=f"2026-03-{day:02d}").ok
+                for day, orders in enumerate((10, 20, 30), start=1)]
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(all(oks) for oks in pool.map(analyze_site, sites))
+    
+    assert store.sites() == sites
+    for site in sites:
+        assert [row[2] for row in store.history(site, CYCLE_TIME)] == [60.0, 30.0, 20.0]
+        assert store.trends(site)[CYCLE_TIME]["periods"] == 3
+
+def test_instrumented_analysis_records_history_after_rendering():
+    store = scr.KPIHistoryStore()
+    aggregator = scr.MetricsAggregator()
+    analyzer = scr.SupplyChainReportAnalyzer(history=store, instrumentation=scr.AnalysisInstrumentation([aggregator]))
+    
+    analyzer.analyze(report(25), site="plant-1", date="2026-03-01")
+    result = analyzer.analyze(report(50), site="plant-1", date="2026-03-01")
+    
+    assert result.ok
+    assert store.history("plant-1", CYCLE_TIME) == [("2026-03-01", CYCLE_TIME, 12.0, False)]
+    stages = list(aggregator.snapshot()["stages"])
+    assert stages.index("record_history") > stages.index("render_report")
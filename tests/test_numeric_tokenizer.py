@@ -0,0 +1,65 @@
+import random
+import re
+
+import pytest
+
+import supply_chain_report as scr
+
+# The original field pattern, which ignored everything after the number
+BASELINE_VALUE = re.compile(r":\s*(\d+(?:\.\d+)?)")
+
+TOKENIZER = scr.NumericTokenizer()
+
+@pytest.mark.parametrize("text, dimension, expected", [
+    ("Total Freight Cost: 962.45On-Time Delivery", "currency", 962.45),
+    ("Total Orders: 25abc", "count", 25.0),
+    ("Total Orders: 25Bananas", "count", 25.0),
+    ("Orders Delivered Without Issues: 25%", "count", 25.0),
+    ("Total Time for All Orders: 600Orders Delivered", "time", 600.0),
+    ("Total Orders Shipped: 25USD", "count", 25.0),
+    ("Average Inventory Value: 1.2kg", None, 1.2)
+])
+def test_text_glued_to_the_value_is_ignored(text, dimension, expected):
+    assert TOKENIZER.parse(text, dimension) == (expected, None)
+
+@pytest.mark.parametrize("text, expected", [
+    ("Cost of Goods Sold (COGS): 25 B", 25.0),
+    ("Cost of Goods Sold (COGS): 25 k", 25.0),
+    ("Cost of Goods Sold (COGS): 25 bn dollars", 25.0),
+    ("Cost of Goods Sold (COGS): 25B", 25e9),
+    ("Cost of Goods Sold (COGS): 1.2k", 1200.0),
+    ("Cost of Goods Sold (COGS): 3MM", 3e6),
+    ("Cost of Goods Sold (COGS): 2bn.", 2e9),
+    ("Cost of Goods Sold (COGS): $1.5M", 1.5e6)
+])
+def test_magnitudes_apply_only_when_glued_and_ending_a_word(text, expected):
+    assert TOKENIZER.parse(text, "currency") == (expected, None)
+
+@pytest.mark.parametrize("text, dimension, expected", [
+    ("Total Time for All Orders: 48 hrs", "time", 48.0),
+    ("Total Time for All Orders: 2days", "time", 48.0),
+    ("Total Freight Cost: $12,500.00", "currency", 12500.0),
+    ("Total Freight Cost: (40)", "currency", -40.0),
+    ("Total Units Shipped: 3.5e2 units", "count", 350.0)
+])
+def test_formatted_values(text, dimension, expected):
+    assert TOKENIZER.parse(text, dimension) == (expected, None)
+
+def test_unit_set_apart_from_the_value_must_fit_the_field():
+    value, error = TOKENIZER.parse("Total Freight Cost: 48 hrs", "currency")
+    
+    assert value is None
+    assert (error["reason"], error["token"]) == ("unit_mismatch", "hrs")
+
+def test_plain_values_followed_by_text_match_the_original_pattern():
+    rng = random.Random(11)
+    tails = ["", "On-Time Delivery", "abc", "%", " B", " k", " bn", "Bananas", "kg", " shipped on time",
+             "Orders", "\nOrder", " (estimate)", "!", " - see note", "USD"]
+    for _ in range(2000):
+        number = str(rng.randint(0, 99999))
+        if rng.random() < 0.5:
+            number += "." + str(rng.randint(0, 999))
+        text = f"Field: {number}{rng.choice(tails)}"
+        
+        assert TOKENIZER.parse(text, rng.choice([None, "time", "currency", "count"])) == (
+            float(BASELINE_VALUE.search(text).group(1)), None), text
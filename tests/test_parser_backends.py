@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+import supply_chain_report as scr
+
+# Markup spliced into reports at random tag boundaries by the fuzzer
+FUZZ_FRAGMENTS = (
+    "<p>", "</p>", "<br>", "<b>", "</b>", "<span>noise</span>", "<div>", "</div>", "</h2>", "<h3>",
+    "<h2>On-Time Delivery (OTD)</h2>", "<p>Total Orders: 7</p>", "<!-- </div> -->", "<script>var s = '</div>';</script>",
+    "<style>p { color: red; }</style>", "&amp;", "<table><tr><td>x</td></tr></table>", "<img src=x>"
+)
+
+def fuzzed_reports(count=60, seed=17):
+    """Synthetic reports with random markup spliced in at tag boundaries"""
+    rng = random.Random(seed)
+    reports = []
+    for html_content in scr.parser_conformance_corpus(count, seed):
+        for _ in range(rng.randint(1, 4)):
+            position = html_content.find("<", rng.randrange(len(html_content)))
+            if position < 0:
+                position = len(html_content)
+            html_content = html_content[:position] + rng.choice(FUZZ_FRAGMENTS) + html_content[position:]
+        reports.append(html_content)
+    return reports
+
+# The same field followed by a line break in each line-ending convention (a lone "\r" is not whitespace)
+LINE_ENDING_REPORTS = [
+    scr.SAMPLE_HTML_REPORT.replace("\n", line_ending).replace(
+        "<p>Total Freight Cost: ", f'<p class="x">Total Freight Cost: 90{line_ending}days</p><p>Note: ')
+    for line_ending in ("\r", "\r\n", "\n")
+]
+
+@pytest.mark.parametrize("documents", [
+    [scr.SAMPLE_HTML_REPORT],
+    scr.parser_conformance_corpus(60, seed=3),
+    fuzzed_reports(),
+    LINE_ENDING_REPORTS
+], ids=["sample", "synthetic", "fuzzed", "line-endings"])
+def test_every_backend_extracts_identical_data(documents):
+    report = scr.check_parser_conformance(documents)
+    
+    assert set(report) == set(scr.PARSER_BACKENDS)
+    assert {engine: outcome["mismatches"] for engine, outcome in report.items()} == {
+        engine: [] for engine in scr.PARSER_BACKENDS}
+    # The stream engine handles every document; the others may only decline
+    assert report["stream"]["compared"] == len(documents)
+
+@pytest.mark.parametrize("engine", scr.parser_engine_names())
+def test_every_engine_renders_identical_reports(engine):
+    reference = scr.SupplyChainReportAnalyzer(parser_engine="stream")
+    analyzer = scr.SupplyChainReportAnalyzer(parser_engine=engine)
+    
+    for html_content in [scr.SAMPLE_HTML_REPORT] + fuzzed_reports(24, seed=5) + LINE_ENDING_REPORTS:
+        expected = reference.analyze(html_content)
+        actual = analyzer.analyze(html_content)
+        assert (actual.report, actual.errors, actual.calculated_values) == (
+            expected.report, expected.errors, expected.calculated_values)
+
+def test_conformance_arguments_stay_out_of_bench():
+    parser = scr.build_arg_parser()
+    
+    assert parser.parse_args(["conformance", "-n", "5", "--seed", "2"]).reports == 5
+    bench = parser.parse_args(["bench", "--save", "base.json", "--compare", "old.json", "--tolerance", "0.5"])
+    assert (bench.save, bench.compare, bench.tolerance) == ("base.json", "old.json", 0.5)
+    with pytest.raises(SystemExit):
+        parser.parse_args(["conformance", "--save", "base.json"])
@@ -0,0 +1,74 @@
+import io
+import json
+
+import pytest
+
+import supply_chain_report as scr
+
+pytest.importorskip("numpy")
+
+OTD = "On-Time Delivery (OTD)"
+
+def delivery_report(on_time, shipped):
+    """The sample report with different On-Time Delivery inputs"""
+    html = scr.SAMPLE_HTML_REPORT.replace("Orders Delivered On Time: 22", f"Orders Delivered On Time: {on_time}")
+    return html.replace("Total Orders Shipped: 25", f"Total Orders Shipped: {shipped}")
+
+def rolled_up(records, group_by, cube=False, tmp_path=None):
+    """NDJSON records through run_rollup, returned as parsed groups"""
+    source = tmp_path / "records.ndjson"
+    output = tmp_path / "groups.ndjson"
+    source.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+    reports = scr.run_rollup(str(source), group_by=group_by, cube=cube, output=str(output))
+    return reports, [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+
+def test_streamed_results_roll_up_by_their_input_attributes(tmp_path):
+    inputs = [
+        {"id": "a", "site": "plant-1", "region": "north", "date": "2026-03-01", "html": delivery_report(9, 10)},
+        {"id": "b", "site": "plant-2", "region": "north", "date": "2026-03-01", "html": delivery_report(50, 100)},
+        {"id": "c", "site": "plant-3", "region": "south", "date": "2026-04-01", "html": delivery_report(30, 40)}
+    ]
+    stream = io.StringIO("".join(json.dumps(record) + "\n" for record in inputs))
+    results = list(scr.iter_ndjson_results(stream))
+    
+    assert [(result["id"], result["site"], result["region"]) for result in results] == [
+        ("a", "plant-1", "north"), ("b", "plant-2", "north"), ("c", "plant-3", "south")]
+    reports, groups = rolled_up(results, ("region",), tmp_path=tmp_path)
+    
+    assert reports == 3
+    north = next(group for group in groups if group["region"] == "north")
+    # Total on-time orders over total orders shipped, not the mean of 90% and 50%
+    assert north["reports"] == 2
+    assert north["kpis"][OTD] == pytest.approx(100 * 59 / 110, abs=0.01)
+    assert north["kpis"][OTD] != pytest.approx((90.0 + 50.0) / 2)
+
+def test_cube_subtotals_add_up_to_the_grand_total():
+    analyzer = scr.SupplyChainReportAnalyzer()
+    records = []
+    for site, month, on_time, shipped in [("plant-1", "2026-03", 9, 10), ("plant-1", "2026-04", 18, 20),
+                                          ("plant-2", "2026-03", 50, 100), ("plant-2", "2026-04", 5, 25)]:
+        analysis = analyzer.analyze(delivery_report(on_time, shipped))
+        records.append({"site": site, "date": month + "-01", "kpi_data": analysis.kpi_data})
+    columns, dimensions = scr.rollup_columns(records, ("site", "month"))
+    
+    cube = scr.rollup_cube(columns, dimensions, ("site", "month"))
+    
+    assert [table["group_by"] for table in cube] == [("site", "month"), ("site",), ("month",), ()]
+    for table in cube:
+        assert table["reports"].sum() == 4
+        assert table["totals"]["Orders Delivered On Time"].sum() == 82
+        assert table["totals"]["Total Orders Shipped"].sum() == 155
+    by_site = scr.rollup_records(cube[1], ("site", "month"))
+    assert [(group["site"], group["month"], group["reports"]) for group in by_site] == [
+        ("plant-1", None, 2), ("plant-2", None, 2)]
+    assert by_site[1]["kpis"][OTD] == pytest.approx(100 * 55 / 125, abs=0.01)
+    grand_total = scr.rollup_kpis(columns, dimensions)
+    assert cube[-1]["kpis"][OTD]["value"][0] == grand_total["kpis"][OTD]["value"][0]
+
+@pytest.mark.parametrize("cube", [False, True])
+def test_empty_input_rolls_up_to_an_empty_grand_total(tmp_path, cube):
+    reports, groups = rolled_up([], ("site",), cube=cube, tmp_path=tmp_path)
+    
+    assert reports == 0
+    assert groups == ([{"site": None, "reports": 0, "kpis": dict.fromkeys(scr.KPI_REGISTRY.compile().names)}]
+                      if cube else [])
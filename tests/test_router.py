@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import supply_chain_report as scr
+
+def legacy_route(message):
+    """The response the original if/elif chain gave a message"""
+    intent, argument = scr._legacy_classify(message)
+    if intent == "unsupported_language":
+        return "ERROR: Unsupported language detected. Please use ENGLISH."
+    if intent == "template":
+        return scr.provide_template()
+    if intent == "html_report":
+        return scr.process_html_report(argument)
+    if intent == "feedback":
+        return scr.handle_feedback(argument)
+    return argument
+
+MESSAGES = [
+    "", " ", "Hello", "Good morning, it's 9AM and I have data ready", "Hi there, my name is Alex",
+    "I am", "i am ", "My Name Is   Jo and this is urgent", "I AM SAM", "good night and good morning",
+    "Evening or afternoon?", "nightly afternoon", "I would rate 4 for this analysis", "rate 12", "RATE 3", "rate five",
+    "Please send the TEMPLATE", "template ```HTML\n<p>x</p>\n```", "Emergency! Please help me analyze my report ASAP",
+    "Bonjour, ça va ?", "naïve question", "Hello there", "tab\tseparated i am\tPat",
+    "```HTML\n" + scr.SAMPLE_HTML_REPORT + "\n```", "Analyze:\n```HTML " + scr.SAMPLE_HTML_REPORT + " ``` rate 5",
+    "```HTML\n<p>no closing fence</p>", "```HTML```", "```HTML \n```", "```HTML\n<p>a```b</p>\n``` and ```",
+    "```html\n" + scr.SAMPLE_HTML_REPORT + "\n```", "text ```HTML\n<p>x</p>\n```\n```HTML\n<p>y</p>\n```"
+]
+
+FRAGMENTS = ("good ", "morning ", "night ", "evening ", "afternoon ", "i am ", "my name is ", "Dana ", "rate ", "3 ",
+             "asap ", "template ", "```HTML\n", "<p>x</p>\n", "```", " ", "\n", "é")
+
+def random_messages(count=400, seed=8):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_router_matches_the_original_chain(message):
+    assert scr.MESSAGE_ROUTER.classify(message) == scr._legacy_classify(message)
+    assert scr.route_message(message) == legacy_route(message)
+
+def test_router_matches_the_original_chain_on_random_messages():
+    for message in random_messages():
+        assert scr.MESSAGE_ROUTER.classify(message) == scr._legacy_classify(message), message
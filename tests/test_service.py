@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+import supply_chain_report as scr
+
+def serve(check):
+    """Run `check(service)` against a thread-backed ReportService on an ephemeral localhost port"""
+    async def run():
+        service = await scr.ReportService(port=0, max_pending=50, max_body_bytes=64 * 1024,
+                                          max_header_bytes=1024, use_threads=True).start()
+        try:
+            return await check(service)
+        finally:
+            await service.close()
+    return asyncio.run(run())
+
+async def raw_request(service, data):
+    """Send raw bytes and return the response status"""
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    try:
+        writer.write(data)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b" ", 2)[1])
+
+def message_body(message):
+    return json.dumps({"message": message}).encode("utf-8")
+
+def test_endpoints_answer_like_the_router():
+    async def check(service):
+        async def request(method, path, body=b""):
+            return await scr.http_request(service.host, service.port, method, path, body)
+        
+        assert await request("GET", "/health") == (200, {"status": "ok", "in_flight": 0, "rejected": 0})
+        assert await request("POST", "/message", message_body("Good morning, I need a template")) == (
+            200, {"response": scr.provide_template()})
+        assert await request("POST", "/message", message_body("rate 5")) == (
+            200, {"response": scr.handle_feedback("5")})
+        assert await request("POST", "/analyze", scr.SAMPLE_HTML_REPORT.encode("utf-8")) == (
+            200, {"response": scr.process_html_report(scr.SAMPLE_HTML_REPORT)})
+    
+    serve(check)
+
+def test_concurrent_report_submissions():
+    chat_message = message_body("Please analyze:\n```HTML\n" + scr.SAMPLE_HTML_REPORT + "\n```")
+    expected = scr.process_html_report(scr.SAMPLE_HTML_REPORT.strip())
+    
+    async def check(service):
+        return await asyncio.gather(*[
+            scr.http_request(service.host, service.port, "POST", "/message", chat_message) for _ in range(50)])
+    
+    assert serve(check) == [(200, {"response": expected})] * 50
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ("POST", "/analyze", b"x" * (64 * 1024 + 1), 413),
+    ("GET", "/missing", b"", 404),
+    ("GET", "/message", b"", 405),
+    ("POST", "/message", b"not json", 400),
+    ("POST", "/message", b'{"message": 5}', 400),
+    ("POST", "/analyze", b"\xff", 400)
+])
+def test_bad_requests_get_error_statuses(method, path, body, status):
+    async def check(service):
+        return await scr.http_request(service.host, service.port, method, path, body)
+    
+    assert serve(check)[0] == status
+
+@pytest.mark.parametrize("data, status", [
+    (b"GET /health\r\n\r\n", 400),
+    (b"POST /analyze HTTP/1.1\r\n\r\n", 411),
+    (b"POST /analyze HTTP/1.1\r\nContent-Length: -1\r\n\r\n", 400),
+    (b"POST /analyze HTTP/1.1\r\nContent-Length: +5\r\n\r\nhello", 400),
+    (b"POST /analyze HTTP/1.1\r\nContent-Length: 1_0\r\n\r\n", 400),
+    (b"POST /analyze HTTP/1.1\r\nContent-Length: ten\r\n\r\n", 400),
+    (b"GET /health HTTP/1.1\r\nX-Padding: " + b"x" * 2048 + b"\r\n\r\n", 431)
+], ids=["request-line", "no-length", "negative-length", "signed-length", "underscore-length", "text-length",
+        "large-headers"])
+def test_malformed_requests_are_rejected(data, status):
+    async def check(service):
+        return await raw_request(service, data)
+    
+    assert serve(check) == status
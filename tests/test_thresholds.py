@@ -0,0 +1,31 @@
+import json
+
+import supply_chain_report as scr
+from conftest import CYCLE_TIME
+
+def json_report(rules, tenant=None):
+    analyzer = scr.SupplyChainReportAnalyzer(output_format="json", rules=rules)
+    return json.loads(analyzer.analyze(scr.SAMPLE_HTML_REPORT, tenant=tenant).report)
+
+def kpi_entry(report, name):
+    return next(entry for entry in report["kpis"] if entry["name"] == name)
+
+def test_json_report_shows_the_tenant_override():
+    rules = scr.ThresholdRules()
+    rules.override("acme", CYCLE_TIME, "< 20", text="less than 20 hours")
+    
+    report = json_report(rules, tenant="acme")
+    
+    assert report["validation"]["thresholds"][CYCLE_TIME] == "less than 20 hours"
+    assert kpi_entry(report, CYCLE_TIME)["threshold"] == "less than 20 hours"
+    assert kpi_entry(report, CYCLE_TIME)["passed"] is False
+
+def test_json_report_keeps_the_defaults_of_other_tenants():
+    rules = scr.ThresholdRules()
+    rules.override("acme", CYCLE_TIME, "< 20", text="less than 20 hours")
+    
+    report = json_report(rules, tenant="globex")
+    
+    assert kpi_entry(report, CYCLE_TIME)["threshold"] == "less than 48 hours"
+    assert kpi_entry(report, CYCLE_TIME)["passed"] is True
+    assert all(entry["threshold"] == report["validation"]["thresholds"][entry["name"]] for entry in report["kpis"])